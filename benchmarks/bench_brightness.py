@@ -0,0 +1,73 @@
+"""Micro-benchmark for the brightness engine.
+
+Compares the original per-pixel Python sum against the histogram engine at
+full resolution and on a reduced analysis copy, for 1, 12 and 48 MP JPEGs,
+with each engine's speedup over the original and the reduced copy's error.
+
+    python benchmarks/bench_brightness.py [--max-pixels 1000000] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skincare_ai.analysis import BRIGHTNESS_TOLERANCE, measure_brightness  # noqa: E402
+from tests.reference import legacy_brightness  # noqa: E402
+
+SIZES = {
+    "1MP": (1000, 1000),
+    "12MP": (4000, 3000),
+    "48MP": (8000, 6000),
+}
+
+
+def make_jpeg(size):
+    """Gradient test image so the score is not trivially uniform"""
+    gradient = Image.linear_gradient('L').resize(size)
+    img = Image.merge('RGB', (gradient, gradient.transpose(Image.Transpose.ROTATE_90).resize(size), gradient))
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-pixels", type=int, default=1_000_000, help="analysis size for the reduced run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'legacy':>10} {'exact':>10} {'reduced':>10} {'exact x':>9} {'reduced x':>9} {'error':>7}")
+    for label, size in SIZES.items():
+        data = make_jpeg(size)
+        legacy_time, legacy_score = best_of(lambda: legacy_brightness(data), 1)
+        exact_time, exact_score = best_of(lambda: measure_brightness(data), args.repeat)
+        reduced_time, reduced_score = best_of(lambda: measure_brightness(data, args.max_pixels), args.repeat)
+
+        assert exact_score == legacy_score, (label, exact_score, legacy_score)
+        error = abs(reduced_score - exact_score)
+        status = "ok" if error <= BRIGHTNESS_TOLERANCE else "OVER"
+
+        print(
+            f"{label:>6} {legacy_time * 1000:>8.1f}ms {exact_time * 1000:>8.1f}ms "
+            f"{reduced_time * 1000:>8.1f}ms {legacy_time / exact_time:>8.1f}x {legacy_time / reduced_time:>8.1f}x "
+            f"{error:>6.2f} {status}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Micro-benchmark for catalog ranking.
+
+Builds a synthetic catalog (the shipped ingredients, conflicts and goals,
+with --products random products) and ranks it for every goal against a set
+of UI-style histories, with the bitset index and with a straightforward
+version that scans the history text and each product's ingredient list per
+request. Both must return the same products.
+
+    python benchmarks/bench_catalog.py [--products 5000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skincare_ai.cache import normalize_history  # noqa: E402
+from skincare_ai.catalog import (CATALOG_PATH, DUPLICATE_WEIGHT, GENERAL_GOAL, KEY_INGREDIENT_WEIGHT,  # noqa: E402
+                                 Catalog)
+
+HISTORIES = [
+    "No previous products mentioned",
+    "🌙 Retinol/Retinoid anti-aging products | Skin Type: Oily",
+    "🍊 Vitamin C brightening serum, 🔄 AHA/BHA exfoliating treatments",
+    "⚡ Benzoyl peroxide acne treatments, 💧 Hyaluronic acid hydrating serum | Skin Type: Sensitive | Age: 20-30",
+    "🌙 Retinol/Retinoid anti-aging products, 🍊 Vitamin C brightening serum, 🛡️ Ceramide barrier moisturizers",
+]
+TYPES = ["cleanser", "toner", "serum", "moisturizer", "sunscreen", "treatment", "mask", "oil"]
+
+
+def synthetic_catalog(products, seed=3):
+    with open(CATALOG_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    rng = random.Random(seed)
+    ingredients, goals = list(data["ingredients"]), list(data["goals"])
+    data["products"] = [{"name": f"Product {index}", "type": rng.choice(TYPES),
+                         "ingredients": rng.sample(ingredients, rng.randint(2, 6)),
+                         "goals": rng.sample(goals, rng.randint(1, 3))} for index in range(products)]
+    return data
+
+
+def rank_by_scanning(data, goal, history, limit=5, per_type=1):
+    """The same ranking without an index: string matching per request and per product"""
+    goal = goal or GENERAL_GOAL
+    products, skin_type, _ = normalize_history(history)
+    text = " , ".join(products)
+    used = [key for key, entry in data["ingredients"].items()
+            if any(re.search(r"\b" + re.escape(alias.lower()) + r"\b", text) for alias in entry["aliases"])]
+    blocked = set(data["goals"][goal]["avoid"]) | set(data.get("skin_types", {}).get(skin_type, {}).get("avoid", []))
+    for first, second, _ in data["conflicts"]:
+        if first in used:
+            blocked.add(second)
+        if second in used:
+            blocked.add(first)
+
+    key = data["goals"][goal]["key"]
+    scored = []
+    for index, product in enumerate(data["products"]):
+        if goal not in product["goals"] or any(ingredient in blocked for ingredient in product["ingredients"]):
+            continue
+        score = KEY_INGREDIENT_WEIGHT * sum(ingredient in key for ingredient in product["ingredients"]) \
+            - DUPLICATE_WEIGHT * sum(ingredient in used for ingredient in product["ingredients"])
+        scored.append((-score, index))
+    scored.sort()
+
+    ranked, taken = [], {}
+    for _, index in scored:
+        kind = data["products"][index]["type"]
+        if taken.get(kind, 0) >= per_type:
+            continue
+        taken[kind] = taken.get(kind, 0) + 1
+        ranked.append(data["products"][index]["name"])
+        if len(ranked) >= limit:
+            break
+    return ranked
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = synthetic_catalog(args.products)
+    load_time, catalog = best_of(lambda: Catalog(data), args.repeat)
+    requests = [(goal, history) for goal in data["goals"] for history in HISTORIES]
+
+    scan_time, scanned = best_of(lambda: [rank_by_scanning(data, goal, history) for goal, history in requests],
+                                 args.repeat)
+    index_time, indexed = best_of(lambda: [[product.name for product in catalog.rank(goal, history)]
+                                           for goal, history in requests], args.repeat)
+    status = "ok" if scanned == indexed else "MISMATCH"
+
+    print(f"{args.products} products, {len(data['ingredients'])} ingredients; index built in {load_time * 1000:.1f} ms")
+    print(f"{len(requests)} rankings: scan {scan_time / len(requests) * 1000:.3f} ms, "
+          f"bitsets {index_time / len(requests) * 1000:.3f} ms per ranking "
+          f"({scan_time / index_time:.1f}x), results {status}")
+    return 0 if status == "ok" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Benchmark for local goal matching.
+
+Times the precompiled single-pass matcher against the original linear scan
+(substring test per catalog key, then one any() pass per keyword group) over
+thousands of generated goal strings, and checks both agree on every goal.
+Each run pads the keyword list with --extra-keywords synthetic keywords (by
+default none, 2,000 and 20,000 extra) to show how each approach scales.
+
+    python benchmarks/bench_goal_matching.py [--goals 5000] [--extra-keywords 0 2000 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skincare_ai.recommendation import (  # noqa: E402
+    GOAL_KEYWORDS,
+    LOCAL_RECOMMENDATIONS,
+    compile_goal_matcher,
+    match_goal,
+)
+from tests.reference import linear_match  # noqa: E402
+
+VOCABULARY = [
+    "brightening", "luminous", "skin", "tone", "anti-aging", "wrinkle", "prevention", "acne", "treatment",
+    "clear", "deep", "hydration", "glowing", "gentle", "care", "sensitive", "pore", "minimization",
+    "dark", "circles", "under-eye", "rosacea", "redness", "hyperpigmentation", "blackhead", "firming",
+    "sun", "damage", "repair", "melasma", "eczema", "oil", "control", "mattifying", "exfoliation",
+    "barrier", "texture", "radiance", "natural", "calm", "smooth", "plump", "tight", "spots",
+]
+
+
+def make_goals(count, seed=7):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 8))) for _ in range(count)]
+
+
+def run(goals, extra_keywords):
+    """(keywords, linear us/goal, compiled us/goal, mismatches) with extra_keywords padding the last group"""
+    keyword_groups = [(category, list(words)) for category, words in GOAL_KEYWORDS]
+    keyword_groups.append(("synthetic", [f"zz{i:05d}" for i in range(extra_keywords)]))
+    matcher = compile_goal_matcher(LOCAL_RECOMMENDATIONS, keyword_groups)
+
+    start = time.perf_counter()
+    expected = [linear_match(goal, LOCAL_RECOMMENDATIONS, keyword_groups) for goal in goals]
+    linear_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [match_goal(goal, matcher) for goal in goals]
+    compiled_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    keywords = sum(len(words) for _, words in keyword_groups)
+    return keywords, linear_time * 1e6 / len(goals), compiled_time * 1e6 / len(goals), mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goals", type=int, default=5000)
+    parser.add_argument("--extra-keywords", type=int, nargs="+", default=[0, 2000, 20000],
+                        help="synthetic keywords added to the last group; one run per value")
+    args = parser.parse_args()
+
+    goals = make_goals(args.goals)
+    failed = False
+    print(f"goals={len(goals)}")
+    for extra_keywords in args.extra_keywords:
+        keywords, linear_us, compiled_us, mismatches = run(goals, extra_keywords)
+        failed |= mismatches > 0
+        print(f"keywords={keywords:<6} linear scan {linear_us:8.2f} us/goal, compiled {compiled_us:6.2f} us/goal "
+              f"({linear_us / compiled_us:5.1f}x)  mismatches={mismatches}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark for the per-user analysis history.
+
+Writes: records --records analyses spread over --users users and times how
+long record() holds the caller and how long the writer takes to commit them
+all, batched (the default) and with one transaction per analysis.
+
+Reads: for users with 10, 1,000 and 10,000 saved analyses, compares
+progress() (one lookup of the running aggregates) with recompute() (a scan of
+every stored analysis), and checks both give the same summary.
+
+    python benchmarks/bench_history.py [--records 5000] [--users 50]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skincare_ai.history import BATCH_SIZE, HistoryStore  # noqa: E402
+
+HISTORY_LENGTHS = (10, 1_000, 10_000)
+# Seconds to wait for the writer to commit what was recorded
+FLUSH_TIMEOUT = 120
+
+
+def analysis(rng):
+    return {"brightness_score": rng.uniform(90, 180), "skin_brightness": rng.uniform(120, 200),
+            "redness_index": rng.uniform(5, 40), "texture_score": rng.uniform(2, 9), "shine_score": rng.uniform(0, 5)}
+
+
+def bench_writes(path, records, users, batch_size):
+    rng = random.Random(1)
+    store = HistoryStore(path, batch_size=batch_size)
+    start = time.perf_counter()
+    held = []
+    for index in range(records):
+        call = time.perf_counter()
+        store.record(f"user-{index % users}", analysis(rng), "General skin health", created=1_700_000_000 + index * 60)
+        held.append(time.perf_counter() - call)
+    if not store.flush(timeout=FLUSH_TIMEOUT):
+        raise RuntimeError(f"history writer did not drain within {FLUSH_TIMEOUT} s")
+    elapsed = time.perf_counter() - start
+    stats = store.stats()
+    store.close()
+    return elapsed, held, stats
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"writes: {args.records} analyses over {args.users} users")
+        for label, batch_size in (("batched", BATCH_SIZE), ("per analysis", 1)):
+            path = os.path.join(tmp, f"writes-{batch_size}.db")
+            elapsed, held, stats = bench_writes(path, args.records, args.users, batch_size)
+            print(f"  {label:<13} {args.records / elapsed:8.0f} analyses/s in {stats['batches']:5d} transactions; "
+                  f"record() p50 {statistics.median(held) * 1e6:5.1f} us, max {max(held) * 1e3:5.2f} ms")
+
+        print("reads: progress() vs rebuilding from every analysis")
+        store = HistoryStore(os.path.join(tmp, "reads.db"))
+        rng = random.Random(2)
+        for length in HISTORY_LENGTHS:
+            for index in range(length):
+                store.record(f"reader-{length}", analysis(rng), None, created=1_700_000_000 + index * 86400)
+            # The longest history is as big as the queue
+            if not store.flush(timeout=FLUSH_TIMEOUT):
+                raise RuntimeError(f"history writer did not drain within {FLUSH_TIMEOUT} s")
+        for length in HISTORY_LENGTHS:
+            user = f"reader-{length}"
+            lookup_time, progress = best_of(lambda: store.progress(user), args.repeat)
+            scan_time, rebuilt = best_of(lambda: store.recompute(user), args.repeat)
+            same = rebuilt.summary() == progress
+            failed |= not same
+            print(f"  {length:>6} analyses: progress {lookup_time * 1e3:7.3f} ms, rebuild {scan_time * 1e3:8.2f} ms "
+                  f"({scan_time / lookup_time:6.0f}x)  {'ok' if same else 'MISMATCH'}")
+        store.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Peak memory of decoding very large uploads down to analysis size.
+
+Writes a synthetic 48 MP PNG (streamed row by row, so the generator itself
+stays small) and a 48 MP JPEG, then decodes each in a fresh subprocess and
+reports how far peak RSS rose above the baseline taken after the imports and
+the file read (see tests/peak_memory.py; Linux only). The bounded paths
+(banded PNG, JPEG draft, banded histogram) must stay under --limit-mb or the
+script exits 1; the naive full-resolution decodes are shown for comparison.
+
+    python benchmarks/bench_large_decode.py
+    python benchmarks/bench_large_decode.py --size 12000 8000 --limit-mb 24
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tests.images import write_jpeg, write_png  # noqa: E402
+from tests.peak_memory import CASES  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, nargs=2, default=(8000, 6000), metavar=("W", "H"))
+    parser.add_argument("--limit-mb", type=float, default=32.0, help="largest peak rise allowed for bounded paths")
+    args = parser.parse_args()
+
+    width, height = args.size
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {"png": os.path.join(tmp, "huge.png"), "jpg": os.path.join(tmp, "huge.jpg")}
+        write_png(files["png"], width, height)
+        write_jpeg(files["png"], files["jpg"])
+        print(f"{width}x{height} ({width * height / 1e6:.0f} MP): PNG {os.path.getsize(files['png']) / 1e6:.1f} MB, "
+              f"JPEG {os.path.getsize(files['jpg']) / 1e6:.1f} MB; limit {args.limit_mb:g} MB for bounded paths")
+
+        env = dict(os.environ, SKINCARE_MAX_IMAGE_PIXELS=str(width * height))
+        failed = False
+        for case, (kind, bounded) in CASES.items():
+            output = subprocess.run([sys.executable, "-m", "tests.peak_memory", case, files[kind]],
+                                    capture_output=True, text=True, env=env, cwd=ROOT)
+            if output.returncode:
+                print(f"  {case}: failed\n{output.stderr}")
+                failed = True
+                continue
+            rise, seconds, result = output.stdout.strip().split(" ", 2)
+            verdict = ""
+            if bounded:
+                ok = float(rise) <= args.limit_mb
+                failed |= not ok
+                verdict = "ok" if ok else "OVER LIMIT"
+            print(f"  {case:<16} peak +{float(rise):7.1f} MB  {float(seconds) * 1000:8.0f} ms  -> {result:<16} {verdict}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Benchmark for near-duplicate reuse of skin analyses.
+
+Edits: re-encodes, resizes and crops generated photos, and checks that each
+copy finds the original in the index while an exposure change and unrelated
+photos do not.
+
+Reuse: times analyze_skin on a decoded upload against hashing a re-encoded
+copy and looking it up.
+
+Index: fills an index with --entries random hashes and compares its banded
+lookups with a linear scan over every entry; both must pick equally near
+matches.
+
+    python benchmarks/bench_near_duplicates.py [--entries 10000] [--photos 5]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+from PIL import Image, ImageEnhance
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skincare_ai.analysis import analyze_skin  # noqa: E402
+from skincare_ai.dedup import (DUPLICATE_DISTANCE, DUPLICATE_LUMA_DELTA, HASH_SIZE, NearDuplicateIndex,  # noqa: E402
+                               PerceptualHash, hamming, perceptual_hash)
+from skincare_ai.imaging import decode_image_once  # noqa: E402
+from tests.images import encode, photo  # noqa: E402
+
+# Copies that should reuse the original's analysis, and ones that should not
+SAME = {
+    "jpeg q60": lambda img: reencode(img, 60),
+    "half size": lambda img: img.resize((img.width // 2, img.height // 2)),
+    "crop 2%": lambda img: crop(img, 0.02),
+    "crop 5%": lambda img: crop(img, 0.05),
+    "crop 3% + jpeg": lambda img: reencode(img.crop((int(img.width * 0.03), 0, img.width, int(img.height * 0.97))), 75),
+}
+DIFFERENT = {
+    "exposure +10%": lambda img: ImageEnhance.Brightness(img).enhance(1.1),
+}
+
+
+def reencode(img, quality):
+    return Image.open(io.BytesIO(encode(img, quality)))
+
+
+def crop(img, fraction):
+    dx, dy = int(img.width * fraction), int(img.height * fraction)
+    return img.crop((dx, dy, img.width - dx, img.height - dy))
+
+
+def upload_hash(img):
+    return decode_image_once(encode(img)).phash
+
+
+def scan_nearest(entries, phash, max_distance, luma_delta):
+    """(distance, luma difference) of the nearest match, checking every entry"""
+    best = None
+    for key in entries:
+        rank = (hamming(key.bits, phash.bits), abs(key.luma - phash.luma))
+        if rank[0] <= max_distance and rank[1] <= luma_delta and (best is None or rank < best):
+            best = rank
+    return best
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--photos", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    failed = False
+
+    print(f"edits: hits within {DUPLICATE_DISTANCE} bits and {DUPLICATE_LUMA_DELTA} luma "
+          f"({HASH_SIZE * HASH_SIZE}-bit dHash)")
+    originals = [photo(seed) for seed in range(args.photos)]
+    index = NearDuplicateIndex(max_entries=len(originals))
+    hashes = [upload_hash(img) for img in originals]
+    for number, phash in enumerate(hashes):
+        index.put(phash, number)
+    for expected, edits in ((True, SAME), (False, DIFFERENT)):
+        for name, edit in edits.items():
+            copies = [upload_hash(edit(img)) for img in originals]
+            hits = [index.get(phash) == number for number, phash in enumerate(copies)]
+            distances = [hamming(phash.bits, original.bits) for phash, original in zip(copies, hashes)]
+            lumas = [abs(phash.luma - original.luma) for phash, original in zip(copies, hashes)]
+            ok = all(hit == expected for hit in hits)
+            failed |= not ok
+            print(f"  {name:<15} bits {min(distances)}-{max(distances)}, luma {max(lumas):5.2f}: "
+                  f"{sum(hits)}/{len(hits)} reused  {'ok' if ok else 'UNEXPECTED'}")
+    unrelated = [upload_hash(photo(seed)) for seed in range(args.photos, args.photos + 20)]
+    closest = min(hamming(a.bits, b.bits) for a in hashes for b in unrelated)
+    false_hits = sum(index.get(phash) is not None for phash in unrelated)
+    failed |= false_hits > 0
+    print(f"  {'unrelated':<15} nearest at {closest} bits: {false_hits}/{len(unrelated)} reused")
+
+    print("reuse: analysing an upload vs hashing a re-encoded copy and looking it up")
+    decoded = decode_image_once(encode(originals[0]))
+    copy_array = decode_image_once(encode(originals[0], 70)).array
+    analyse_time, _ = best_of(lambda: analyze_skin(decoded.array), args.repeat)
+    lookup_time, reused = best_of(lambda: index.get(perceptual_hash(copy_array)), args.repeat)
+    print(f"  {decoded.array.shape[1]}x{decoded.array.shape[0]}: analyze_skin {analyse_time * 1e3:6.2f} ms, "
+          f"hash + lookup {lookup_time * 1e3:5.2f} ms ({analyse_time / lookup_time:.0f}x)"
+          f"{'' if reused == 0 else '  MISS'}")
+    failed |= reused != 0
+
+    rng = random.Random(4)
+    bits = HASH_SIZE * HASH_SIZE
+    entries = [PerceptualHash(rng.getrandbits(bits), round(rng.uniform(60, 200), 2)) for _ in range(args.entries)]
+    index = NearDuplicateIndex(max_entries=args.entries)
+    for number, phash in enumerate(entries):
+        index.put(phash, number)
+    queries = []
+    for number in range(args.queries):
+        if number % 2:
+            queries.append(PerceptualHash(rng.getrandbits(bits), round(rng.uniform(60, 200), 2)))
+        else:
+            base = rng.choice(entries)
+            flipped = sum(1 << bit for bit in rng.sample(range(bits), rng.randint(0, DUPLICATE_DISTANCE + 2)))
+            queries.append(PerceptualHash(base.bits ^ flipped, round(base.luma + rng.uniform(-3, 3), 2)))
+
+    def index_ranks():
+        ranks = []
+        for phash in queries:
+            number = index.get(phash)
+            ranks.append(None if number is None else
+                         (hamming(entries[number].bits, phash.bits), abs(entries[number].luma - phash.luma)))
+        return ranks
+
+    index_time, from_index = best_of(index_ranks, args.repeat)
+    scan_time, from_scan = best_of(lambda: [scan_nearest(entries, phash, DUPLICATE_DISTANCE, DUPLICATE_LUMA_DELTA)
+                                            for phash in queries], 1)
+    same = from_index == from_scan
+    failed |= not same
+    print(f"index: {args.entries} entries, {len(queries)} lookups ({sum(r is not None for r in from_index)} hits)")
+    print(f"  linear scan {scan_time / len(queries) * 1e3:7.3f} ms, bands {index_time / len(queries) * 1e3:6.3f} ms "
+          f"per lookup ({scan_time / index_time:.0f}x)  {'ok' if same else 'MISMATCH'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
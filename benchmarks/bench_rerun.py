@@ -0,0 +1,129 @@
+"""Rerun latency of the Streamlit app for everyday interactions, on a large photo.
+
+Uploads a generated photo (12 MP by default), then repeatedly changes the
+skin type, the goal and clicks a sidebar goal shortcut, timing each rerun.
+Each interaction is measured as a full-script rerun and, when the app wraps
+the widget in an st.fragment, as the fragment-scoped rerun the browser would
+actually request, along with the messages and bytes that rerun sends. The
+timings include AppTest's own per-run setup, so compare them relative to
+each other. Point --app at an older copy of streamlit_run.py to get a
+before/after comparison:
+
+    git show HEAD~1:streamlit_run.py > /tmp/before.py
+    PYTHONPATH=. python benchmarks/bench_rerun.py --app /tmp/before.py
+    python benchmarks/bench_rerun.py
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.testing.v1 import AppTest
+import streamlit.testing.v1.local_script_runner as local_script_runner
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Fragment function that owns each widget in the current app
+WIDGET_FRAGMENTS = {
+    "skin_type_selector": "preferences_panel",
+    "goal_selector": "preferences_panel",
+    "sidebar_goal": "popular_goals",
+}
+
+# AppTest always asks for a full rerun; this swaps in a fragment-scoped one while set
+_fragment_id = None
+
+
+def _rerun_data(**kwargs):
+    if _fragment_id:
+        kwargs.update(fragment_id=_fragment_id, fragment_id_queue=[_fragment_id])
+    return RerunData(**kwargs)
+
+
+local_script_runner.RerunData = _rerun_data
+
+# Forward messages (deltas) produced by the last run: what would go over the websocket
+_sent = {"messages": 0, "bytes": 0}
+_parse_tree = local_script_runner.parse_tree_from_messages
+
+
+def _record_messages(messages):
+    _sent.update(messages=len(messages), bytes=sum(message.ByteSize() for message in messages))
+    return _parse_tree(messages)
+
+
+local_script_runner.parse_tree_from_messages = _record_messages
+
+
+def fragment_ids(at):
+    """{function name: fragment id} for the fragments registered by the last run"""
+    ids = {}
+    for fragment_id, wrapper in at._fragment_storage._fragments.items():
+        for cell in wrapper.__closure__ or ():
+            if callable(cell.cell_contents) and hasattr(cell.cell_contents, "__name__"):
+                ids[cell.cell_contents.__name__] = fragment_id
+                break
+    return ids
+
+
+def make_photo(width, height):
+    rng = np.random.default_rng(7)
+    pixels = np.clip(rng.normal((214, 168, 140), 16, (height, width, 3)), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def main():
+    global _fragment_id
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(ROOT, "streamlit_run.py"))
+    parser.add_argument("--image-size", type=int, nargs=2, default=(4000, 3000), metavar=("W", "H"))
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    at = AppTest.from_file(os.path.abspath(args.app), default_timeout=120)
+    at.run()
+    at.file_uploader(key="file_uploader").set_value(("face.jpg", make_photo(*args.image_size), "image/jpeg")).run()
+    fragments = fragment_ids(at)
+    sidebar_key = [b.key for b in at.button if b.key and b.key.startswith("goal_")][0]
+
+    interactions = {
+        "skin_type_selector": lambda i: at.selectbox(key="skin_type_selector").set_value(["Oily", "Dry"][i % 2]),
+        "goal_selector": lambda i: at.selectbox(key="goal_selector").set_value(
+            ["🎭 Acne treatment and clear skin", "🌹 Rosacea and redness comfort"][i % 2]),
+        "sidebar_goal": lambda i: at.button(key=sidebar_key).click(),
+    }
+
+    print(f"{os.path.basename(args.app)}: {args.image_size[0]}x{args.image_size[1]} upload, "
+          f"fragments: {', '.join(sorted(fragments)) or 'none'}")
+    for name, interact in interactions.items():
+        modes = ["full"] + (["fragment"] if WIDGET_FRAGMENTS[name] in fragments else [])
+        for mode in modes:
+            _fragment_id = fragments[WIDGET_FRAGMENTS[name]] if mode == "fragment" else None
+            samples = []
+            for i in range(args.repeat + 1):
+                widget = interact(i)
+                start = time.perf_counter()
+                widget.run()
+                samples.append((time.perf_counter() - start) * 1000)
+                if at.exception:
+                    sys.exit(f"{name}: {at.exception[0].message}")
+            samples = sorted(samples[1:])  # first rerun warms caches
+            print(f"  {name:<20} {mode:<9} p50 {statistics.median(samples):8.1f} ms   "
+                  f"p95 {samples[min(len(samples) - 1, int(len(samples) * 0.95))]:8.1f} ms   "
+                  f"sent {_sent['messages']:>3} messages, {_sent['bytes'] / 1024:6.1f} KB")
+            if _fragment_id:
+                # A fragment run leaves only its own elements in the tree; rebuild it
+                _fragment_id = None
+                at.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Concurrent identical requests against the stub endpoint, with single-flight coalescing.
+
+Fires --threads simultaneous get_skincare_recommendation calls for the same
+goal and history (sync, then async), in --waves waves, and counts how many
+requests reached the stub. With coalescing each wave should cost exactly one
+model call; the run fails otherwise, or if any caller got a different answer.
+Cold caches are used so every wave is a miss.
+
+    python benchmarks/bench_single_flight.py [--threads 50] [--waves 3] [--latency 0.3]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.stub_server import StubConfig, start_stub_server  # noqa: E402
+from skincare_ai.cache import RecommendationCache  # noqa: E402
+from skincare_ai.inference import InferenceClient  # noqa: E402
+from skincare_ai.recommendation import (get_skincare_recommendation, get_skincare_recommendation_async,  # noqa: E402
+                                        in_flight)
+
+GOAL = "🎭 Acne treatment and clear skin"
+HISTORY = "🍊 Vitamin C brightening serum | Skin Type: Oily"
+
+
+def sync_wave(client, threads, barrier):
+    cache = RecommendationCache(path=None)
+    results = [None] * threads
+
+    def call(index):
+        barrier.wait()
+        results[index] = get_skincare_recommendation(GOAL, HISTORY, 130.0, client=client, cache=cache)
+
+    workers = [threading.Thread(target=call, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+async def async_wave(client, threads):
+    cache = RecommendationCache(path=None)
+    return await asyncio.gather(*(get_skincare_recommendation_async(GOAL, HISTORY, 130.0, client=client, cache=cache)
+                                  for _ in range(threads)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--waves", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub inference latency, seconds")
+    args = parser.parse_args()
+
+    config = StubConfig(latency=args.latency, seed=1)
+    url, server = start_stub_server(config)
+    client = InferenceClient(url=url, api_key="stub", max_concurrency=args.threads, max_connections=args.threads)
+    failures = []
+
+    async def async_waves():
+        # One event loop for every wave: the client's async pool belongs to the loop that first used it
+        for wave in range(args.waves):
+            before, coalesced_before = config.requests, in_flight.stats()["coalesced"]
+            started = time.perf_counter()
+            results = await async_wave(client, args.threads)
+            check("async", wave, before, coalesced_before, started, results)
+        await client.aclose()
+
+    def check(mode, wave, before, coalesced_before, started, results):
+        elapsed = time.perf_counter() - started
+        calls = config.requests - before
+        coalesced = in_flight.stats()["coalesced"] - coalesced_before
+        identical = all(result == results[0] for result in results)
+        print(f"{mode:>5} wave {wave + 1}: {args.threads} callers, {calls} model call(s), "
+              f"{coalesced} coalesced, {elapsed * 1000:.0f} ms, identical results: {identical}")
+        if calls != 1 or not identical or results[0].get("source") != "AI Generated":
+            failures.append(f"{mode} wave {wave + 1}")
+
+    try:
+        for wave in range(args.waves):
+            before, coalesced_before = config.requests, in_flight.stats()["coalesced"]
+            started = time.perf_counter()
+            results = sync_wave(client, args.threads, threading.Barrier(args.threads))
+            check("sync", wave, before, coalesced_before, started, results)
+        asyncio.run(async_waves())
+    finally:
+        client.close()
+        server.shutdown()
+
+    if failures:
+        sys.exit(f"single-flight coalescing failed for: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Simulated multi-session load on the upload store.
+
+Drives N sessions that each upload a 5-15 MB photo (scaled by --scale), read
+it back a few times and occasionally replace it, against one shared
+UploadStore. Heap use is tracked with tracemalloc; the run fails if the peak
+grows past the memory budget plus one upload, i.e. if memory is not flat in
+the number of sessions.
+
+    python benchmarks/bench_upload_store.py [--sessions 500] [--scale 0.1] [--budget-mb 64]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skincare_ai.uploads import UploadStore  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--scale", type=float, default=0.1, help="fraction of real 5-15 MB upload sizes")
+    parser.add_argument("--budget-mb", type=int, default=64)
+    parser.add_argument("--disk-budget-mb", type=int, default=512)
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    largest = int(15 * MB * args.scale)
+    source = os.urandom(largest)
+    spill_dir = tempfile.mkdtemp(prefix="skincare-bench-")
+    store = UploadStore(memory_budget=args.budget_mb * MB, disk_budget=args.disk_budget_mb * MB,
+                        idle_timeout=args.idle_seconds, spill_dir=spill_dir)
+    handles = {}
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    print(f"{'sessions':>8} {'heap MB':>8} {'peak MB':>8} {'stored':>7} {'spilled':>8} {'expired':>8}")
+
+    for session in range(1, args.sessions + 1):
+        size = rng.randint(int(5 * MB * args.scale), largest)
+        handles[session] = store.put(source[:size], f"session-{session}.jpg")
+
+        # A few reruns from random live sessions; some replace their photo
+        for other in rng.sample(sorted(handles), min(3, len(handles))):
+            data = store.get(handles[other])
+            if data is not None and rng.random() < 0.1:
+                store.discard(handles[other])
+                handles[other] = store.put(source[:size], f"session-{other}-retake.jpg")
+
+        if session % 50 == 0 or session == args.sessions:
+            current, peak = tracemalloc.get_traced_memory()
+            stats = store.stats()
+            print(f"{session:>8} {(current - baseline) / MB:>8.1f} {(peak - baseline) / MB:>8.1f} "
+                  f"{stats['uploads']:>7} {stats['spilled']:>8} {stats['expirations']:>8}")
+        time.sleep(0.005)
+
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    store.close()
+    os.rmdir(spill_dir)
+
+    limit = args.budget_mb * MB + 2 * largest
+    print(f"elapsed {time.perf_counter() - started:.1f}s, peak heap {peak / MB:.1f} MB (limit {limit / MB:.1f} MB)")
+    if peak > limit:
+        sys.exit("peak heap exceeded the upload store budget")
+
+
+if __name__ == "__main__":
+    main()
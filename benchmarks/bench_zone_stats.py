@@ -0,0 +1,61 @@
+"""Micro-benchmark for the per-zone skin statistics.
+
+Compares the summed-area table (built once, then four lookups per rectangle,
+all rectangles at once) against masking and reducing the planes again for
+every zone, for the four face zones and for a grid of 64 cells, on a
+synthetic face at the default analysis size. Both must agree to the rounding
+of the reported statistics.
+
+    python benchmarks/bench_zone_stats.py [--grid 8] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skincare_ai.analysis import analyze_skin, skin_tables, zone_statistics  # noqa: E402
+from tests.images import make_face  # noqa: E402
+from tests.reference import analysis_planes, stats_recompute, zone_rectangles  # noqa: E402
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--grid", type=int, default=8, help="cells per side of the grid case")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rgb = make_face()
+    planes = analysis_planes(rgb)
+    print(f"1000x750 photo, statistics on a {planes[0].shape[1]}x{planes[0].shape[0]} level")
+    print(f"{'case':>14} {'recompute':>11} {'build':>10} {'lookup':>10} {'speedup':>9} {'max error':>10}")
+    for label, zones in zone_rectangles(planes[0].shape, args.grid).items():
+        naive_time, naive = best_of(lambda: stats_recompute(planes, zones), args.repeat)
+        build_time, (table, centre) = best_of(lambda: skin_tables(*planes), args.repeat)
+        lookup_time, tabled = best_of(lambda: zone_statistics(table, centre, zones), args.repeat)
+        assert naive.keys() == tabled.keys()
+        # zone_statistics rounds to two decimals
+        error = max((abs(value - tabled[zone][key]) for zone in naive if naive[zone]
+                     for value, key in zip(naive[zone], ("brightness", "brightness_std", "redness"))), default=0.0)
+        status = "ok" if error <= 0.0051 else "MISMATCH"
+        total_time = build_time + lookup_time
+        print(f"{label:>14} {naive_time * 1000:>9.2f}ms {build_time * 1000:>8.2f}ms {lookup_time * 1000:>8.2f}ms "
+              f"{naive_time / total_time:>8.1f}x {error:>10.4f} {status}")
+
+    timings = [analyze_skin(rgb)["timings_ms"] for _ in range(args.repeat)]
+    print(f"analyze_skin: zones {min(t['zones'] for t in timings):.1f} ms of {min(t['total'] for t in timings):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
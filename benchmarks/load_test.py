@@ -0,0 +1,195 @@
+"""Headless multi-session load test for the Streamlit app.
+
+Each simulated session is a Streamlit AppTest driving the real script through
+upload -> goal selection -> submit -> download, so every step is a full
+rerun of main(), exactly as in the browser. AppTest is not thread-safe
+(concurrent sessions in one process trample each other's widget state), so
+every session runs in a fresh spawned process, up to --concurrency at once.
+Process-wide caches therefore start cold for each session, as for the first
+visitor of a freshly started server. Every session uploads its own photo and
+cycles through the goals. Inference goes to the offline stub in
+tests/stub_server.py.
+
+For each concurrency level it reports throughput, p50/p95/p99 rerun latency
+per step, and the peak RSS of the session processes. Any session error fails
+the run (exit status 1) rather than being averaged away.
+
+    python benchmarks/load_test.py --concurrency 1 4 16 --sessions 8 --output load.json
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.stub_server import StubConfig, start_stub_server  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_run.py")
+GOALS = [
+    "✨ Brightening and luminous skin tone",
+    "⏰ Anti-aging and wrinkle prevention",
+    "🎭 Acne treatment and clear skin",
+    "🌹 Rosacea and redness comfort",
+]
+HISTORY = ["🍊 Vitamin C brightening serum", "🌙 Retinol/Retinoid anti-aging products"]
+STEPS = ("load", "upload", "goal", "history", "submit")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def make_upload(width, height, seed):
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    pixels = np.clip(rng.normal((210, 160, 130), 14, (height, width, 3)), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def run_session(image_bytes, goal, timeout):
+    """One user journey; returns {step: seconds} or raises on an app exception"""
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+
+    def step(name, action):
+        start = time.perf_counter()
+        at = action()
+        timings[name] = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].message}")
+        return at
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    step("load", at.run)
+    step("upload", lambda: at.file_uploader(key="file_uploader")
+         .set_value(("face.jpg", image_bytes, "image/jpeg")).run())
+    step("goal", lambda: at.selectbox(key="goal_selector").set_value(goal).run())
+    step("history", lambda: at.multiselect(key="history_selector").set_value(HISTORY).run())
+    step("submit", lambda: at.button(key="submit_button").click().run())
+
+    if not any("Analysis complete" in element.value for element in at.success):
+        raise RuntimeError("submit did not produce results")
+    # The download button only exists once a report is ready
+    if not at.get("download_button"):
+        raise RuntimeError("no download button after submit")
+    return timings
+
+
+def session_process(job):
+    """Run one session in this (fresh) worker process: (timings, error, peak RSS MB)"""
+    image_bytes, goal, timeout = job
+    try:
+        timings = run_session(image_bytes, goal, timeout)
+    except Exception as e:
+        # Returned as text: AppTest exceptions do not necessarily pickle
+        return None, f"{type(e).__name__}: {e}", peak_rss_mb()
+    return timings, None, peak_rss_mb()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_level(concurrency, sessions, uploads, timeout):
+    errors = []
+    per_step = {name: [] for name in STEPS}
+    peaks = []
+    jobs = [(uploads[index], GOALS[index % len(GOALS)], timeout) for index in range(sessions)]
+
+    start = time.perf_counter()
+    # spawn, one session per process: a forked child would inherit the parent's threads
+    # (the stub server) and a reused one the previous session's module state
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(concurrency, maxtasksperchild=1) as pool:
+        for timings, error, peak in pool.imap_unordered(session_process, jobs):
+            peaks.append(peak)
+            if error is not None:
+                errors.append(error)
+                continue
+            for name, seconds in timings.items():
+                per_step[name].append(seconds * 1000)
+    elapsed = time.perf_counter() - start
+
+    completed = sessions - len(errors)
+    reruns = [ms for samples in per_step.values() for ms in samples]
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "completed": completed,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_s": round(completed / elapsed, 3),
+        "reruns_per_s": round(len(reruns) / elapsed, 3),
+        "rerun_ms": {
+            "p50": round(percentile(reruns, 0.50), 2) if reruns else None,
+            "p95": round(percentile(reruns, 0.95), 2) if reruns else None,
+            "p99": round(percentile(reruns, 0.99), 2) if reruns else None,
+        },
+        "step_p50_ms": {name: round(statistics.median(samples), 2) for name, samples in per_step.items() if samples},
+        "step_p95_ms": {name: round(percentile(samples, 0.95), 2) for name, samples in per_step.items() if samples},
+        "session_peak_rss_mb": {"p50": round(statistics.median(peaks), 1), "max": round(max(peaks), 1)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--sessions", type=int, default=8, help="sessions per concurrency level")
+    parser.add_argument("--image-size", type=int, nargs=2, default=(2000, 1500), metavar=("W", "H"))
+    parser.add_argument("--latency", type=float, default=0.2, help="stub inference latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60, help="per-rerun AppTest timeout, seconds")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    url, server = start_stub_server(StubConfig(latency=args.latency, error_rate=args.error_rate, seed=1))
+    # Inherited by the spawned session processes, which import the app (and skincare_ai) afresh
+    os.environ["HF_API_URL"] = url
+    os.environ["HF_API_KEY"] = "stub"
+
+    results = []
+    seed = 0
+    try:
+        for concurrency in args.concurrency:
+            uploads = [make_upload(*args.image_size, seed=seed + i) for i in range(args.sessions)]
+            seed += args.sessions
+            level = run_level(concurrency, args.sessions, uploads, args.timeout)
+            del uploads
+            results.append(level)
+            if level["errors"]:
+                print(f"concurrency {concurrency:>3}: FAILED, {len(level['errors'])}/{level['sessions']} "
+                      f"sessions raised")
+                for error in level["errors"]:
+                    print(f"    error: {error}")
+                continue
+            rerun = level["rerun_ms"]
+            print(f"concurrency {concurrency:>3}: {level['completed']}/{level['sessions']} sessions, "
+                  f"{level['sessions_per_s']:.2f} sessions/s, rerun p50 {rerun['p50']} / p95 {rerun['p95']} / "
+                  f"p99 {rerun['p99']} ms, session peak RSS {level['session_peak_rss_mb']['max']} MB")
+    finally:
+        server.shutdown()
+
+    failed = any(level["errors"] for level in results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"image_size": args.image_size, "stub_latency_s": args.latency, "failed": failed,
+                       "levels": results}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Benchmark suite for the hot paths, with machine-readable output.
+
+Times brightness scoring, the fused skin analysis, local goal matching,
+report assembly and end-to-end process_skincare_request over a fixed corpus
+of generated images (several resolutions, JPEG and PNG). Remote inference
+goes to the offline stub in tests/stub_server.py with configurable latency,
+error and timeout rates, so runs are repeatable without network access.
+
+    python benchmarks/run_suite.py --output bench.json
+    python benchmarks/run_suite.py --compare bench.json    # ratios against an earlier run
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.stub_server import StubConfig, start_stub_server  # noqa: E402
+from skincare_ai.analysis import analyze_image_bytes, measure_brightness  # noqa: E402
+from skincare_ai.cache import RecommendationCache  # noqa: E402
+from skincare_ai.dedup import get_analysis_index  # noqa: E402
+from skincare_ai.imaging import clear_image_cache  # noqa: E402
+from skincare_ai.inference import InferenceClient  # noqa: E402
+from skincare_ai.pipeline import process_skincare_request  # noqa: E402
+from skincare_ai.recommendation import match_goal  # noqa: E402
+from skincare_ai.report import REPORT_FORMATS, render_report  # noqa: E402
+
+RESOLUTIONS = {
+    "0.3MP": (640, 480),
+    "2MP": (1600, 1200),
+    "12MP": (4000, 3000),
+}
+FORMATS = ("JPEG", "PNG")
+GOALS = [
+    "✨ Brightening and luminous skin tone",
+    "⏰ Anti-aging and wrinkle prevention",
+    "🎭 Acne treatment and clear skin",
+    "🌹 Rosacea and redness comfort",
+    "⚖️ Oil control and mattifying balance",
+    "🌟 Natural radiance enhancement",
+]
+HISTORY = "🍊 Vitamin C brightening serum, 🌙 Retinol/Retinoid anti-aging products | Skin Type: Oily"
+
+
+def make_image(size, image_format, seed=3):
+    """Skin-toned noise over a gradient, so codecs and metrics do realistic work"""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0.7, 1.0, width, dtype=np.float32)[None, :, None]
+    base = np.array([224, 172, 140], dtype=np.float32) * gradient
+    pixels = np.clip(base + rng.normal(0, 12, (height, width, 3)), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=image_format, **({"quality": 90} if image_format == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+def measure(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    results = []
+
+    def record(name, params, stats):
+        results.append(dict(name=name, params=params, **stats))
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{name:<26} {label:<50} p50 {stats['p50_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms")
+
+    corpus = {(res, fmt): make_image(size, fmt) for res, size in RESOLUTIONS.items() for fmt in FORMATS}
+    sample = corpus[("2MP", "JPEG")]
+
+    for (res, fmt), data in corpus.items():
+        record("calculate_brightness", {"resolution": res, "format": fmt},
+               measure(lambda: measure_brightness(data), args.repeat))
+        record("analyze_image", {"resolution": res, "format": fmt},
+               measure(lambda: analyze_image_bytes(data, reuse=False), args.repeat))
+
+    goals = GOALS * 500
+    record("get_local_recommendation", {"goals": len(goals)},
+           measure(lambda: [match_goal(goal) for goal in goals], args.repeat))
+
+    offline = InferenceClient(url=None)
+    result, _ = process_skincare_request(sample, GOALS[0], HISTORY, client=offline)
+    for report_format in REPORT_FORMATS:
+        record("report_assembly", {"format": report_format},
+               measure(lambda: render_report(result, report_format), args.repeat * 20))
+
+    config = StubConfig(latency=args.latency, error_rate=args.error_rate, timeout_rate=args.timeout_rate,
+                        hang_seconds=args.timeout * 2, seed=5)
+    url, server = start_stub_server(config)
+    client = InferenceClient(url=url, api_key="stub", timeout=args.timeout, retries=1, backoff=0.05)
+    stub_params = {"latency_s": args.latency, "error_rate": args.error_rate, "timeout_rate": args.timeout_rate}
+    try:
+        def cold():
+            clear_image_cache()
+            get_analysis_index().clear()
+            process_skincare_request(sample, GOALS[2], HISTORY, client=client, cache=RecommendationCache())
+
+        warm_cache = RecommendationCache()
+
+        def warm():
+            process_skincare_request(sample, GOALS[2], HISTORY, client=client, cache=warm_cache)
+
+        e2e_repeat = max(3, args.repeat // 2)
+        record("process_skincare_request", dict(stub_params, path="cold"), measure(cold, e2e_repeat))
+        record("process_skincare_request", dict(stub_params, path="cached"), measure(warm, e2e_repeat))
+        record("process_skincare_request", dict(stub_params, path="local_only"),
+               measure(lambda: process_skincare_request(sample, GOALS[3], HISTORY, client=offline), e2e_repeat))
+    finally:
+        client.close()
+        offline.close()
+        server.shutdown()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline['meta'].get('revision')} (p50 ratio, <1 is faster):")
+    for result in report["results"]:
+        before = previous.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if before and before["p50_ms"]:
+            label = " ".join(f"{k}={v}" for k, v in result["params"].items())
+            print(f"  {result['name']:<26} {label:<50} {result['p50_ms'] / before['p50_ms']:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub inference latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=1.0, help="client timeout against the stub, seconds")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
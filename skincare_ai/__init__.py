@@ -0,0 +1,30 @@
+"""Streamlit-free core of the AI Skincare Recommendation System"""
+from .analysis import (
+    ANALYSIS_MAX_PIXELS,
+    BRIGHTNESS_MAX_PIXELS,
+    BRIGHTNESS_TOLERANCE,
+    analyze_image_bytes,
+    analyze_or_reuse,
+    analyze_skin,
+    brightness_level,
+    calculate_brightness,
+    measure_brightness,
+)
+from .pipeline import build_response, process_skincare_request
+from .recommendation import get_local_recommendation, get_skincare_recommendation
+
+__all__ = [
+    "ANALYSIS_MAX_PIXELS",
+    "BRIGHTNESS_MAX_PIXELS",
+    "BRIGHTNESS_TOLERANCE",
+    "analyze_image_bytes",
+    "analyze_or_reuse",
+    "analyze_skin",
+    "brightness_level",
+    "build_response",
+    "calculate_brightness",
+    "get_local_recommendation",
+    "get_skincare_recommendation",
+    "measure_brightness",
+    "process_skincare_request",
+]
@@ -0,0 +1,396 @@
+"""Image analysis: brightness and skin metrics on uploaded photos"""
+import copy
+import io
+import logging
+import math
+import os
+import time
+
+from . import pngbands
+from .dedup import get_analysis_index, perceptual_hash
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+ImageStat = lazy_import("PIL.ImageStat")
+
+logger = logging.getLogger(__name__)
+
+# Size of the array every skin metric is computed from
+ANALYSIS_MAX_PIXELS = 1_000_000
+# CPU time the fused metric pass is expected to fit in; overruns are logged
+ANALYSIS_BUDGET_MS = 100.0
+# Pixels brighter than this with little colour spread count as specular shine
+SHINE_LUMA_THRESHOLD = 220
+SHINE_MAX_SPREAD = 40
+
+# Skin pixels by chrominance (Chai & Ngan's YCbCr box), which holds across skin tones and lighting
+SKIN_CB_RANGE = (77, 127)
+SKIN_CR_RANGE = (133, 173)
+# The skin statistics run on the first pyramid level (repeated 2x2 averaging) whose longer
+# side is at most this; zone means need far fewer pixels than texture does
+SKIN_LEVEL_MAX_SIDE = 320
+# Fewer skin pixels than this (on that level) and there is no face to divide into zones
+SKIN_MIN_PIXELS = 256
+ZONE_MIN_PIXELS = 16
+# Share of skin pixels cut from each side when fitting the face box
+FACE_BOX_TRIM = 0.05
+# (left, top, right, bottom) as fractions of the face box; a zone may span several rectangles
+FACE_ZONES = {
+    "forehead": ((0.25, 0.05, 0.75, 0.25),),
+    "t_zone": ((0.25, 0.05, 0.75, 0.25), (0.40, 0.25, 0.60, 0.65)),
+    "cheeks": ((0.10, 0.45, 0.40, 0.70), (0.60, 0.45, 0.90, 0.70)),
+    "chin": ((0.35, 0.78, 0.65, 0.95),),
+}
+
+# Uploads above this many pixels are rejected from their header, before any decoding
+MAX_IMAGE_PIXELS = int(os.environ.get("SKINCARE_MAX_IMAGE_PIXELS", 80_000_000))
+# PNGs above this many pixels are decoded in bands of rows rather than all at once
+PNG_BANDED_MIN_PIXELS = 8_000_000
+
+# Images larger than this are measured on a box-reduced copy (None = always full resolution)
+BRIGHTNESS_MAX_PIXELS = None
+# Largest score difference accepted between the reduced copy and the full-resolution image
+BRIGHTNESS_TOLERANCE = 0.5
+
+
+class ImageTooLargeError(ValueError):
+    """The upload's header declares more pixels than MAX_IMAGE_PIXELS"""
+
+
+def open_image(image_bytes):
+    """Open an upload, reading only its header, and enforce MAX_IMAGE_PIXELS"""
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.width * img.height > MAX_IMAGE_PIXELS:
+        raise ImageTooLargeError(f"Image is {img.width}x{img.height} pixels; "
+                                 f"the limit is {MAX_IMAGE_PIXELS / 1e6:.0f} megapixels")
+    return img
+
+
+def downscale_for_analysis(img, max_pixels, image_bytes=None):
+    """Reduce an image to at most max_pixels using DCT scaling (JPEG) and box averaging
+
+    Pass the encoded image_bytes as well to let a large PNG be decoded in
+    bands instead of at full resolution.
+    """
+    pixels = img.width * img.height
+    if not max_pixels or pixels <= max_pixels:
+        return img
+
+    factor = math.ceil(math.sqrt(pixels / max_pixels))
+    target = (max(1, img.width // factor), max(1, img.height // factor))
+
+    # JPEG can decode straight to 1/2, 1/4 or 1/8 scale, which skips most of the work
+    if img.format == 'JPEG':
+        img.draft('RGB', target)
+
+    # Box reduction keeps the mean intact, unlike resampling filters. Draft mode
+    # stops at the first DCT scale at or above the target, so what is left may
+    # still need reducing
+    factor = math.ceil(math.sqrt(img.width * img.height / max_pixels))
+    if factor > 1 and img.format == 'PNG' and image_bytes is not None and pixels > PNG_BANDED_MIN_PIXELS:
+        reduced = pngbands.decode_reduced(image_bytes, factor)
+        if reduced is not None:
+            reduced.info.update(img.info)  # keeps eXIf orientation
+            return reduced
+    if factor > 1:
+        img = img.reduce(factor)
+    return img
+
+
+def decode_image(image_bytes, max_pixels=BRIGHTNESS_MAX_PIXELS):
+    """Decode an upload into the grayscale image used for analysis"""
+    img = open_image(image_bytes)
+    return downscale_for_analysis(img, max_pixels, image_bytes).convert('L')  # Convert to grayscale
+
+
+def score_brightness(img):
+    """Average brightness of a decoded grayscale image, from the histogram in one C-level pass"""
+    # ImageStat sums the 256-bin histogram, so the result equals sum(pixels) / count exactly
+    brightness = ImageStat.Stat(img).mean[0]
+    return round(brightness, 2)
+
+
+def measure_brightness(image_bytes, max_pixels=BRIGHTNESS_MAX_PIXELS):
+    """Average grayscale brightness of an encoded image"""
+    img = open_image(image_bytes)
+    pixels = img.width * img.height
+    # A full-resolution measurement of a large PNG only needs the histogram, which sums band by band
+    if img.format == 'PNG' and pixels > PNG_BANDED_MIN_PIXELS and (not max_pixels or pixels <= max_pixels):
+        histogram = pngbands.histogram(image_bytes)
+        if histogram is not None:
+            return round(ImageStat.Stat(histogram).mean[0], 2)
+    return score_brightness(downscale_for_analysis(img, max_pixels, image_bytes).convert('L'))
+
+
+def calculate_brightness(image_bytes, max_pixels=BRIGHTNESS_MAX_PIXELS):
+    """Calculate average brightness of the uploaded image, or None if it cannot be decoded"""
+    try:
+        return measure_brightness(image_bytes, max_pixels)
+    except Exception:
+        logger.exception("Error processing image")
+        return None
+
+
+def decode_analysis_array(image_bytes, max_pixels=ANALYSIS_MAX_PIXELS):
+    """Decode an upload once into the reduced, EXIF-upright RGB array the skin metrics share
+
+    The same pixels as imaging.decode_image_once, so the API, the batch CLI
+    and the app lay the face zones out on the same image.
+    """
+    img = open_image(image_bytes)
+    img = ImageOps.exif_transpose(downscale_for_analysis(img, max_pixels, image_bytes))
+    return np.asarray(img.convert('RGB'))
+
+
+# Pillow's fixed-point ITU-R 601 luma weights (convert('L')), so scores match measure_brightness
+LUMA_WEIGHTS_16 = (19595, 38470, 7471)
+
+
+def _box_sum3(plane):
+    """Sum over each pixel's 3x3 neighbourhood (edges replicated), as two separable passes"""
+    padded = np.pad(plane, 1, mode='edge')
+    rows = padded[:, :-2] + padded[:, 1:-1] + padded[:, 2:]
+    return rows[:-2] + rows[1:-1] + rows[2:]
+
+
+def _half(plane):
+    """Next pyramid level: 2x2 box average (an odd last row/column is dropped)"""
+    height, width = plane.shape[0] // 2 * 2, plane.shape[1] // 2 * 2
+    plane = plane[:height, :width]
+    return (plane[0::2, 0::2] + plane[0::2, 1::2] + plane[1::2, 0::2] + plane[1::2, 1::2]) * 0.25
+
+
+def skin_mask(red, green, blue):
+    """Boolean mask of skin-coloured pixels from float channel planes (ITU-R 601 chroma)"""
+    cb = 128 - 0.168736 * red - 0.331264 * green + 0.5 * blue
+    cr = 128 + 0.5 * red - 0.418688 * green - 0.081312 * blue
+    return (cb >= SKIN_CB_RANGE[0]) & (cb <= SKIN_CB_RANGE[1]) & (cr >= SKIN_CR_RANGE[0]) & (cr <= SKIN_CR_RANGE[1])
+
+
+class SummedAreaTable:
+    """Sums of one or more same-shaped 2-D planes over any axis-aligned rectangle in O(1)"""
+
+    def __init__(self, *planes):
+        height, width = planes[0].shape
+        # Zero first row and column, so rectangles touching the edge need no special case;
+        # accumulating in place over the contiguous table is ~1.6x faster than into the inner views
+        table = np.zeros((len(planes), height + 1, width + 1), dtype=np.float64)
+        for layer, plane in zip(table, planes):
+            layer[1:, 1:] = plane
+        table.cumsum(axis=1, out=table)
+        table.cumsum(axis=2, out=table)
+        self.table = table
+
+    def sums(self, rectangles):
+        """(planes, rectangles) array of sums over (left, top, right, bottom) rectangles,
+        each covering rows top..bottom-1 and columns left..right-1"""
+        left, top, right, bottom = np.asarray(rectangles, dtype=np.intp).reshape(-1, 4).T
+        table = self.table
+        return table[:, bottom, right] - table[:, top, right] - table[:, bottom, left] + table[:, top, left]
+
+
+def skin_tables(red, green, blue, luma, redness):
+    """(table, centre): a SummedAreaTable of the skin count, luma, squared luma deviation
+    from centre and redness, each masked to skin pixels; centre is the mean skin luma"""
+    skin = skin_mask(red, green, blue).astype(np.float32)
+    skin_luma = luma * skin
+    count = float(skin.sum(dtype=np.float64))
+    # Squares are taken around the overall skin mean: E[x^2] - mean^2 on raw luma loses
+    # most of its digits to cancellation in float32
+    centre = float(skin_luma.sum(dtype=np.float64)) / count if count else 0.0
+    centred = (luma - np.float32(centre)) * skin
+    return SummedAreaTable(skin, skin_luma, centred * centred, redness * skin), centre
+
+
+def zone_statistics(table: SummedAreaTable, centre: float, zones: dict) -> dict:
+    """{name: statistics or None} for zones mapping names to (left, top, right, bottom) pixel
+    rectangles; every rectangle is looked up at once, so the cost barely depends on the count"""
+    result = dict.fromkeys(zones)
+    # reduceat cannot sum an empty run, so zones without rectangles stay None
+    names = [name for name in zones if zones[name]]
+    if not names:
+        return result
+    rectangles = [rectangle for name in names for rectangle in zones[name]]
+    starts = np.cumsum([0] + [len(zones[name]) for name in names[:-1]])
+    sums = np.add.reduceat(table.sums(rectangles), starts, axis=1)
+
+    for name, (pixels, luma_sum, deviation_sq, redness_sum) in zip(names, sums.T.tolist()):
+        area = sum((right - left) * (bottom - top) for left, top, right, bottom in zones[name])
+        if pixels < ZONE_MIN_PIXELS:
+            continue
+        mean = luma_sum / pixels
+        result[name] = {
+            "skin_coverage": round(pixels / area * 100, 2),
+            "brightness": round(mean, 2),
+            "brightness_std": round(math.sqrt(max(deviation_sq / pixels - (mean - centre) ** 2, 0.0)), 2),
+            "redness": round(redness_sum / pixels / 255 * 100, 2),
+        }
+    return result
+
+
+def face_box(counts):
+    """(left, top, right, bottom) holding the central skin pixels, from the skin-count layer"""
+    columns = counts[-1]  # skin pixels left of each column boundary
+    rows = counts[:, -1]
+    total = columns[-1]
+    lo, hi = total * FACE_BOX_TRIM, total * (1 - FACE_BOX_TRIM)
+    left, right = int(np.searchsorted(columns, lo, side="right")) - 1, int(np.searchsorted(columns, hi))
+    top, bottom = int(np.searchsorted(rows, lo, side="right")) - 1, int(np.searchsorted(rows, hi))
+    return max(left, 0), max(top, 0), max(right, left + 1), max(bottom, top + 1)
+
+
+def skin_statistics(red, green, blue, luma, redness) -> dict:
+    """Skin coverage and brightness, plus the FACE_ZONES statistics, from full-size 2-D float planes
+
+    Measured on the first pyramid level at most SKIN_LEVEL_MAX_SIDE long, with
+    the zones laid out over the box holding the central skin pixels.
+    """
+    planes = (red, green, blue, luma, redness)
+    while max(planes[0].shape) > SKIN_LEVEL_MAX_SIDE and min(planes[0].shape) >= 2:
+        planes = tuple(_half(plane) for plane in planes)
+    table, centre = skin_tables(*planes)
+
+    counts = table.table[0]
+    count = counts[-1, -1]
+    height, width = planes[0].shape
+    result = {
+        "skin_coverage": round(float(count) / (height * width) * 100, 2),
+        "skin_brightness": round(centre, 2) if count else None,
+        "zones": {},
+    }
+    if count < SKIN_MIN_PIXELS:
+        return result
+
+    left, top, right, bottom = face_box(counts)
+    box_width, box_height = right - left, bottom - top
+    zones = {zone: [(left + int(x0 * box_width), top + int(y0 * box_height),
+                     left + int(x1 * box_width), top + int(y1 * box_height)) for x0, y0, x1, y1 in rectangles]
+             for zone, rectangles in FACE_ZONES.items()}
+    result["zones"] = zone_statistics(table, centre, zones)
+    return result
+
+
+def analyze_skin(rgb) -> dict:
+    """All skin metrics from one decoded RGB array, with a per-metric timing breakdown
+
+    The array is converted once to contiguous float32 channel planes; luma
+    and those planes are shared by every metric below.
+    """
+    timings = {}
+    started = clock = time.perf_counter()
+
+    def lap(name):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[name] = round((now - clock) * 1000, 3)
+        clock = now
+
+    height, width = rgb.shape[:2]
+    count = height * width
+    wide = np.ascontiguousarray(rgb.reshape(count, 3).T, dtype=np.uint32)
+    gray = (wide[0] * LUMA_WEIGHTS_16[0] + wide[1] * LUMA_WEIGHTS_16[1] + wide[2] * LUMA_WEIGHTS_16[2] + 0x8000) >> 16
+    planes = wide.astype(np.float32)
+    red, green, blue = planes
+    luma = gray.astype(np.float32)
+    lap("prepare")
+
+    means = planes.sum(axis=1, dtype=np.float64) / count
+    squares = np.einsum('ij,ij->i', planes, planes, dtype=np.float64) / count
+    stds = np.sqrt(np.maximum(squares - means * means, 0))
+    channels = {
+        name: {"mean": round(float(means[i]), 2), "std": round(float(stds[i]), 2)}
+        for i, name in enumerate(("red", "green", "blue"))
+    }
+    brightness = round(int(gray.sum()) / count, 2)
+    lap("color")
+
+    # How far red exceeds the other channels, 0-100
+    excess = red - (green + blue) * 0.5
+    redness = np.maximum(excess, 0, out=excess).sum(dtype=np.float64) / count / 255 * 100
+    lap("redness")
+
+    # Mean local contrast (3x3 standard deviation) of the luma plane; smooth skin scores low
+    image = luma.reshape(height, width)
+    local_mean = _box_sum3(image) / 9
+    local_var = _box_sum3(image * image) / 9 - local_mean * local_mean
+    texture = np.sqrt(np.maximum(local_var, 0, out=local_var)).mean(dtype=np.float64)
+    lap("texture")
+
+    # Share of near-white, low-saturation pixels, i.e. specular highlights, in percent
+    spread = np.maximum(np.maximum(red, green), blue) - np.minimum(np.minimum(red, green), blue)
+    shine = np.count_nonzero((luma > SHINE_LUMA_THRESHOLD) & (spread < SHINE_MAX_SPREAD)) / count * 100
+    lap("shine")
+
+    # Skin-only and per-zone statistics, so background, hair and clothing don't dilute them
+    skin = skin_statistics(red.reshape(height, width), green.reshape(height, width), blue.reshape(height, width),
+                           image, excess.reshape(height, width))
+    lap("zones")
+
+    total = (time.perf_counter() - started) * 1000
+    if total > ANALYSIS_BUDGET_MS:
+        logger.warning("Skin analysis took %.1f ms (budget %.0f ms) on a %dx%d array",
+                       total, ANALYSIS_BUDGET_MS, width, height)
+
+    return {
+        "brightness_score": brightness,
+        "channels": channels,
+        "redness_index": round(float(redness), 2),
+        "texture_score": round(float(texture), 2),
+        "shine_score": round(float(shine), 2),
+        **skin,
+        "timings_ms": dict(timings, total=round(total, 3)),
+        "within_budget": total <= ANALYSIS_BUDGET_MS,
+    }
+
+
+def analyze_or_reuse(rgb, phash=None, index=None) -> dict:
+    """analyze_skin(rgb), or the result for a near-duplicate analysed earlier in this process
+
+    phash is the upload's dedup.perceptual_hash, if the caller already has it;
+    index defaults to the process-wide one. A reused result is a deep copy
+    marked "reused": True, whose timings_ms and within_budget are those of the
+    hash and lookup rather than the original analysis's.
+    """
+    if index is None:
+        index = get_analysis_index()
+    if not index.enabled:
+        return analyze_skin(rgb)
+    start = time.perf_counter()
+    if phash is None:
+        phash = perceptual_hash(rgb)
+    stored = index.get(phash)
+    if stored is None:
+        metrics = analyze_skin(rgb)
+        # Callers may change the nested channels and zones of what they are given
+        index.put(phash, copy.deepcopy(metrics))
+        return metrics
+    metrics = copy.deepcopy(stored)
+    elapsed = round((time.perf_counter() - start) * 1000, 3)
+    metrics["reused"] = True
+    metrics["timings_ms"] = {"reuse": elapsed, "total": elapsed}
+    metrics["within_budget"] = elapsed <= ANALYSIS_BUDGET_MS
+    return metrics
+
+
+def analyze_image_bytes(image_bytes, max_pixels=ANALYSIS_MAX_PIXELS, reuse=True):
+    """Decode and analyse an upload, or None if it cannot be decoded (safe for process pools)
+
+    With reuse, a near-duplicate of an upload this process analysed before
+    gets that analysis (see analyze_or_reuse).
+    """
+    try:
+        rgb = decode_analysis_array(image_bytes, max_pixels)
+    except ImageTooLargeError as e:
+        logger.warning("Rejected upload: %s", e)
+        return None
+    except Exception:
+        logger.exception("Error processing image")
+        return None
+    return analyze_or_reuse(rgb) if reuse else analyze_skin(rgb)
+
+
+def brightness_level(brightness_score):
+    """Three-way label shown next to the score"""
+    return "High" if brightness_score > 200 else "Medium" if brightness_score > 100 else "Low"
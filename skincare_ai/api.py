@@ -0,0 +1,207 @@
+"""Async HTTP service exposing the skincare pipeline
+
+    uvicorn skincare_ai.api:app --host 0.0.0.0 --port 8000
+
+Image analysis is CPU-bound and runs in a process pool so it never blocks the
+event loop; the remote inference call is async I/O on a pooled InferenceClient
+(or the backend named by SKINCARE_BACKEND).
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import Body, FastAPI, File, Form, HTTPException, Request, Response, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from .analysis import analyze_image_bytes
+from .backends import DEFAULT_BACKEND, create_backend
+from .cache import get_default_cache
+from .history import get_history_store
+from .inference import InferenceClient
+from .metrics import get_metrics, start_request
+from .pipeline import build_response
+from .progress import StageReporter
+from .recommendation import get_skincare_recommendation_async, in_flight
+from .report import REPORT_FORMATS, ReportArchive, render_report
+from .startup import WARM_UP_ENABLED, warm_up
+
+WORKERS = int(os.environ.get("SKINCARE_WORKERS", os.cpu_count() or 1))
+MAX_CONNECTIONS = int(os.environ.get("SKINCARE_MAX_CONNECTIONS", 100))
+# Longest line accepted in a /reports/archive body (one /analyze response)
+ARCHIVE_MAX_LINE_BYTES = 1_000_000
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.pool = ProcessPoolExecutor(max_workers=WORKERS)
+    app.state.history = get_history_store()
+    if DEFAULT_BACKEND == "hosted":
+        app.state.inference = InferenceClient(max_connections=MAX_CONNECTIONS, max_concurrency=MAX_CONNECTIONS)
+    else:
+        app.state.inference = create_backend()
+    if WARM_UP_ENABLED:
+        # Before the first request: this process's state, then every pool worker's imports
+        await asyncio.to_thread(warm_up, app.state.inference, get_default_cache())
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(app.state.pool, warm_up) for _ in range(WORKERS)))
+    try:
+        yield
+    finally:
+        await app.state.inference.aclose()
+        app.state.pool.shutdown(cancel_futures=True)
+        if app.state.history is not None:
+            # Writes what is still queued
+            await asyncio.to_thread(app.state.history.close)
+
+
+app = FastAPI(title="AI Skincare Recommendation API", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health(request: Request):
+    backend = request.app.state.inference
+    breaker = getattr(backend, "breaker", None)
+    return {"status": "ok", "backend": backend.name, "inference": breaker.state if breaker else "available"}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return dict(get_default_cache().stats(), single_flight=in_flight.stats())
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage histograms and counters in Prometheus text format (empty unless SKINCARE_METRICS=1)"""
+    return get_metrics().render_prometheus()
+
+
+@app.post("/analyze")
+async def analyze(request: Request,
+                  response: Response,
+                  image: UploadFile = File(...),
+                  goal: str = Form(...),
+                  history: str = Form("No previous products mentioned"),
+                  user_id: Optional[str] = Form(None)):
+    """Same payload as the Streamlit results panel; with a user_id the analysis is saved to their history"""
+    trace = start_request()
+    if trace.request_id:
+        response.headers["X-Request-ID"] = trace.request_id
+    progress = StageReporter(trace.listen())
+    image_bytes = await image.read()
+
+    # Decode and analysis both happen in the worker process, which reuses its analyses of near-duplicates
+    loop = asyncio.get_running_loop()
+    with progress.stage("analysis"):
+        metrics = await loop.run_in_executor(request.app.state.pool, analyze_image_bytes, image_bytes)
+    if metrics is None:
+        trace.error("analysis")
+        trace.finish("error")
+        raise HTTPException(status_code=422, detail="Failed to process image")
+    brightness_score = metrics["brightness_score"]
+
+    recommendation = await get_skincare_recommendation_async(goal, history, brightness_score, request.app.state.inference,
+                                                             progress=progress)
+    with progress.stage("report"):
+        payload = build_response(goal, history, brightness_score, recommendation, metrics)
+    if user_id and request.app.state.history is not None:
+        request.app.state.history.record(user_id, metrics, goal)
+    trace.finish()
+    return payload
+
+
+def _history_store(request: Request):
+    store = request.app.state.history
+    if store is None:
+        raise HTTPException(status_code=404, detail="Analysis history is not enabled (set SKINCARE_HISTORY_PATH)")
+    return store
+
+
+@app.get("/users/{user_id}/progress")
+async def user_progress(request: Request, user_id: str):
+    """Running trends of a user's saved analyses: latest, mean, moving average and slope per metric"""
+    progress = await asyncio.to_thread(_history_store(request).progress, user_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No saved analyses for this user")
+    return progress
+
+
+@app.get("/users/{user_id}/analyses")
+async def user_analyses(request: Request, user_id: str, limit: int = 20, before: Optional[float] = None):
+    """A user's saved analyses, newest first; pass the last one's created as before for the next page"""
+    return await asyncio.to_thread(_history_store(request).analyses, user_id, min(max(limit, 1), 100), before)
+
+
+def _report_format(report_format: str):
+    if report_format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(REPORT_FORMATS)}")
+    return REPORT_FORMATS[report_format]
+
+
+@app.post("/report")
+async def report(result: dict = Body(...), format: str = "text"):
+    """Render an /analyze response as a downloadable report"""
+    extension, mime = _report_format(format)
+    try:
+        content = render_report(result, format)
+    except (KeyError, TypeError):
+        raise HTTPException(status_code=422, detail="Body is not an /analyze response") from None
+    return Response(content, media_type=mime,
+                    headers={"Content-Disposition": f'attachment; filename="skincare_report.{extension}"'})
+
+
+async def _json_lines(request: Request) -> AsyncIterator[dict]:
+    """Objects of a JSON-lines request body, parsed as the body arrives"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > ARCHIVE_MAX_LINE_BYTES:
+            raise ValueError(f"A line is longer than {ARCHIVE_MAX_LINE_BYTES} bytes")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+
+@app.post("/reports/archive")
+async def report_archive(request: Request, format: str = "text"):
+    """Zip of reports for a JSON-lines body of /analyze responses (one per line)
+
+    The body is read as the zip is written, so neither the request nor the
+    reports are ever held whole. A first line that is not an /analyze
+    response is a 422; a bad line after that ends the zip unfinished.
+    """
+    _report_format(format)
+    results = _json_lines(request)
+    archive = ReportArchive(format)
+    # The first report decides the status code, before any of the 200 is sent
+    try:
+        head = archive.add("skincare_report_00001", await anext(results))
+    except StopAsyncIteration:
+        head = None
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="Body is not JSON lines of /analyze responses") from None
+
+    async def chunks():
+        if head is not None:
+            yield head
+            index = 1
+            async for result in results:
+                index += 1
+                chunk = await asyncio.to_thread(archive.add, f"skincare_report_{index:05d}", result)
+                if chunk:
+                    yield chunk
+        yield archive.close()
+
+    return StreamingResponse(chunks(), media_type="application/zip",
+                             headers={"Content-Disposition": 'attachment; filename="skincare_reports.zip"'})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", 8000)))
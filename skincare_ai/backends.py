@@ -0,0 +1,308 @@
+"""Interchangeable text-generation backends
+
+Every backend answers the same calls as InferenceClient (generate, agenerate,
+stream, close) and returns hosted-API-shaped results, so the recommendation
+code never needs to know which one it has:
+
+    hosted         the Hugging Face endpoint (InferenceClient)
+    local          a small model run on this machine's CPU via transformers
+    deterministic  canned text derived from the prompt, for tests and benchmarks
+
+SKINCARE_BACKEND picks the process default.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Iterator, Optional, Protocol
+
+from .inference import InferenceClient, InferenceError, get_default_client
+
+DEFAULT_BACKEND = os.environ.get("SKINCARE_BACKEND", "hosted")
+LOCAL_MODEL = os.environ.get("SKINCARE_LOCAL_MODEL", "distilgpt2")
+# Prompts from concurrent sessions are generated together, up to this many per batch
+LOCAL_MAX_BATCH = int(os.environ.get("SKINCARE_LOCAL_BATCH", 8))
+# How long the first prompt of a batch waits for company, seconds
+LOCAL_BATCH_WAIT = 0.02
+# CPU generation is slower than the hosted endpoint, and the first call also loads the model
+LOCAL_TIMEOUT = 30.0
+
+
+class InferenceBackend(Protocol):
+    name: str
+
+    @property
+    def enabled(self) -> bool: ...
+
+    def generate(self, payload: dict, deadline: Optional[float] = None): ...
+
+    async def agenerate(self, payload: dict, deadline: Optional[float] = None): ...
+
+    def stream(self, payload: dict, deadline: Optional[float] = None,
+               stall_timeout: Optional[float] = None) -> Iterator[str]: ...
+
+    def warm_up(self, connect: bool = True): ...
+
+    def close(self): ...
+
+    async def aclose(self): ...
+
+
+class MicroBatcher:
+    """Collects items submitted from many threads and hands them to run_batch together
+
+    A single worker thread takes the first waiting item, waits up to max_wait
+    for more (at most max_batch), calls run_batch(items) and resolves each
+    item's Future with the matching result. An exception returned in place of
+    a result fails only its own item; one raised by run_batch fails the batch.
+    """
+
+    def __init__(self, run_batch, max_batch: int = LOCAL_MAX_BATCH, max_wait: float = LOCAL_BATCH_WAIT):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                    self._worker.start()
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        expires = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Callers that already gave up are dropped rather than generated for
+        return [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = list(self.run_batch([item for item, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"run_batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_text_generator(model_name: str = LOCAL_MODEL):
+    """transformers text-generation pipeline for model_name, loaded once per process"""
+    with _models_lock:
+        generator = _models.get(model_name)
+        if generator is None:
+            try:
+                from transformers import pipeline
+            except ImportError as e:
+                raise InferenceError("The local backend needs the transformers package (and torch)") from e
+            generator = pipeline("text-generation", model=model_name, device=-1)
+            # Decoder-only models batch with left padding; GPT-2 has no pad token of its own
+            generator.tokenizer.padding_side = "left"
+            if generator.tokenizer.pad_token_id is None:
+                generator.tokenizer.pad_token_id = generator.model.config.eos_token_id
+            _models[model_name] = generator
+        return generator
+
+
+class LocalModelBackend:
+    """Offline generation on the CPU with a lazily loaded, process-wide model
+
+    Nothing is loaded until the first request (or load()). Requests from all
+    threads go through one MicroBatcher, so concurrent sessions share forward
+    passes instead of queueing for the model one by one.
+    """
+    name = "local"
+
+    def __init__(self, model_name: str = LOCAL_MODEL, timeout: float = LOCAL_TIMEOUT,
+                 max_batch: int = LOCAL_MAX_BATCH, max_wait: float = LOCAL_BATCH_WAIT):
+        self.model_name = model_name
+        self.timeout = timeout
+        self._batcher = MicroBatcher(self._generate_batch, max_batch, max_wait)
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    def load(self):
+        """Load the model now instead of on the first request"""
+        return load_text_generator(self.model_name)
+
+    def warm_up(self, connect: bool = True):
+        self.load()
+        return True
+
+    def _generate_batch(self, payloads):
+        generator = self.load()
+        results = [None] * len(payloads)
+        # Only prompts with identical generation parameters can share a call
+        groups = {}
+        for index, payload in enumerate(payloads):
+            key = json.dumps(payload.get("parameters", {}), sort_keys=True)
+            groups.setdefault(key, []).append(index)
+        for key, indices in groups.items():
+            parameters = json.loads(key)
+            prompts = [payloads[i]["inputs"] for i in indices]
+            try:
+                outputs = generator(prompts, batch_size=len(prompts), **parameters)
+            except Exception as e:
+                # e.g. bad parameters: fails the prompts that asked for them, not their batch mates
+                outputs = [e] * len(indices)
+            for index, output in zip(indices, outputs):
+                results[index] = output
+        return results
+
+    def generate(self, payload: dict, deadline: Optional[float] = None):
+        future = self._batcher.submit(payload)
+        try:
+            return future.result(timeout=deadline or self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise InferenceError("Local generation deadline exceeded") from None
+        except InferenceError:
+            raise
+        except Exception as e:
+            raise InferenceError(f"Local generation failed: {e}") from e
+
+    async def agenerate(self, payload: dict, deadline: Optional[float] = None):
+        future = self._batcher.submit(payload)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), deadline or self.timeout)
+        except asyncio.TimeoutError:
+            raise InferenceError("Local generation deadline exceeded") from None
+        except InferenceError:
+            raise
+        except Exception as e:
+            raise InferenceError(f"Local generation failed: {e}") from e
+
+    def stream(self, payload: dict, deadline: Optional[float] = None, stall_timeout: Optional[float] = None):
+        # Batched generation finishes all sequences together, so the text arrives as one chunk
+        result = self.generate(payload, deadline)
+        yield result[0].get("generated_text", "")
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+DETERMINISTIC_SENTENCES = (
+    "Cleanse gently morning and evening with a pH-balanced cleanser.",
+    "Apply a niacinamide serum after cleansing to calm redness and refine pores.",
+    "Use a lightweight ceramide moisturiser to support the skin barrier.",
+    "Finish every morning with broad-spectrum SPF 30 or higher.",
+    "Introduce retinol twice a week at night and build up slowly.",
+    "Avoid fragranced products and harsh physical scrubs.",
+    "Expect visible changes after four to eight weeks of consistent use.",
+)
+
+
+class DeterministicBackend:
+    """Canned text chosen by a hash of the prompt: same prompt, same answer, no model or network"""
+    name = "deterministic"
+
+    def __init__(self, latency: float = 0.0, sentences: int = 4):
+        self.latency = latency
+        self.sentences = sentences
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    def text_for(self, prompt: str) -> str:
+        start = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).digest(), "big")
+        count = len(DETERMINISTIC_SENTENCES)
+        return " ".join(DETERMINISTIC_SENTENCES[(start + i) % count] for i in range(min(self.sentences, count)))
+
+    def generate(self, payload: dict, deadline: Optional[float] = None):
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = payload.get("inputs", "")
+        return [{"generated_text": f"{prompt} {self.text_for(prompt)}"}]
+
+    async def agenerate(self, payload: dict, deadline: Optional[float] = None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        prompt = payload.get("inputs", "")
+        return [{"generated_text": f"{prompt} {self.text_for(prompt)}"}]
+
+    def stream(self, payload: dict, deadline: Optional[float] = None, stall_timeout: Optional[float] = None):
+        if self.latency:
+            time.sleep(self.latency)
+        for word in self.text_for(payload.get("inputs", "")).split(" "):
+            yield word + " "
+
+    def warm_up(self, connect: bool = True):
+        return True
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+BACKENDS = {
+    "hosted": InferenceClient,
+    "local": LocalModelBackend,
+    "deterministic": DeterministicBackend,
+}
+
+
+def create_backend(name: Optional[str] = None, **options) -> InferenceBackend:
+    """New backend by name (default SKINCARE_BACKEND); options go to its constructor"""
+    name = name or DEFAULT_BACKEND
+    try:
+        factory = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend {name!r}; expected one of {', '.join(BACKENDS)}") from None
+    return factory(**options)
+
+
+_default_backend = None
+_default_backend_lock = threading.Lock()
+
+
+def get_default_backend() -> InferenceBackend:
+    """Process-wide backend chosen by SKINCARE_BACKEND, created on first use"""
+    global _default_backend
+    if _default_backend is None:
+        with _default_backend_lock:
+            if _default_backend is None:
+                _default_backend = get_default_client() if DEFAULT_BACKEND == "hosted" else create_backend()
+    return _default_backend
@@ -0,0 +1,309 @@
+"""Headless batch processing of photo archives
+
+    python -m skincare_ai.batch photos/ --goal "Acne treatment" -o results.jsonl
+    python -m skincare_ai.batch manifest.csv -o results.jsonl --workers 8
+
+The source is a directory (searched recursively for images, all given the
+same --goal and --history) or a manifest: CSV with a header, or JSON lines,
+with path, goal and history columns and an optional id. Manifest paths are
+relative to the manifest's directory.
+
+Each image is analysed and given a recommendation in a worker process, and
+written to the output as one JSON line as soon as it finishes (in completion
+order), always from its own analysis, never a near-duplicate's. Only a
+bounded window of jobs is in flight and workers read the files themselves,
+so memory stays flat however large the archive is.
+Re-running with the same output resumes: records already written
+successfully are skipped, failed ones are dropped from the output and
+retried, so each id ends up with one record. A worker that raises or
+dies only fails the images it was holding; a broken pool is replaced.
+
+Throughput is reported on stderr while running and at the end. Nothing here
+imports Streamlit.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, NamedTuple, Optional
+
+from .analysis import analyze_image_bytes
+from .backends import create_backend
+from .pipeline import build_response
+from .recommendation import get_skincare_recommendation
+from .startup import WARM_UP_ENABLED, warm_up
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"})
+DEFAULT_GOAL = "General skin health"
+DEFAULT_HISTORY = "No previous products mentioned"
+# Jobs submitted per worker ahead of the results being written
+JOBS_PER_WORKER = 4
+# Seconds between progress lines on stderr
+PROGRESS_INTERVAL = 10.0
+
+
+class BatchItem(NamedTuple):
+    id: str
+    path: str
+    goal: str
+    history: str
+
+
+def scan_directory(directory: str, goal: str = DEFAULT_GOAL, history: str = DEFAULT_HISTORY) -> Iterator[BatchItem]:
+    """Images under directory in a stable (sorted) order, keyed by their relative path"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                path = os.path.join(root, name)
+                item_id = os.path.relpath(path, directory).replace(os.sep, "/")
+                yield BatchItem(item_id, path, goal, history)
+
+
+def read_manifest(manifest: str, goal: str = DEFAULT_GOAL, history: str = DEFAULT_HISTORY) -> Iterator[BatchItem]:
+    """Rows of a CSV or JSON-lines manifest; goal and history fill in missing columns
+
+    Rows without an id are keyed by their path, with "#2", "#3"... appended
+    when the same path appears again (e.g. one photo scored for two goals).
+    """
+    base = os.path.dirname(os.path.abspath(manifest))
+    seen = {}
+    with open(manifest, newline="", encoding="utf-8") as f:
+        if manifest.lower().endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            path = (row.get("path") or "").strip()
+            if not path:
+                continue
+            item_id = (row.get("id") or "").strip()
+            if not item_id:
+                seen[path] = seen.get(path, 0) + 1
+                item_id = path if seen[path] == 1 else f"{path}#{seen[path]}"
+            yield BatchItem(item_id, os.path.join(base, path), row.get("goal") or goal, row.get("history") or history)
+
+
+def iter_items(source: str, goal: str = DEFAULT_GOAL, history: str = DEFAULT_HISTORY) -> Iterator[BatchItem]:
+    if os.path.isdir(source):
+        return scan_directory(source, goal, history)
+    return read_manifest(source, goal, history)
+
+
+def completed_ids(output: str) -> set:
+    """Ids already written successfully to output, which is tidied up for appending to
+
+    Error records are dropped (their ids are about to be retried, so the rerun
+    writes the only record for each) and a torn last line from an interrupted
+    run is cut off. The file is only rewritten when there are errors to drop.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "rb+") as f:
+        valid_end = 0
+        failed = False
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            valid_end += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == "success":
+                done.add(record["id"])
+            else:
+                failed = True
+        f.truncate(valid_end)
+    if failed:
+        _drop_failed(output)
+    return done
+
+
+def _drop_failed(output: str):
+    """Rewrite output without its error records, replacing it atomically"""
+    partial = output + ".resume"
+    with open(output, "rb") as f, open(partial, "wb") as kept:
+        for line in f:
+            try:
+                failed = json.loads(line).get("status") != "success"
+            except ValueError:
+                failed = False
+            if not failed:
+                kept.write(line)
+    os.replace(partial, output)
+
+
+_backend = None
+
+
+def _init_worker(backend_name: Optional[str]):
+    global _backend
+    _backend = create_backend(backend_name)
+    if WARM_UP_ENABLED:
+        warm_up(_backend)
+
+
+def process_item(item: BatchItem) -> dict:
+    """One output record (runs in a worker process)"""
+    start = time.perf_counter()
+    record = {"id": item.id, "path": item.path}
+    try:
+        with open(item.path, "rb") as f:
+            image_bytes = f.read()
+    except OSError as e:
+        return dict(record, status="error", error=f"Cannot read image: {e.strerror or e}")
+
+    # No near-duplicate reuse: a record must not depend on which images this worker saw before
+    metrics = analyze_image_bytes(image_bytes, reuse=False)
+    if metrics is None:
+        return dict(record, status="error", error="Failed to process image", bytes=len(image_bytes))
+
+    warnings = []
+    recommendation = get_skincare_recommendation(item.goal, item.history, metrics["brightness_score"],
+                                                 on_warning=warnings.append, client=_backend)
+    record.update(build_response(item.goal, item.history, metrics["brightness_score"], recommendation, metrics))
+    if warnings:
+        record["warnings"] = warnings
+    record["bytes"] = len(image_bytes)
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+
+class Throughput:
+    """Counts for the progress lines and the final summary"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.processed = 0
+        self.errors = 0
+        self.skipped = 0
+        self.bytes = 0
+
+    def add(self, record: dict):
+        self.processed += 1
+        self.errors += record["status"] != "success"
+        self.bytes += record.get("bytes", 0)
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "elapsed_s": round(elapsed, 2),
+            "images_per_s": round(self.processed / elapsed, 2) if elapsed else 0.0,
+            "mb_per_s": round(self.bytes / 1e6 / elapsed, 2) if elapsed else 0.0,
+        }
+
+    def line(self) -> str:
+        s = self.summary()
+        return (f"{s['processed']} processed ({s['errors']} errors, {s['skipped']} skipped) in {s['elapsed_s']} s: "
+                f"{s['images_per_s']} images/s, {s['mb_per_s']} MB/s")
+
+
+def run_batch(items, out, workers: int = os.cpu_count() or 1, backend: Optional[str] = None,
+              skip: frozenset = frozenset(), progress_interval: float = PROGRESS_INTERVAL,
+              log=sys.stderr) -> dict:
+    """Process items on a pool of workers, writing one JSON line per item to out as it completes"""
+    throughput = Throughput()
+    window = workers * JOBS_PER_WORKER
+    pending = {}  # future -> item
+    next_report = time.monotonic() + progress_interval
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend,))
+
+    def write(future, item):
+        try:
+            record = future.result()
+        except Exception as e:
+            # A crashed worker (BrokenProcessPool) fails every job it had in flight, not just its own
+            logger.warning("Worker failed on %s: %r", item.id, e)
+            record = {"id": item.id, "path": item.path, "status": "error",
+                      "error": f"Worker failed: {type(e).__name__}: {e}"}
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        throughput.add(record)
+
+    def drain(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            write(future, pending.pop(future))
+
+    pool = new_pool()
+    try:
+        for item in items:
+            if item.id in skip:
+                throughput.skipped += 1
+                continue
+            try:
+                future = pool.submit(process_item, item)
+            except BrokenProcessPool:
+                # Record what the dead pool still held, then carry on with a fresh one
+                drain(return_when=ALL_COMPLETED)
+                pool.shutdown(wait=False)
+                pool = new_pool()
+                future = pool.submit(process_item, item)
+            pending[future] = item
+            if len(pending) >= window:
+                drain(return_when=FIRST_COMPLETED)
+            if log and time.monotonic() >= next_report:
+                print(throughput.line(), file=log, flush=True)
+                next_report = time.monotonic() + progress_interval
+        while pending:
+            drain(return_when=FIRST_COMPLETED)
+    except BaseException:
+        # Whatever finished is already written; the rest is picked up on resume
+        for future in pending:
+            future.cancel()
+        raise
+    finally:
+        pool.shutdown()
+    return throughput.summary()
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse a directory or manifest of photos into JSON lines")
+    parser.add_argument("source", help="image directory, or CSV / JSON-lines manifest (path, goal, history, id)")
+    parser.add_argument("-o", "--output", help="JSON-lines file to write (and resume); default stdout")
+    parser.add_argument("--goal", default=DEFAULT_GOAL, help="goal for images without one")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="product history for images without one")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backend", help="inference backend (default SKINCARE_BACKEND)")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the output instead of resuming it")
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+
+    if not os.path.exists(args.source):
+        parser.error(f"{args.source} does not exist")
+
+    skip = frozenset()
+    if args.output and not args.no_resume:
+        skip = frozenset(completed_ids(args.output))
+    out = open(args.output, "w" if args.no_resume else "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        summary = run_batch(iter_items(args.source, args.goal, args.history), out, args.workers, args.backend,
+                            skip, args.progress_interval)
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume", file=sys.stderr)
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
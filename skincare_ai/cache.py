@@ -0,0 +1,158 @@
+"""Two-tier recommendation cache
+
+Keys are normalised (goal, sorted history, skin type, age, brightness bucket)
+tuples, so users who pick the same dropdown options share an entry. The memory
+tier is a per-process LRU with TTL; the optional SQLite tier survives restarts
+and is shared by every worker process pointing at the same file.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Width of a brightness bucket on the 0-255 scale
+BRIGHTNESS_BUCKET_SIZE = 32
+DEFAULT_TTL = int(os.environ.get("SKINCARE_CACHE_TTL", 6 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("SKINCARE_CACHE_ENTRIES", 1024))
+DEFAULT_CACHE_PATH = os.environ.get("SKINCARE_CACHE_PATH")
+
+
+def normalize_history(history: str):
+    """Split the UI's history text into (sorted products, skin type, age)"""
+    products, skin_type, age = [], "", ""
+    for segment in (history or "").split("|"):
+        segment = segment.strip()
+        if segment.startswith("Skin Type:"):
+            skin_type = segment.split(":", 1)[1].strip().lower()
+        elif segment.startswith("Age:"):
+            age = segment.split(":", 1)[1].strip().lower()
+        else:
+            products.extend(p.strip().lower() for p in segment.split(",") if p.strip())
+    return tuple(sorted(set(products))), skin_type, age
+
+
+def make_cache_key(goal: str, history: str, brightness: float) -> str:
+    products, skin_type, age = normalize_history(history)
+    goal = " ".join((goal or "").lower().split())
+    bucket = int(brightness // BRIGHTNESS_BUCKET_SIZE)
+    return json.dumps([goal, products, skin_type, age, bucket], ensure_ascii=False)
+
+
+class RecommendationCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 path: Optional[str] = DEFAULT_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            # WAL lets several worker processes read while one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS recommendations "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._entries[key]
+                self._stats["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires FROM recommendations WHERE key = ? AND expires > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self._stats["disk_hits"] += 1
+                    return value
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value):
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO recommendations (key, value, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires),
+                )
+
+    def _remember(self, key, value, expires):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def warm(self) -> int:
+        """Load the newest unexpired disk rows into the memory tier; returns how many"""
+        if self._db is None:
+            return 0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value, expires FROM recommendations WHERE expires > ? ORDER BY expires DESC LIMIT ?",
+                (time.time(), self.max_entries),
+            ).fetchall()
+            # Oldest first, so the newest end up most recently used
+            for key, value, expires in reversed(rows):
+                if key not in self._entries:
+                    self._remember(key, json.loads(value), expires)
+        return len(rows)
+
+    def prune(self):
+        """Drop expired rows from the disk tier"""
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM recommendations WHERE expires <= ?", (time.time(),))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM recommendations")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> RecommendationCache:
+    """Process-wide cache, created on first use"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = RecommendationCache()
+    return _default_cache
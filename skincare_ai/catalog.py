@@ -0,0 +1,261 @@
+"""Product and ingredient catalog, indexed as bitsets
+
+The catalog file (data/catalog.json, or SKINCARE_CATALOG_PATH) lists the
+ingredients and the names they go by in a product history, pairs of
+ingredients that should not be used together, each goal category's key and
+avoided ingredients, and the products with their ingredients and goals.
+
+It is loaded once into integer bitsets: per product, the ingredients it has;
+per ingredient and per goal, the products that have it. Ranking for a goal
+and a product history is then big-integer ORs and ANDs over the products:
+to find the eligible ones (serving the goal, with nothing that conflicts with
+what the user already uses), and to score them all at once with bit-sliced
+counters, so only the products actually returned are ever visited one by one.
+"""
+import json
+import logging
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+from .cache import normalize_history
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.environ.get("SKINCARE_CATALOG_PATH") or \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "catalog.json")
+# Goal category for goals that match no catalog category
+GENERAL_GOAL = "general"
+# Score weights: each key ingredient for the goal, and each active the user already uses
+KEY_INGREDIENT_WEIGHT = 2
+DUPLICATE_WEIGHT = 1
+
+
+class CatalogError(ValueError):
+    """The catalog file is malformed or refers to unknown ingredients or goals"""
+
+
+class Product(NamedTuple):
+    name: str
+    type: str
+    ingredients: tuple
+    goals: tuple
+
+
+def _bitset(positions, size: int) -> int:
+    """Integer with the given bits set, built in a buffer (ORing bits into a growing int is quadratic)"""
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _bit_counts(masks) -> List[int]:
+    """Bit-sliced per-position counts of the masks: bit i of plane j is bit j of position i's count"""
+    planes = []
+    for carry in masks:
+        for j, plane in enumerate(planes):
+            planes[j], carry = plane ^ carry, plane & carry
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+    return planes
+
+
+def _count_equals(planes: List[int], count: int, within: int) -> int:
+    """Positions in within whose count (from _bit_counts) is exactly count"""
+    if count >> len(planes):
+        return 0
+    for j, plane in enumerate(planes):
+        within &= plane if count >> j & 1 else ~plane
+    return within
+
+
+def _set_bits(mask: int) -> List[int]:
+    """Positions of the set bits of mask, lowest first"""
+    digits = bin(mask)[:1:-1]  # least significant first, without the "0b"
+    positions = []
+    position = digits.find("1")
+    while position >= 0:
+        positions.append(position)
+        position = digits.find("1", position + 1)
+    return positions
+
+
+class Catalog:
+    def __init__(self, data: dict):
+        ingredients = data.get("ingredients") or {}
+        self.ingredient_ids = list(ingredients)
+        self.ingredient_names = [ingredients[key].get("name", key) for key in self.ingredient_ids]
+        self._bit = {key: bit for bit, key in enumerate(self.ingredient_ids)}
+
+        # alias -> ingredient bits; one alias may name several ingredients (e.g. "aha")
+        self._aliases = {}
+        for key, entry in ingredients.items():
+            for alias in entry.get("aliases") or [key.replace("_", " ")]:
+                alias = alias.lower()
+                self._aliases[alias] = self._aliases.get(alias, 0) | 1 << self._bit[key]
+        # Longest alias first, so "vitamin c" wins over a shorter alias at the same position
+        terms = sorted(self._aliases, key=len, reverse=True)
+        self._alias_pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\b") if terms else None
+
+        self.conflicts = [0] * len(self.ingredient_ids)  # per ingredient: the ingredients it conflicts with
+        self._reasons = {}
+        for first, second, reason in data.get("conflicts") or []:
+            a, b = self._lookup(first), self._lookup(second)
+            self.conflicts[a] |= 1 << b
+            self.conflicts[b] |= 1 << a
+            self._reasons[frozenset((a, b))] = reason
+
+        self.goal_key = {}
+        self.goal_avoid = {}
+        for goal, entry in (data.get("goals") or {}).items():
+            self.goal_key[goal] = self.mask(entry.get("key", ()))
+            self.goal_avoid[goal] = self.mask(entry.get("avoid", ()))
+        self.skin_type_avoid = {skin_type.lower(): self.mask(entry.get("avoid", ()))
+                                for skin_type, entry in (data.get("skin_types") or {}).items()}
+
+        self.products = []
+        self.product_ingredients = []  # per product: ingredient bitset
+        with_ingredient = [[] for _ in self.ingredient_ids]
+        with_goal = {goal: [] for goal in self.goal_key}
+        for index, entry in enumerate(data.get("products") or []):
+            mask = self.mask(entry.get("ingredients", ()))
+            for goal in entry.get("goals", ()):
+                if goal not in with_goal:
+                    raise CatalogError(f"Product {entry.get('name')!r} has unknown goal {goal!r}")
+                with_goal[goal].append(index)
+            for bit in _set_bits(mask):
+                with_ingredient[bit].append(index)
+            self.product_ingredients.append(mask)
+            self.products.append(Product(entry["name"], entry.get("type", "product"),
+                                         tuple(self.names(mask)), tuple(entry.get("goals", ()))))
+        size = len(self.products)
+        self.ingredient_products = [_bitset(indexes, size) for indexes in with_ingredient]  # per ingredient
+        self.goal_products = {goal: _bitset(indexes, size) for goal, indexes in with_goal.items()}  # per goal
+
+    def _lookup(self, ingredient: str) -> int:
+        try:
+            return self._bit[ingredient]
+        except KeyError:
+            raise CatalogError(f"Unknown ingredient {ingredient!r}") from None
+
+    def mask(self, ingredients) -> int:
+        """Ingredient bitset of catalog ingredient ids"""
+        mask = 0
+        for ingredient in ingredients:
+            mask |= 1 << self._lookup(ingredient)
+        return mask
+
+    def names(self, mask: int) -> List[str]:
+        return [self.ingredient_names[bit] for bit in _set_bits(mask)]
+
+    def history_ingredients(self, history: str) -> int:
+        """Ingredient bitset of the products named in a history text (the UI's, or free text)"""
+        if self._alias_pattern is None:
+            return 0
+        products, _, _ = normalize_history(history)
+        mask = 0
+        for match in self._alias_pattern.finditer(" , ".join(products)):
+            mask |= self._aliases[match.group()]
+        return mask
+
+    def blocked_ingredients(self, goal: Optional[str], history: str) -> int:
+        """Ingredients to leave out: the goal's avoid list, the skin type's, and every
+        ingredient that conflicts with one already used"""
+        _, skin_type, _ = normalize_history(history)
+        blocked = self.goal_avoid.get(goal or GENERAL_GOAL, 0) | self.skin_type_avoid.get(skin_type, 0)
+        for bit in _set_bits(self.history_ingredients(history)):
+            blocked |= self.conflicts[bit]
+        return blocked
+
+    def eligible(self, goal: Optional[str], history: str = "") -> int:
+        """Product bitset: products serving the goal without a blocked ingredient"""
+        candidates = self.goal_products.get(goal or GENERAL_GOAL, 0)
+        excluded = 0
+        for bit in _set_bits(self.blocked_ingredients(goal, history)):
+            excluded |= self.ingredient_products[bit]
+        return candidates & ~excluded
+
+    def rank(self, goal: Optional[str], history: str = "", limit: int = 5,
+             per_type: Optional[int] = 1) -> List[Product]:
+        """Best eligible products for a goal category (None for the general one), given a history
+
+        Scored by the goal's key ingredients they contain, less the actives the
+        user already uses; ties keep catalog order. per_type caps how many of
+        one type (cleanser, serum...) are suggested.
+        """
+        eligible = self.eligible(goal, history)
+        key = _set_bits(self.goal_key.get(goal or GENERAL_GOAL, 0))
+        used = _set_bits(self.history_ingredients(history))
+        key_hits = _bit_counts(self.ingredient_products[bit] & eligible for bit in key)
+        duplicates = _bit_counts(self.ingredient_products[bit] & eligible for bit in used)
+
+        # score -> bitset of the eligible products with that score
+        levels = {}
+        for hits in range(len(key) + 1):
+            with_hits = _count_equals(key_hits, hits, eligible)
+            for repeats in range(len(used) + 1) if with_hits else ():
+                products = _count_equals(duplicates, repeats, with_hits)
+                if products:
+                    score = KEY_INGREDIENT_WEIGHT * hits - DUPLICATE_WEIGHT * repeats
+                    levels[score] = levels.get(score, 0) | products
+
+        ranked = []
+        taken = {}
+        for score in sorted(levels, reverse=True):
+            for index in _set_bits(levels[score]):
+                product = self.products[index]
+                if per_type is not None:
+                    if taken.get(product.type, 0) >= per_type:
+                        continue
+                    taken[product.type] = taken.get(product.type, 0) + 1
+                ranked.append(product)
+                if len(ranked) >= limit:
+                    return ranked
+        return ranked
+
+    def conflict_notes(self, history: str) -> List[str]:
+        """'Since you use X: avoid Y (reason)' for each conflict with an ingredient in the history"""
+        used = self.history_ingredients(history)
+        notes = []
+        for bit in _set_bits(used):
+            for other in _set_bits(self.conflicts[bit] & ~used):
+                notes.append(f"Since you use {self.ingredient_names[bit]}: avoid {self.ingredient_names[other]} "
+                             f"({self._reasons[frozenset((bit, other))]})")
+        return notes
+
+
+def load_catalog(path: str = CATALOG_PATH) -> Catalog:
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise CatalogError(f"{path} is not valid JSON: {e}") from None
+    try:
+        return Catalog(data)
+    except CatalogError:
+        raise
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        # Entries of the wrong shape: a product without a name, a conflict that is not a triple...
+        raise CatalogError(f"{path} has a malformed entry: {type(e).__name__}: {e}") from None
+
+
+_catalog = None
+
+
+def get_catalog() -> Catalog:
+    """The catalog at CATALOG_PATH, loaded on first use (or by the startup warm-up)
+
+    A missing or malformed file is logged once and leaves an empty catalog,
+    so the local recommendations (the fallback during an outage) keep working.
+    """
+    global _catalog
+    if _catalog is None:
+        try:
+            _catalog = load_catalog()
+        except (OSError, ValueError) as e:
+            logger.warning("Product catalog unavailable: %s", e)
+            _catalog = Catalog({})
+    return _catalog
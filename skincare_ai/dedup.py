@@ -0,0 +1,188 @@
+"""Near-duplicate uploads: perceptual hashes and an index of recent ones
+
+A re-saved, recompressed, resized or slightly cropped copy of a photo has new
+bytes, so content_digest misses it, but its dHash (which way luma steps
+between neighbouring cells of a 9x8 thumbnail) moves only a few of its 64
+bits; unrelated photos differ in a dozen or more. Recent analyses are indexed
+by that hash split into bands, so the earlier uploads within
+DUPLICATE_DISTANCE bits are found from a few dict lookups, not by comparing
+against every entry. (A BK-tree prunes poorly at this radius: it still
+visits about a third of its nodes.)
+
+dHash ignores overall exposure, which is exactly what the brightness score
+measures, so a match must also have about the same thumbnail mean luma.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# The dHash thumbnail is HASH_SIZE rows of HASH_SIZE + 1 cells: HASH_SIZE ** 2 bits
+HASH_SIZE = 8
+# Most bits a near-duplicate's hash may differ by (negative turns reuse off)
+DUPLICATE_DISTANCE = int(os.environ.get("SKINCARE_DUPLICATE_DISTANCE", 6))
+# Largest difference of thumbnail mean luma (0-255); recompression and small crops
+# move it by about 1, a 3% exposure change by about 4
+DUPLICATE_LUMA_DELTA = 2.0
+# Analyses indexed per process
+DUPLICATE_ENTRIES = int(os.environ.get("SKINCARE_DUPLICATE_ENTRIES", 1024))
+
+
+class PerceptualHash(NamedTuple):
+    bits: int
+    luma: float
+
+
+def perceptual_hash(rgb) -> PerceptualHash:
+    """dHash and mean luma of an RGB array, from one box-filtered grayscale thumbnail"""
+    thumbnail = Image.fromarray(rgb).convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    cells = np.asarray(thumbnail, dtype=np.int16)
+    bits = np.packbits(cells[:, 1:] > cells[:, :-1])
+    return PerceptualHash(int.from_bytes(bits.tobytes(), "big"), round(float(cells.mean()), 2))
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BandIndex:
+    """Integer hashes split into radius + 1 bands, with a dict per band
+
+    Two hashes at most radius bits apart agree exactly on at least one band
+    (pigeonhole), so the only candidates for a query are the hashes sharing
+    one of its band values: radius + 1 dict lookups however many are stored.
+    """
+
+    def __init__(self, radius: int, bits: int = HASH_SIZE * HASH_SIZE):
+        self.radius = radius
+        count = min(max(radius, 0) + 1, bits)
+        edges = [bits * band // count for band in range(count + 1)]
+        self._bands = [(start, (1 << (end - start)) - 1) for start, end in zip(edges, edges[1:])]
+        self._tables = [{} for _ in self._bands]  # per band: band value -> hashes
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, item: int):
+        for (shift, mask), table in zip(self._bands, self._tables):
+            table.setdefault(item >> shift & mask, set()).add(item)
+        self._size += 1
+
+    def remove(self, item: int):
+        for (shift, mask), table in zip(self._bands, self._tables):
+            key = item >> shift & mask
+            table[key].discard(item)
+            if not table[key]:
+                del table[key]
+        self._size -= 1
+
+    def within(self, item: int) -> List[Tuple[int, int]]:
+        """(distance, hash) of every stored hash at most radius bits from item"""
+        candidates = set()
+        for (shift, mask), table in zip(self._bands, self._tables):
+            bucket = table.get(item >> shift & mask)
+            if bucket:
+                candidates |= bucket
+        found = []
+        for candidate in candidates:
+            distance = hamming(item, candidate)
+            if distance <= self.radius:
+                found.append((distance, candidate))
+        return found
+
+
+class NearDuplicateIndex:
+    """LRU of values by perceptual hash, looked up by the nearest hash within max_distance"""
+
+    def __init__(self, max_distance: int = DUPLICATE_DISTANCE, max_entries: int = DUPLICATE_ENTRIES,
+                 luma_delta: float = DUPLICATE_LUMA_DELTA):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.luma_delta = luma_delta
+        self._entries = OrderedDict()  # PerceptualHash -> value
+        self._lumas = {}  # hash bits -> lumas of the live entries with those bits
+        self._bands = BandIndex(max_distance)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "exact_hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_distance >= 0 and self.max_entries > 0
+
+    def _nearest(self, phash: PerceptualHash) -> Optional[PerceptualHash]:
+        best, best_rank = None, None
+        for distance, bits in self._bands.within(phash.bits):
+            for luma in self._lumas.get(bits, ()):
+                rank = (distance, abs(luma - phash.luma))
+                if rank[1] <= self.luma_delta and (best is None or rank < best_rank):
+                    best, best_rank = PerceptualHash(bits, luma), rank
+        return best
+
+    def get(self, phash: PerceptualHash):
+        """Value stored for the nearest matching hash, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            key = self._nearest(phash)
+            if key is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            if key == phash:
+                self._stats["exact_hits"] += 1
+            return self._entries[key]
+
+    def put(self, phash: PerceptualHash, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            if phash in self._entries:
+                self._entries.move_to_end(phash)
+                self._entries[phash] = value
+                return
+            self._entries[phash] = value
+            lumas = self._lumas.get(phash.bits)
+            if lumas is None:
+                lumas = self._lumas[phash.bits] = set()
+                self._bands.add(phash.bits)
+            lumas.add(phash.luma)
+
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+                lumas = self._lumas[evicted.bits]
+                lumas.discard(evicted.luma)
+                if not lumas:
+                    del self._lumas[evicted.bits]
+                    self._bands.remove(evicted.bits)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), hashes=len(self._bands))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._lumas.clear()
+            self._bands = BandIndex(self.max_distance)
+
+
+_analysis_index = None
+_analysis_index_lock = threading.Lock()
+
+
+def get_analysis_index() -> NearDuplicateIndex:
+    """Process-wide index of skin analyses by upload, created on first use"""
+    global _analysis_index
+    if _analysis_index is None:
+        with _analysis_index_lock:
+            if _analysis_index is None:
+                _analysis_index = NearDuplicateIndex()
+    return _analysis_index
@@ -0,0 +1,424 @@
+"""Per-user analysis history with incrementally maintained trends
+
+Analyses are kept in SQLite (WAL mode, so readers never wait for the writer),
+keyed by a user or profile id, in two tables:
+
+- analyses: one row per analysis, indexed on (user_id, created) for the paged
+  history list;
+- trends: one row per user with running aggregates of every metric (count,
+  sum, exponential moving average, min/max, last value and the least-squares
+  sums of its trend over time) and the most recent points for a chart, packed
+  as an array of doubles (JSON made the writer ~20x slower).
+
+Each new analysis is folded into its user's trends row as it is written, so a
+returning user's progress is one primary-key lookup however long their
+history is. Analyses are checked and encoded by record(), then queued and
+committed by a background thread in batches (one transaction per batch, a
+failed one retried item by item), so the request thread never waits on the
+disk; reads borrow a connection from a small pool.
+
+The store is off unless SKINCARE_HISTORY_PATH names a database file.
+"""
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = os.environ.get("SKINCARE_HISTORY_PATH")
+# Analysis metrics tracked over time
+TREND_METRICS = ("brightness_score", "skin_brightness", "redness_index", "texture_score", "shine_score")
+# Span (in analyses) of the exponential moving averages
+EMA_SPAN = 5
+# Points kept for the progress chart
+RECENT_POINTS = 30
+# Read connections kept open
+POOL_SIZE = 4
+# Analyses committed per transaction at most, and how long the writer waits to fill a batch
+BATCH_SIZE = 64
+BATCH_LINGER = 0.05
+# Analyses waiting to be written before record() starts dropping them
+QUEUE_LIMIT = 10_000
+
+_SECONDS_PER_DAY = 86400.0
+# Per-metric state: n, sum, ema, min, max, last, sum_t, sum_tt, sum_ty
+_STATE_SIZE = 9
+# A recent point: created, then one value per metric (NaN if missing)
+_POINT_SIZE = 1 + len(TREND_METRICS)
+_STOP = object()
+
+
+class Trend:
+    """Running aggregates of one user's analyses; add() folds in one more in O(1)"""
+
+    __slots__ = ("count", "first_at", "last_at", "metrics", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.first_at = None
+        self.last_at = None
+        # metric -> [n, sum, ema, min, max, last, sum_t, sum_tt, sum_ty], t in days since first_at
+        self.metrics = {}
+        self.recent = []  # flat _POINT_SIZE-long points, oldest first
+
+    def add(self, created: float, values: dict):
+        if self.first_at is None:
+            self.first_at = created
+        self.count += 1
+        self.last_at = created
+        t = (created - self.first_at) / _SECONDS_PER_DAY
+        alpha = 2 / (EMA_SPAN + 1)
+        point = [created]
+        for metric in TREND_METRICS:
+            value = values.get(metric)
+            if value is None:
+                point.append(math.nan)
+                continue
+            value = float(value)
+            point.append(value)
+            state = self.metrics.get(metric)
+            if state is None:
+                self.metrics[metric] = [1, value, value, value, value, value, t, t * t, t * value]
+                continue
+            state[0] += 1
+            state[1] += value
+            state[2] += alpha * (value - state[2])
+            state[3] = min(state[3], value)
+            state[4] = max(state[4], value)
+            state[5] = value
+            state[6] += t
+            state[7] += t * t
+            state[8] += t * value
+        self.recent += point
+        del self.recent[:-RECENT_POINTS * _POINT_SIZE]
+
+    def summary(self) -> dict:
+        """Latest value, mean, moving average, range and weekly slope per metric, plus the chart points"""
+        metrics = {}
+        for metric, (n, total, ema, low, high, last, sum_t, sum_tt, sum_ty) in self.metrics.items():
+            spread = n * sum_tt - sum_t * sum_t
+            # Least-squares slope over time; none until the analyses span more than an instant
+            slope = (n * sum_ty - sum_t * total) / spread * 7 if spread > 1e-9 else None
+            metrics[metric] = {
+                "last": round(last, 2),
+                "mean": round(total / n, 2),
+                "moving_average": round(ema, 2),
+                "min": round(low, 2),
+                "max": round(high, 2),
+                "slope_per_week": round(slope, 3) if slope is not None else None,
+            }
+        return {
+            "count": self.count,
+            "first_at": self.first_at,
+            "last_at": self.last_at,
+            "metrics": metrics,
+            "recent": self.points(),
+        }
+
+    def points(self) -> List[dict]:
+        """The recent points as {metric: value, "created": timestamp}, oldest first"""
+        points = []
+        for start in range(0, len(self.recent), _POINT_SIZE):
+            values = zip(TREND_METRICS, self.recent[start + 1:start + _POINT_SIZE])
+            point = {metric: value for metric, value in values if not math.isnan(value)}
+            point["created"] = self.recent[start]
+            points.append(point)
+        return points
+
+    def to_bytes(self) -> bytes:
+        """count, first_at, last_at, each TREND_METRICS state (zeros if unseen), then the recent points"""
+        values = array("d", (self.count, self.first_at or 0.0, self.last_at or 0.0))
+        for metric in TREND_METRICS:
+            values.extend(self.metrics.get(metric) or (0.0,) * _STATE_SIZE)
+        values.extend(self.recent)
+        return values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Trend":
+        values = array("d")
+        values.frombytes(data)
+        values = values.tolist()
+        trend = cls()
+        trend.count, trend.first_at, trend.last_at = int(values[0]), values[1], values[2]
+        offset = 3
+        for metric in TREND_METRICS:
+            state = values[offset:offset + _STATE_SIZE]
+            offset += _STATE_SIZE
+            if state[0]:
+                state[0] = int(state[0])
+                trend.metrics[metric] = state
+        trend.recent = values[offset:]
+        return trend
+
+
+def _connect(path: str, readonly: bool = False) -> sqlite3.Connection:
+    db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    if readonly:
+        db.execute("PRAGMA query_only=ON")
+    return db
+
+
+class ConnectionPool:
+    """Up to size read-only connections, opened on demand and handed out one caller at a time"""
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        try:
+            db = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                self._opened += can_open
+            db = _connect(self.path, readonly=True) if can_open else self._idle.get()
+        try:
+            yield db
+        finally:
+            self._idle.put(db)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HistoryStore:
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, pool_size: int = POOL_SIZE,
+                 batch_size: int = BATCH_SIZE, batch_linger: float = BATCH_LINGER,
+                 queue_limit: int = QUEUE_LIMIT):
+        if not path:
+            raise ValueError("HistoryStore needs a database path (SKINCARE_HISTORY_PATH)")
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_linger = batch_linger
+        self._queue = queue.Queue(queue_limit)
+        self._pending = 0
+        self._dropping = False  # log only the first drop of a run of them
+        self._idle = threading.Condition()
+        self._stats = {"recorded": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+        self._db = _connect(path)  # the writer's; used only by the writer thread after this
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                created REAL NOT NULL,
+                goal TEXT,
+                metrics TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS analyses_user_created ON analyses (user_id, created);
+            CREATE TABLE IF NOT EXISTS trends (
+                user_id TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                updated REAL NOT NULL,
+                state BLOB NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        self._pool = ConnectionPool(path, pool_size)
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, user_id: str, metrics: dict, goal: Optional[str] = None,
+               created: Optional[float] = None) -> bool:
+        """Queue an analysis for user_id; False (and logged) if a metric is not a number or the queue is full"""
+        try:
+            # Checked and encoded here, so one bad analysis cannot fail the writer's batch
+            values = {metric: None if metrics.get(metric) is None else float(metrics[metric])
+                      for metric in TREND_METRICS}
+            encoded = json.dumps(values)
+        except (TypeError, ValueError) as e:
+            logger.warning("Not recording an analysis for %r: %s", user_id, e)
+            with self._idle:
+                self._stats["recorded"] += 1
+                self._stats["failed"] += 1
+            return False
+        item = ("add", user_id, time.time() if created is None else created, goal, values, encoded)
+        with self._idle:
+            self._pending += 1
+            self._stats["recorded"] += 1
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._done(1, dropped=1)
+            if not self._dropping:
+                self._dropping = True
+                logger.warning("Analysis history queue is full; dropping analyses until it drains")
+            return False
+        self._dropping = False
+        return True
+
+    def delete_user(self, user_id: str):
+        """Queue removal of a user's analyses and trends (applied in order with their writes)"""
+        with self._idle:
+            self._pending += 1
+        self._queue.put(("delete", user_id))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is written; False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def trend(self, user_id: str) -> Optional[Trend]:
+        """The user's running aggregates as written so far (a single indexed lookup)"""
+        with self._pool.connection() as db:
+            row = db.execute("SELECT state FROM trends WHERE user_id = ?", (user_id,)).fetchone()
+        return Trend.from_bytes(row[0]) if row else None
+
+    def progress(self, user_id: str) -> Optional[dict]:
+        trend = self.trend(user_id)
+        return trend.summary() if trend else None
+
+    def analyses(self, user_id: str, limit: int = 20, before: Optional[float] = None) -> List[dict]:
+        """The user's analyses, newest first; pass the last one's created as before for the next page"""
+        with self._pool.connection() as db:
+            rows = db.execute(
+                "SELECT created, goal, metrics FROM analyses WHERE user_id = ? AND created < ? "
+                "ORDER BY created DESC LIMIT ?", (user_id, float("inf") if before is None else before, limit)
+            ).fetchall()
+        return [dict(json.loads(metrics), created=created, goal=goal) for created, goal, metrics in rows]
+
+    def recompute(self, user_id: str) -> Optional[Trend]:
+        """Trend rebuilt from every stored analysis (a full scan, for checks and repairs)"""
+        trend = Trend()
+        with self._pool.connection() as db:
+            for created, metrics in db.execute(
+                    "SELECT created, metrics FROM analyses WHERE user_id = ? ORDER BY id", (user_id,)):
+                trend.add(created, json.loads(metrics))
+        return trend if trend.count else None
+
+    def stats(self) -> dict:
+        with self._idle:
+            return dict(self._stats, queued=self._queue.qsize())
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Write what is queued, then stop the writer and close every connection
+
+        Gives up after timeout seconds (twice that at worst, when the queue is
+        full), leaving whatever is still queued unwritten.
+        """
+        if self._writer.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                logger.warning("Analysis history writer is behind; closing with %d analyses unwritten",
+                               self._queue.qsize())
+            else:
+                self._writer.join(timeout)
+        self._pool.close()
+
+    def _done(self, count: int, **stats):
+        with self._idle:
+            for name, value in stats.items():
+                self._stats[name] += value
+            self._pending -= count
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                batch = [item]
+                deadline = time.monotonic() + self.batch_linger
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        self._write(batch)
+                        return
+                    batch.append(item)
+                self._write(batch)
+        finally:
+            self._db.close()
+
+    def _write(self, batch: list):
+        """Commit a batch in one transaction: the analysis rows, then each touched user's trends
+
+        If the transaction fails, its items are retried one per transaction,
+        so only the ones that fail on their own are lost.
+        """
+        try:
+            added = self._commit(batch)
+        except Exception as e:
+            # Anything (a locked or full disk, a value sqlite cannot bind) must not stop the
+            # writer, or flush() and close() would wait for it forever
+            try:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            if len(batch) > 1:
+                logger.warning("Could not write a batch of %d to the history (%r); retrying one by one",
+                               len(batch), e)
+                for item in batch:
+                    self._write([item])
+                return
+            failed = int(batch[0][0] == "add")
+            logger.warning("Could not write to the history for %r: %r", batch[0][1], e)
+            self._done(1, failed=failed)
+            return
+        self._done(len(batch), written=added, batches=1)
+
+    def _commit(self, batch: list) -> int:
+        """Apply a batch in one transaction; the number of analyses added"""
+        db = self._db
+        trends = {}
+        added = 0
+        db.execute("BEGIN IMMEDIATE")
+        for item in batch:
+            if item[0] == "delete":
+                user_id = item[1]
+                db.execute("DELETE FROM analyses WHERE user_id = ?", (user_id,))
+                db.execute("DELETE FROM trends WHERE user_id = ?", (user_id,))
+                trends.pop(user_id, None)
+                continue
+            _, user_id, created, goal, values, encoded = item
+            db.execute("INSERT INTO analyses (user_id, created, goal, metrics) VALUES (?, ?, ?, ?)",
+                       (user_id, created, goal, encoded))
+            trend = trends.get(user_id)
+            if trend is None:
+                row = db.execute("SELECT state FROM trends WHERE user_id = ?", (user_id,)).fetchone()
+                trend = trends[user_id] = Trend.from_bytes(row[0]) if row else Trend()
+            trend.add(created, values)
+            added += 1
+        db.executemany(
+            "INSERT OR REPLACE INTO trends (user_id, count, updated, state) VALUES (?, ?, ?, ?)",
+            [(user_id, trend.count, trend.last_at, trend.to_bytes()) for user_id, trend in trends.items()])
+        db.execute("COMMIT")
+        return added
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_history_store() -> Optional[HistoryStore]:
+    """Process-wide store at SKINCARE_HISTORY_PATH, created on first use; None when not configured"""
+    global _default_store
+    if _default_store is None and DEFAULT_HISTORY_PATH:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = HistoryStore()
+    return _default_store
@@ -0,0 +1,96 @@
+"""Decode-once image handling shared by the preview, analysis and reruns
+
+An upload is decoded a single time into a DecodedImage keyed by a hash of its
+bytes. The object keeps the EXIF-corrected analysis-resolution pixels and a
+display thumbnail, so previews and repeated submits never touch the JPEG/PNG
+decoder again while the entry stays in the LRU, and its perceptual hash, which
+finds the analysis of an earlier near-identical upload.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .analysis import ANALYSIS_MAX_PIXELS, downscale_for_analysis, open_image
+from .dedup import PerceptualHash, perceptual_hash
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+# Longest side of the preview shown in the UI
+THUMBNAIL_MAX_SIZE = (1024, 1024)
+# Decoded uploads kept per process
+DECODED_CACHE_ENTRIES = 32
+
+
+@dataclass(frozen=True)
+class DecodedImage:
+    digest: str
+    size: Tuple[int, int]  # original (width, height), after EXIF orientation
+    format: Optional[str]
+    array: "np.ndarray"  # EXIF-corrected RGB pixels at analysis resolution
+    thumbnail: "Image.Image"  # display copy, at most THUMBNAIL_MAX_SIZE
+    phash: PerceptualHash  # of the analysis-resolution pixels
+
+
+def content_digest(image_bytes) -> str:
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+def decode_image_once(image_bytes, digest: Optional[str] = None,
+                      max_pixels: int = ANALYSIS_MAX_PIXELS) -> DecodedImage:
+    """Decode an upload into a DecodedImage (uncached)"""
+    img = open_image(image_bytes)
+    image_format = img.format
+    width, height = img.size
+
+    # Orientations 5-8 swap width and height
+    if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+        width, height = height, width
+
+    img = ImageOps.exif_transpose(downscale_for_analysis(img, max_pixels, image_bytes)).convert('RGB')
+    thumbnail = img.copy()
+    thumbnail.thumbnail(THUMBNAIL_MAX_SIZE)
+    array = np.asarray(img)
+
+    return DecodedImage(
+        digest=digest or content_digest(image_bytes),
+        size=(width, height),
+        format=image_format,
+        array=array,
+        thumbnail=thumbnail,
+        phash=perceptual_hash(array),
+    )
+
+
+_decoded = OrderedDict()
+_decoded_lock = threading.Lock()
+
+
+def load_image(image_bytes, digest: Optional[str] = None) -> DecodedImage:
+    """DecodedImage for an upload, decoding only on the first request for its content
+
+    Pass the digest when it is already known to skip re-hashing the bytes.
+    """
+    digest = digest or content_digest(image_bytes)
+    with _decoded_lock:
+        decoded = _decoded.get(digest)
+        if decoded is not None:
+            _decoded.move_to_end(digest)
+            return decoded
+
+    decoded = decode_image_once(image_bytes, digest)
+    with _decoded_lock:
+        _decoded[digest] = decoded
+        while len(_decoded) > DECODED_CACHE_ENTRIES:
+            _decoded.popitem(last=False)
+    return decoded
+
+
+def clear_image_cache():
+    """Forget every decoded upload (benchmarks use this to measure cold decodes)"""
+    with _decoded_lock:
+        _decoded.clear()
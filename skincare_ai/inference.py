@@ -0,0 +1,362 @@
+"""Shared client for the hosted text-generation endpoint
+
+One InferenceClient is meant to live for the whole process: it keeps pooled
+keep-alive connections, caps the number of in-flight calls, and retries
+transient failures with jittered exponential backoff inside a per-call
+deadline. A circuit breaker stops calling an endpoint that keeps failing and
+lets a single probe through once it has had time to recover. The same object
+serves synchronous callers (Streamlit) and asyncio callers (the HTTP API); the
+async connection pool and concurrency cap belong to one event loop, so each
+loop that calls it gets its own.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Optional
+
+from .lazy import lazy_import
+
+httpx = lazy_import("httpx")
+
+HF_API_URL = os.environ.get("HF_API_URL", "https://api-inference.huggingface.co/models/gpt2")
+HF_API_KEY = os.environ.get("HF_API_KEY", "hf_bYQPJEhXsXRODCujrBNQYOxOzLsNSJvWV")
+HF_TIMEOUT = 10
+# Longest the startup warm-up waits for a connection to the endpoint
+WARM_UP_TIMEOUT = 2.0
+
+# Status codes worth another attempt: rate limiting and model cold starts/overload
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Circuit breaker: open when at least BREAKER_FAILURE_RATE of the last
+# BREAKER_WINDOW calls failed (once BREAKER_MIN_CALLS have been seen), then
+# probe again after BREAKER_RESET_TIMEOUT seconds
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 5
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_RESET_TIMEOUT = float(os.environ.get("SKINCARE_BREAKER_RESET_SECONDS", 30))
+
+
+class InferenceError(Exception):
+    """The endpoint could not produce a result within the call's deadline"""
+
+
+class CircuitOpenError(InferenceError):
+    """The call was not attempted because the endpoint is considered down"""
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with half-open probing
+
+    closed: calls go through and their outcomes fill a rolling window.
+    open: calls are rejected until reset_timeout has passed.
+    half_open: one probe call is allowed; its success closes the circuit,
+    its failure opens it for another reset_timeout.
+    """
+
+    def __init__(self, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate: float = BREAKER_FAILURE_RATE, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.reset_timeout = reset_timeout
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; a True in half-open state claims the probe"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                # A successful probe starts a fresh window
+                self._opened_at = None
+                self._probing = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._opened_at is not None:
+                self._opened_at = time.monotonic()
+                self._probing = False
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(self._outcomes):
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """Give back a claimed probe without an outcome (e.g. the call was never sent)"""
+        with self._lock:
+            self._probing = False
+
+
+class InferenceClient:
+    name = "hosted"
+
+    def __init__(self, url: str = HF_API_URL, api_key: Optional[str] = HF_API_KEY,
+                 timeout: float = HF_TIMEOUT, max_connections: int = 20, max_concurrency: int = 8,
+                 retries: int = 2, backoff: float = 0.25, max_backoff: float = 2.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = httpx.Client(headers=self._headers, limits=self._limits, timeout=timeout)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._max_concurrency = max_concurrency
+        self._loops = weakref.WeakKeyDictionary()  # event loop -> (httpx.AsyncClient, asyncio.Semaphore)
+        self._loops_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url and self._headers)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError("Inference endpoint is unavailable (circuit open)")
+
+    def _loop_state(self):
+        """AsyncClient and slot semaphore for the running event loop, created on its first call"""
+        loop = asyncio.get_running_loop()
+        with self._loops_lock:
+            state = self._loops.get(loop)
+            if state is None:
+                # Clients of loops that have since closed cannot be used (or closed) any more
+                for closed in [other for other in self._loops if other.is_closed()]:
+                    del self._loops[closed]
+                state = self._loops[loop] = (
+                    httpx.AsyncClient(headers=self._headers, limits=self._limits, timeout=self.timeout),
+                    asyncio.Semaphore(self._max_concurrency),
+                )
+            return state
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter keeps retrying clients from synchronising on a recovering endpoint
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _check(self, response: "httpx.Response"):
+        """Return the decoded body, or raise (retryable errors as httpx.HTTPStatusError)"""
+        if response.status_code == 200:
+            try:
+                return response.json()
+            except ValueError:
+                raise InferenceError("Inference endpoint returned invalid JSON") from None
+        if response.status_code in RETRYABLE_STATUS:
+            response.raise_for_status()
+        raise InferenceError(f"Inference endpoint returned {response.status_code}")
+
+    def generate(self, payload: dict, deadline: Optional[float] = None):
+        """POST payload and return the decoded JSON, retrying until deadline seconds have passed"""
+        expires = time.monotonic() + (deadline or self.timeout)
+
+        self._admit()
+        if not self._slots.acquire(timeout=max(0.0, expires - time.monotonic())):
+            self.breaker.release()
+            raise InferenceError("No free inference slot before the deadline")
+        try:
+            attempt = 0
+            while True:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    raise InferenceError("Inference deadline exceeded")
+                try:
+                    response = self._client.post(self.url, json=payload, timeout=min(self.timeout, remaining))
+                    result = self._check(response)
+                    self.breaker.record_success()
+                    return result
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    delay = self._backoff_delay(attempt)
+                    if attempt >= self.retries or time.monotonic() + delay >= expires:
+                        raise InferenceError(str(e) or type(e).__name__) from e
+                    attempt += 1
+                    time.sleep(delay)
+        except InferenceError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        finally:
+            self._slots.release()
+
+    async def agenerate(self, payload: dict, deadline: Optional[float] = None):
+        """Async counterpart of generate()"""
+        client, slots = self._loop_state()
+        expires = time.monotonic() + (deadline or self.timeout)
+
+        self._admit()
+        try:
+            await asyncio.wait_for(slots.acquire(), max(0.0, expires - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.breaker.release()
+            raise InferenceError("No free inference slot before the deadline") from None
+        try:
+            attempt = 0
+            while True:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    raise InferenceError("Inference deadline exceeded")
+                try:
+                    response = await client.post(self.url, json=payload, timeout=min(self.timeout, remaining))
+                    result = self._check(response)
+                    self.breaker.record_success()
+                    return result
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    delay = self._backoff_delay(attempt)
+                    if attempt >= self.retries or time.monotonic() + delay >= expires:
+                        raise InferenceError(str(e) or type(e).__name__) from e
+                    attempt += 1
+                    await asyncio.sleep(delay)
+        except InferenceError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        finally:
+            slots.release()
+
+    def stream(self, payload: dict, deadline: Optional[float] = None, stall_timeout: Optional[float] = None):
+        """Yield generated text chunks as they arrive
+
+        Understands server-sent events (TGI-style token events), plain chunked
+        text, and ordinary JSON responses (yielded as one chunk). Raises
+        InferenceError if no data arrives for stall_timeout seconds or the
+        whole stream outlives the deadline; chunks already yielded stand.
+        """
+        expires = time.monotonic() + (deadline or self.timeout)
+        self._admit()
+        if not self._slots.acquire(timeout=max(0.0, expires - time.monotonic())):
+            self.breaker.release()
+            raise InferenceError("No free inference slot before the deadline")
+        succeeded = None  # unknown if the caller stops iterating early
+        try:
+            timeout = httpx.Timeout(min(self.timeout, max(0.0, expires - time.monotonic())),
+                                    read=stall_timeout or self.timeout)
+            with self._client.stream("POST", self.url, json=dict(payload, stream=True), timeout=timeout) as response:
+                if response.status_code != 200:
+                    raise InferenceError(f"Inference endpoint returned {response.status_code}")
+
+                content_type = response.headers.get("content-type", "")
+                if content_type.startswith("application/json"):
+                    try:
+                        result = json.loads(response.read())
+                    except ValueError:
+                        raise InferenceError("Inference endpoint returned invalid JSON") from None
+                    if isinstance(result, list) and result:
+                        yield result[0].get("generated_text", "")
+                    succeeded = True
+                    return
+
+                chunks = _sse_text(response.iter_lines()) if content_type.startswith("text/event-stream") \
+                    else response.iter_text()
+                for chunk in chunks:
+                    if time.monotonic() > expires:
+                        raise InferenceError("Inference deadline exceeded")
+                    if chunk:
+                        yield chunk
+            succeeded = True
+        except InferenceError:
+            succeeded = False
+            raise
+        except httpx.TransportError as e:
+            succeeded = False
+            raise InferenceError(str(e) or type(e).__name__) from e
+        finally:
+            self._slots.release()
+            if succeeded is None:
+                self.breaker.release()
+            elif succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+    def warm_up(self, connect: bool = True) -> bool:
+        """Open a pooled connection to the endpoint ahead of the first call
+
+        Sends a HEAD request whose outcome is ignored (and kept out of the
+        breaker); the point is the TCP/TLS handshake. Returns whether the
+        endpoint answered at all.
+        """
+        if not connect or not self.enabled:
+            return False
+        try:
+            self._client.head(self.url, timeout=min(self.timeout, WARM_UP_TIMEOUT))
+        except httpx.HTTPError:
+            return False
+        return True
+
+    def close(self):
+        self._client.close()
+
+    async def aclose(self):
+        """Close the pooled connections, including the running event loop's async ones"""
+        self._client.close()
+        with self._loops_lock:
+            state = self._loops.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].aclose()
+
+
+def _sse_text(lines):
+    """Text carried by server-sent events: TGI token events, {"text": ...} or raw data"""
+    for line in lines:
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            event = json.loads(data)
+        except ValueError:
+            yield data
+            continue
+        if isinstance(event, dict):
+            token = event.get("token")
+            if isinstance(token, dict):
+                if not token.get("special"):
+                    yield token.get("text", "")
+            elif "text" in event:
+                yield event["text"]
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> InferenceClient:
+    """Process-wide client, created on first use"""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = InferenceClient()
+    return _default_client
@@ -0,0 +1,38 @@
+"""Deferred imports for heavy dependencies
+
+numpy, Pillow and httpx together take a few hundred milliseconds to import,
+which every replica would otherwise pay at process start before it can serve
+a page. Modules bind them with lazy_import() instead, and the real import
+happens on the first attribute access (or in the startup warm-up).
+"""
+import importlib
+import sys
+
+
+class LazyModule:
+    """Stands in for a module until one of its attributes is needed"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        """Import the module now (thread-safe: importlib holds a per-module lock)"""
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r} ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,214 @@
+"""Per-request stage timings, fallback/error counters and their export
+
+Off unless SKINCARE_METRICS=1 (or SKINCARE_METRICS_LOG is set). When off,
+start_request() hands back a shared no-op trace, so the hot path costs a few
+attribute lookups. When on, every request gets an ID and its stage durations
+feed per-stage histograms, which render as Prometheus text (the API serves
+them on /metrics); SKINCARE_METRICS_LOG additionally appends one JSON line
+per request to that file.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from .progress import StageEvent
+
+logger = logging.getLogger(__name__)
+
+METRICS_LOG_PATH = os.environ.get("SKINCARE_METRICS_LOG")
+METRICS_ENABLED = os.environ.get("SKINCARE_METRICS", "").lower() in ("1", "true", "yes") or bool(METRICS_LOG_PATH)
+# Histogram bucket upper bounds, seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+def _label(value) -> str:
+    """A label value escaped for the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Process-wide stage histograms and labelled counters"""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, log_path: Optional[str] = METRICS_LOG_PATH):
+        self.enabled = enabled
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def write_log(self, record: dict):
+        if not self.log_path:
+            return
+        try:
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            logger.warning("Could not write metrics log: %s", e)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {stage: {"count": h.count, "sum": round(h.sum, 6),
+                                   "buckets": {str(bound): n for bound, n in h.cumulative()}}
+                           for stage, h in self._stages.items()},
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in self._counters.items()],
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = ["# HELP skincare_stage_seconds Time spent in each request stage",
+                 "# TYPE skincare_stage_seconds histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self._stages.items()):
+                stage = _label(stage)
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'skincare_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+                lines.append(f'skincare_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'skincare_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            seen = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE skincare_{name}_total counter")
+                label_text = ",".join(f'{key}="{_label(val)}"' for key, val in labels)
+                lines.append(f"skincare_{name}_total{{{label_text}}} {value}" if labels
+                             else f"skincare_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+
+class RequestTrace:
+    """Stage timings for one request; finish() publishes them to the registry"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self.request_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._open = {}
+        self._finished = False
+
+    def listen(self, callback: Optional[Callable[[StageEvent], None]] = None):
+        """StageReporter callback that records durations, then forwards to callback"""
+        def record(event: StageEvent):
+            if event.status == "started":
+                self._open[event.stage] = event.elapsed
+            elif event.status == "finished" and event.stage in self._open:
+                self.stages[event.stage] = event.elapsed - self._open.pop(event.stage)
+            elif event.status == "failed":
+                self._open.pop(event.stage, None)  # counted by error(), not in the stage timings
+            if callback is not None:
+                callback(event)
+        return record
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage that happens outside the pipeline, e.g. rendering"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def error(self, stage: str):
+        self.registry.increment("errors", stage=stage)
+
+    def finish(self, outcome: str = "ok"):
+        if self._finished:
+            return
+        self._finished = True
+        total = time.perf_counter() - self.started
+        for name, seconds in self.stages.items():
+            self.registry.observe(name, seconds)
+        self.registry.observe("total", total)
+        self.registry.increment("requests", outcome=outcome)
+        self.registry.write_log({
+            "ts": round(time.time(), 3),
+            "request_id": self.request_id,
+            "outcome": outcome,
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            "total_ms": round(total * 1000, 3),
+        })
+
+
+class _NullTrace:
+    """Stand-in used while metrics are disabled"""
+    request_id = None
+
+    def listen(self, callback=None):
+        return callback
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def error(self, stage):
+        pass
+
+    def finish(self, outcome="ok"):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    return _registry
+
+
+def start_request():
+    """A RequestTrace, or the no-op NULL_TRACE when metrics are disabled"""
+    return RequestTrace(_registry) if _registry.enabled else NULL_TRACE
+
+
+def count_fallback(reason: str):
+    """Count a switch from the remote model to the local recommendations"""
+    _registry.increment("fallbacks", reason=reason)
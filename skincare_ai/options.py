@@ -0,0 +1,68 @@
+"""Choices offered by the UI's dropdowns and sidebar
+
+Kept out of the Streamlit script so they are built once per process instead of
+on every rerun. The first entry of each dropdown is its placeholder.
+"""
+
+SKINCARE_GOALS = (
+    "🌟 Choose your beauty transformation",
+    "✨ Brightening and luminous skin tone",
+    "⏰ Anti-aging and wrinkle prevention",
+    "🎭 Acne treatment and clear skin",
+    "💧 Deep hydration for glowing skin",
+    "🤍 Gentle care for sensitive skin",
+    "🔍 Pore minimization and refinement",
+    "👁️ Dark circles and under-eye renewal",
+    "🌹 Rosacea and redness comfort",
+    "🎨 Hyperpigmentation transformation",
+    "💎 Blackhead and whitehead elimination",
+    "🌟 Firming and skin tightening",
+    "☀️ Sun damage repair and protection",
+    "🎭 Melasma treatment and care",
+    "🤍 Eczema and dermatitis comfort",
+    "⚖️ Oil control and mattifying balance",
+    "🔄 Exfoliation and skin renewal",
+    "🛡️ Barrier repair and protection",
+    "🌿 Anti-inflammatory treatment",
+    "✨ Skin texture perfection",
+    "🌟 Natural radiance enhancement",
+)
+
+PREVIOUS_PRODUCTS = (
+    "💎 Select your skincare journey",
+    "🍊 Vitamin C brightening serum",
+    "✨ Niacinamide pore refining serum",
+    "🌙 Retinol/Retinoid anti-aging products",
+    "💧 Hyaluronic acid hydrating serum",
+    "🌿 Salicylic acid clarifying products",
+    "⚡ Benzoyl peroxide acne treatments",
+    "🔄 AHA/BHA exfoliating treatments",
+    "💪 Peptide strengthening serums",
+    "🛡️ Ceramide barrier moisturizers",
+    "☀️ Sunscreen/SPF protection products",
+    "🌿 Tea tree oil purifying treatments",
+    "🎨 Kojic acid brightening products",
+    "✨ Alpha arbutin spot-correcting serum",
+    "🌸 Azelaic acid gentle treatments",
+    "🍇 Glycolic acid renewal products",
+    "🥛 Lactic acid gentle exfoliants",
+    "🤍 Zinc oxide calming products",
+    "💎 Collagen boosting serums",
+    "🌿 Bakuchiol natural retinol alternative",
+    "✨ Squalane hydrating oil",
+    "🌹 Rosehip regenerating oil",
+    "Microneedling treatments",
+    "LED light therapy",
+    "None of the above",
+)
+
+SKIN_TYPES = ("Not specified", "Oily", "Dry", "Combination", "Sensitive", "Normal")
+
+AGE_RANGES = ("Not specified", "Under 20", "20-30", "30-40", "40-50", "50+")
+
+# Sidebar shortcuts
+POPULAR_GOALS = (
+    "🌟 Radiant Brightening", "⏰ Anti-aging Excellence", "✨ Acne-Free Confidence",
+    "💧 Deep Hydration", "🎭 Oil Balance Control", "🤍 Sensitive Skin Care",
+    "🔍 Pore Perfection", "👁️ Dark Circle Treatment", "🌹 Rosacea Comfort",
+)
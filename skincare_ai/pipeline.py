@@ -0,0 +1,102 @@
+"""End-to-end request processing: image analysis followed by a recommendation"""
+import logging
+from typing import Callable, Optional
+
+from .analysis import ImageTooLargeError, analyze_or_reuse, brightness_level
+from .cache import RecommendationCache
+from .backends import InferenceBackend
+from .imaging import load_image
+from .metrics import start_request
+from .progress import StageEvent, StageReporter
+from .recommendation import get_skincare_recommendation, stream_skincare_recommendation
+
+logger = logging.getLogger(__name__)
+
+
+def build_response(goal: str, history: str, brightness_score: float, recommendation,
+                   metrics: Optional[dict] = None) -> dict:
+    """Response payload shared by the Streamlit UI and the HTTP API"""
+    analysis = {
+        "brightness_score": brightness_score,
+        "brightness_level": brightness_level(brightness_score),
+        "image_processed": True
+    }
+    if metrics:
+        analysis.update((key, value) for key, value in metrics.items() if key != "brightness_score")
+    return {
+        "analysis": analysis,
+        "recommendation": recommendation,
+        "user_input": {
+            "goal": goal,
+            "history": history
+        },
+        "mock_collection_link": f"https://skincare-collection.com/recommended/{goal.lower().replace(' ', '-')}",
+        "status": "success"
+    }
+
+
+def process_skincare_request(image_bytes, goal, history,
+                             on_warning: Optional[Callable[[str], None]] = None,
+                             client: Optional[InferenceBackend] = None,
+                             cache: Optional[RecommendationCache] = None,
+                             on_progress: Optional[Callable[[StageEvent], None]] = None,
+                             stream: bool = False,
+                             digest: Optional[str] = None,
+                             trace=None):
+    """Process the complete skincare recommendation request
+
+    Returns a (response, error) pair; exactly one of them is None. client and
+    cache default to the process-wide instances. on_progress receives a
+    StageEvent as each stage in progress.STAGES starts, finishes or is skipped.
+    With stream=True the recommendation is a RecommendationStream that fetches
+    the text only when iterated, so the cache and inference stages are deferred.
+    digest is the upload's content hash, if the caller already has it; the
+    decoded image is shared with any earlier preview of the same upload.
+    trace is a metrics.RequestTrace the caller keeps open to time later stages
+    (e.g. rendering); without one the request is traced and finished here.
+    """
+    owns_trace = trace is None
+    if owns_trace:
+        trace = start_request()
+    progress = StageReporter(trace.listen(on_progress))
+    try:
+        # The error returns are outside the stage, so progress listeners see it fail
+        try:
+            with progress.stage("decode"):
+                decoded = load_image(image_bytes, digest)
+        except ImageTooLargeError as e:
+            trace.error("decode")
+            trace.finish("error")
+            return None, str(e)
+        except Exception:
+            logger.exception("Error processing image")
+            trace.error("decode")
+            trace.finish("error")
+            return None, "Failed to process image"
+
+        # Brightness and skin metrics in one pass over the decoded array, unless a near-identical
+        # upload was already analysed
+        with progress.stage("analysis"):
+            metrics = analyze_or_reuse(decoded.array, decoded.phash)
+            brightness_score = metrics["brightness_score"]
+
+        # Get skincare recommendation
+        if stream:
+            recommendation = stream_skincare_recommendation(goal, history, brightness_score, on_warning=on_warning,
+                                                            client=client, cache=cache)
+            progress.emit("cache", "deferred")
+            progress.emit("inference", "deferred")
+        else:
+            recommendation = get_skincare_recommendation(goal, history, brightness_score, on_warning=on_warning,
+                                                         client=client, cache=cache, progress=progress)
+
+        with progress.stage("report"):
+            response = build_response(goal, history, brightness_score, recommendation, metrics)
+        if owns_trace:
+            trace.finish()
+        return response, None
+
+    except Exception as e:
+        trace.error("pipeline")
+        trace.finish("error")
+        return None, f"Processing error: {str(e)}"
@@ -0,0 +1,161 @@
+"""Band-by-band decoding of large PNGs
+
+Pillow decodes a PNG into one full-resolution buffer, so a 48 MP upload costs
+~150 MB before it can be reduced. Here the IDAT stream is inflated
+incrementally and handed to Pillow a band of rows at a time: each band is
+re-wrapped as a small PNG whose first row is the previous band's last
+(unfiltered) row, so Pillow's own C unfiltering applies unchanged and only
+one band is ever held in memory.
+
+Only 8-bit, non-interlaced greyscale/RGB images (with or without alpha) are
+handled; anything else returns None and the caller decodes it normally.
+"""
+import io
+import struct
+import zlib
+from typing import Iterator, Optional
+
+from .lazy import lazy_import
+
+Image = lazy_import("PIL.Image")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# colour type -> (Pillow mode, channels)
+COLOR_TYPES = {0: ("L", 1), 2: ("RGB", 3), 4: ("LA", 2), 6: ("RGBA", 4)}
+# Filtered bytes decoded per band
+BAND_BYTES = 1024 * 1024
+
+
+class PngHeader:
+    __slots__ = ("width", "height", "bit_depth", "color_type", "interlace")
+
+    def __init__(self, width, height, bit_depth, color_type, interlace):
+        self.width = width
+        self.height = height
+        self.bit_depth = bit_depth
+        self.color_type = color_type
+        self.interlace = interlace
+
+    @property
+    def banded(self) -> bool:
+        """Whether iter_bands can decode this image"""
+        return self.bit_depth == 8 and self.color_type in COLOR_TYPES and not self.interlace
+
+
+def _chunks(data) -> Iterator[tuple]:
+    """(type, payload) for each chunk; payloads are memoryviews into data"""
+    view = memoryview(data)
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(view):
+        length, chunk_type = struct.unpack_from(">I4s", view, offset)
+        start = offset + 8
+        if start + length > len(view):
+            raise ValueError("Truncated PNG chunk")
+        yield chunk_type, view[start:start + length]
+        offset = start + length + 4  # skip the CRC
+        if chunk_type == b"IEND":
+            return
+
+
+def read_header(data) -> Optional[PngHeader]:
+    """IHDR fields of a PNG, or None if data is not a PNG"""
+    if not bytes(data[:8]) == PNG_SIGNATURE:
+        return None
+    chunk_type, payload = next(_chunks(data), (None, None))
+    if chunk_type != b"IHDR" or len(payload) < 13:
+        raise ValueError("PNG without a valid IHDR chunk")
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", payload[:13])
+    return PngHeader(width, height, bit_depth, color_type, interlace)
+
+
+def _chunk(chunk_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload)) + chunk_type + payload + \
+        struct.pack(">I", zlib.crc32(payload, zlib.crc32(chunk_type)))
+
+
+def _filtered_rows(data, row_bytes: int, rows_per_band: int) -> Iterator[bytes]:
+    """The inflated IDAT stream in slices of rows_per_band filtered rows (the last may be shorter)"""
+    inflater = zlib.decompressobj()
+    want = row_bytes * rows_per_band
+    pending = bytearray()
+    for chunk_type, payload in _chunks(data):
+        if chunk_type != b"IDAT":
+            continue
+        while payload:
+            # max_length bounds each step's output, so a tiny, highly compressed IDAT can't balloon
+            pending += inflater.decompress(payload, want)
+            payload = inflater.unconsumed_tail
+            while len(pending) >= want:
+                yield pending[:want]
+                del pending[:want]
+    pending += inflater.flush()
+    if pending:
+        yield pending
+
+
+def iter_bands(data, header: PngHeader, rows_per_band: int) -> Iterator["Image.Image"]:
+    """Full-resolution Images of consecutive row bands, top to bottom"""
+    mode, channels = COLOR_TYPES[header.color_type]
+    stride = header.width * channels
+    row_bytes = stride + 1  # each row starts with its filter type
+    previous = bytes(stride)  # rows "above" the first one are zero, as in the PNG spec
+    decoded = 0
+
+    for band in _filtered_rows(data, row_bytes, rows_per_band):
+        rows = min(len(band) // row_bytes, header.height - decoded)
+        if rows <= 0:
+            break
+        ihdr = struct.pack(">IIBBBBB", header.width, rows + 1, 8, header.color_type, 0, 0, 0)
+        # Stored (level 0) deflate: just framing, no compression work
+        deflater = zlib.compressobj(0)
+        idat = deflater.compress(b"\x00" + previous) + deflater.compress(memoryview(band)[:rows * row_bytes]) + \
+            deflater.flush()
+        del band
+        image = Image.open(io.BytesIO(b"".join((PNG_SIGNATURE, _chunk(b"IHDR", ihdr), _chunk(b"IDAT", idat),
+                                                 _chunk(b"IEND", b"")))))
+        del idat
+        image.load()
+        previous = image.crop((0, rows, header.width, rows + 1)).tobytes()
+        decoded += rows
+        yield image.crop((0, 1, header.width, rows + 1))
+
+    if decoded < header.height:
+        raise ValueError(f"PNG data ends after {decoded} of {header.height} rows")
+
+
+def decode_reduced(data, factor: int, band_bytes: int = BAND_BYTES) -> Optional["Image.Image"]:
+    """The PNG box-reduced by factor (same pixels as Image.reduce), decoded band by band
+
+    None if data is not a PNG this module can band-decode.
+    """
+    header = read_header(data)
+    if header is None or not header.banded:
+        return None
+    mode, channels = COLOR_TYPES[header.color_type]
+    # Bands are whole multiples of factor so the per-band reductions tile exactly
+    rows_per_band = factor * max(1, band_bytes // ((header.width * channels + 1) * factor))
+
+    reduced = Image.new(mode, (-(-header.width // factor), -(-header.height // factor)))
+    top = 0
+    for band in iter_bands(data, header, rows_per_band):
+        small = band.reduce(factor) if factor > 1 else band
+        reduced.paste(small, (0, top))
+        top += small.height
+    return reduced
+
+
+def histogram(data, band_bytes: int = BAND_BYTES) -> Optional[list]:
+    """256-bin greyscale (convert('L')) histogram of the full-resolution PNG, decoded band by band
+
+    None if data is not a PNG this module can band-decode.
+    """
+    header = read_header(data)
+    if header is None or not header.banded:
+        return None
+    channels = COLOR_TYPES[header.color_type][1]
+    rows_per_band = max(1, band_bytes // (header.width * channels + 1))
+    totals = [0] * 256
+    for band in iter_bands(data, header, rows_per_band):
+        for level, count in enumerate(band.convert("L").histogram()):
+            totals[level] += count
+    return totals
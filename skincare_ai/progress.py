@@ -0,0 +1,48 @@
+"""Stage events emitted while a skincare request is processed"""
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Pipeline stages in execution order
+STAGES = ("decode", "analysis", "cache", "inference", "report")
+
+
+@dataclass(frozen=True)
+class StageEvent:
+    stage: str
+    status: str  # "started", "finished", "failed", "skipped" or "deferred" (runs later, e.g. when streaming)
+    elapsed: float  # seconds since the request began
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the pipeline completed, for driving a progress bar"""
+        index = STAGES.index(self.stage)
+        return (index if self.status in ("started", "failed") else index + 1) / len(STAGES)
+
+
+class StageReporter:
+    """Turns stage boundaries into StageEvents for an optional callback"""
+
+    def __init__(self, callback: Optional[Callable[[StageEvent], None]] = None):
+        self.callback = callback
+        self.started = time.perf_counter()
+
+    def emit(self, stage: str, status: str):
+        if self.callback is not None:
+            self.callback(StageEvent(stage, status, time.perf_counter() - self.started))
+
+    @contextmanager
+    def stage(self, name: str):
+        """Emit "started", then "finished", or "failed" if the block raises"""
+        self.emit(name, "started")
+        try:
+            yield
+        except BaseException:
+            self.emit(name, "failed")
+            raise
+        self.emit(name, "finished")
+
+    def skip(self, *names: str):
+        for name in names:
+            self.emit(name, "skipped")
@@ -0,0 +1,509 @@
+"""Skincare recommendations from a text-generation backend with a rule-based fallback"""
+import asyncio
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional
+
+from .backends import InferenceBackend, get_default_backend
+from .cache import RecommendationCache, get_default_cache, make_cache_key
+from .catalog import get_catalog
+from .inference import CircuitOpenError, InferenceError
+from .metrics import count_fallback, get_metrics
+from .progress import StageReporter
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_WARNING = "AI API temporarily unavailable, using expert recommendations instead."
+LATENCY_BUDGET_NOTICE = "AI recommendations are taking longer than usual, showing expert recommendations instead."
+
+# Seconds to wait for the model before answering with the local recommendation
+# while the remote call carries on in the background to fill the cache; None waits
+# for the full client timeout
+LATENCY_BUDGET = float(os.environ["SKINCARE_LATENCY_BUDGET_MS"]) / 1000 if os.environ.get("SKINCARE_LATENCY_BUDGET_MS") else None
+# Remote calls allowed to outlive their request at once; beyond that the budget path goes local immediately
+BACKGROUND_CALLS = 4
+
+# Longest gap between streamed chunks before switching to the local recommendation
+STREAM_STALL_TIMEOUT = 3.0
+# Overall limit on a streamed generation
+STREAM_DEADLINE = 30.0
+# Catalog products suggested with a local recommendation
+SUGGESTED_PRODUCTS = 4
+
+# Section headings shared by the results panel, the report and the streamed text
+RECOMMENDATION_SECTIONS = [
+    ("routine", "🔄 Recommended Routine"),
+    ("key_ingredients", "🧪 Key Ingredients to Look For"),
+    ("products", "🛍️ Suggested Products"),
+    ("avoid", "⚠️ Products/Ingredients to Avoid"),
+    ("timeline", "⏰ Expected Timeline"),
+]
+
+
+def build_prompt(goal: str, history: str, brightness: float) -> str:
+    """Construct prompt for skincare recommendation"""
+    return f"""
+    As a skincare expert, provide a recommendation based on:
+    - Skincare Goal: {goal}
+    - Past Product History: {history}
+    - Skin Brightness Score: {brightness}/255 (higher means brighter skin)
+    
+    Please provide:
+    1. A specific skincare routine recommendation
+    2. Key ingredients to look for
+    3. Products to avoid
+    4. Expected timeline for results
+    
+    Keep the response concise and professional.
+    """
+
+
+def build_payload(prompt: str) -> dict:
+    """Text-generation request body for the inference API"""
+    return {
+        "inputs": prompt,
+        "parameters": {
+            "max_length": 200,
+            "temperature": 0.7,
+            "do_sample": True
+        }
+    }
+
+
+def parse_generation(result, prompt: str) -> Optional[dict]:
+    """Turn an inference API response into a recommendation, or None if it is empty"""
+    if isinstance(result, list) and len(result) > 0:
+        generated_text = result[0].get('generated_text', '')
+        recommendation_text = generated_text.replace(prompt, '').strip()
+
+        if recommendation_text:
+            return {
+                "recommendation": recommendation_text,
+                "source": "AI Generated"
+            }
+    return None
+
+
+LOCAL_RECOMMENDATIONS = {
+    "brightening": {
+        "routine": "Use Vitamin C serum in morning, Niacinamide serum at night, and always apply SPF 30+",
+        "key_ingredients": "Vitamin C, Niacinamide, Alpha Arbutin, Kojic Acid",
+        "avoid": "Harsh scrubs, over-exfoliation, products with alcohol",
+        "timeline": "4-8 weeks for visible results"
+    },
+    "anti-aging": {
+        "routine": "Retinol at night, Hyaluronic acid serum, and broad-spectrum sunscreen daily",
+        "key_ingredients": "Retinol, Peptides, Hyaluronic Acid, Vitamin E",
+        "avoid": "Mixing retinol with AHA/BHA, sun exposure without SPF",
+        "timeline": "6-12 weeks for visible results"
+    },
+    "acne": {
+        "routine": "Salicylic acid cleanser, Benzoyl peroxide spot treatment, oil-free moisturizer",
+        "key_ingredients": "Salicylic Acid, Benzoyl Peroxide, Niacinamide, Tea Tree Oil",
+        "avoid": "Over-cleansing, heavy oils, comedogenic ingredients",
+        "timeline": "2-6 weeks for improvement"
+    },
+    "hydration": {
+        "routine": "Gentle cleanser, Hyaluronic acid serum, rich moisturizer, and gentle SPF",
+        "key_ingredients": "Hyaluronic Acid, Ceramides, Glycerin, Squalane",
+        "avoid": "Alcohol-based products, harsh exfoliants, over-cleansing",
+        "timeline": "2-4 weeks for improved hydration"
+    },
+    "oil control": {
+        "routine": "Foaming cleanser, BHA toner, oil-free moisturizer, mattifying SPF",
+        "key_ingredients": "Salicylic Acid, Niacinamide, Clay, Zinc Oxide",
+        "avoid": "Over-cleansing, heavy oils, alcohol-based astringents",
+        "timeline": "3-6 weeks for oil balance"
+    },
+    "sensitive": {
+        "routine": "Gentle cream cleanser, fragrance-free moisturizer, mineral SPF",
+        "key_ingredients": "Ceramides, Colloidal Oatmeal, Allantoin, Zinc Oxide",
+        "avoid": "Fragrances, essential oils, harsh actives, over-exfoliation",
+        "timeline": "2-4 weeks for reduced sensitivity"
+    }
+}
+
+DEFAULT_RECOMMENDATION = {
+    "routine": "Gentle cleanser, moisturizer suited for your skin type, and daily SPF protection",
+    "key_ingredients": "Hyaluronic Acid, Ceramides, Niacinamide",
+    "avoid": "Harsh ingredients, over-exfoliation",
+    "timeline": "4-6 weeks for visible results"
+}
+
+# Secondary keywords, checked only when no catalog key appears in the goal
+GOAL_KEYWORDS = [
+    ("brightening", ["bright", "glow", "even", "dark"]),
+    ("anti-aging", ["aging", "wrinkle", "fine", "line"]),
+    ("acne", ["acne", "pimple", "breakout", "blemish"]),
+    ("hydration", ["dry", "hydrat", "moisture"]),
+    ("oil control", ["oily", "oil", "shine", "mattify"]),
+    ("sensitive", ["sensitive", "irritat", "red"]),
+]
+
+
+def _trie_pattern(node) -> str:
+    """Regex source for a character trie; greedy optional tails match the longest term"""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return "(?:" + body + ")?" if "" in node else body
+
+
+def compile_goal_matcher(keys, keyword_groups):
+    """Build one trie-shaped regex over every catalog key and keyword, plus term priorities
+
+    Priority follows the original lookup order: catalog keys first, then the
+    keyword groups, each in declaration order. At any position the regex
+    returns the longest term starting there; every shorter term that also
+    matches is a prefix of it, so each term's priority is folded down to the
+    best among its prefixes and one match per position is enough.
+    """
+    terms = [(key, key) for key in keys]
+    terms += [(word, category) for category, words in keyword_groups for word in words]
+
+    priority = {}
+    for rank, (term, category) in enumerate(terms):
+        priority.setdefault(term, (rank, category))
+
+    trie = {}
+    for term in priority:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    effective = {
+        term: min(priority[term[:i]] for i in range(1, len(term) + 1) if term[:i] in priority)
+        for term in priority
+    }
+    return re.compile(_trie_pattern(trie)), effective
+
+
+_goal_matcher = None
+
+
+def goal_matcher():
+    """The matcher for the built-in catalog, built on first use (or by the startup warm-up)"""
+    global _goal_matcher
+    if _goal_matcher is None:
+        _goal_matcher = compile_goal_matcher(LOCAL_RECOMMENDATIONS, GOAL_KEYWORDS)
+    return _goal_matcher
+
+
+def match_goal(goal: str, matcher=None) -> Optional[str]:
+    """Catalog category for a free-text goal, or None if nothing matches"""
+    pattern, priority = matcher or goal_matcher()
+    text = goal.lower()
+    best = None
+    match = pattern.search(text)
+    while match:
+        rank, category = priority[match.group()]
+        if best is None or rank < best[0]:
+            best = (rank, category)
+            if rank == 0:
+                break
+        # Resume one character later so terms overlapping this match are still seen
+        match = pattern.search(text, match.start() + 1)
+    return best[1] if best else None
+
+
+def get_local_recommendation(goal: str, history: str = ""):
+    """Rule-based recommendation used when the remote model is unavailable
+
+    Adds catalog products for the goal, leaving out any that conflict with the
+    products in history, and notes those conflicts under "avoid".
+    """
+    category = match_goal(goal)
+    recommendation = dict(LOCAL_RECOMMENDATIONS[category] if category else DEFAULT_RECOMMENDATION)
+    catalog = get_catalog()
+    products = catalog.rank(category, history, limit=SUGGESTED_PRODUCTS)
+    if products:
+        recommendation["products"] = "\n".join(
+            f"- {product.name} ({product.type}): {', '.join(product.ingredients)}" for product in products)
+    notes = catalog.conflict_notes(history)
+    if notes:
+        recommendation["avoid"] += "\n\n" + "\n".join(f"- {note}" for note in notes)
+    return recommendation
+
+
+class LatencyBudgetExceeded(InferenceError):
+    """The model did not answer within the latency budget; the call continues in the background"""
+
+
+def _generate_and_cache(client, cache, key, prompt):
+    recommendation = parse_generation(client.generate(build_payload(prompt)), prompt)
+    if recommendation:
+        cache.set(key, recommendation)
+    return recommendation
+
+
+async def _agenerate_and_cache(client, cache, key, prompt):
+    recommendation = parse_generation(await client.agenerate(build_payload(prompt)), prompt)
+    if recommendation:
+        cache.set(key, recommendation)
+    return recommendation
+
+
+# Identical cache misses in flight at the same time share one model call
+in_flight = SingleFlight()
+
+_background_slots = threading.BoundedSemaphore(BACKGROUND_CALLS)
+_background_pool = None
+_background_pool_lock = threading.Lock()
+_background_tasks = set()
+
+
+def _late_result(future):
+    """Done-callback for a call that outlived its budget: its result is already cached"""
+    _background_tasks.discard(future)
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.info("Background inference failed: %s", error)
+    get_metrics().increment("late_results", outcome="failed" if error or not future.result() else "cached")
+
+
+def _generate_within_budget(client, cache, key, prompt, budget):
+    global _background_pool
+    if not _background_slots.acquire(blocking=False):
+        raise LatencyBudgetExceeded("Every background inference slot is busy")
+    if _background_pool is None:
+        with _background_pool_lock:
+            if _background_pool is None:
+                _background_pool = ThreadPoolExecutor(BACKGROUND_CALLS, thread_name_prefix="inference-background")
+
+    def call():
+        try:
+            return _generate_and_cache(client, cache, key, prompt)
+        finally:
+            _background_slots.release()
+
+    future = _background_pool.submit(call)
+    try:
+        return future.result(timeout=budget)
+    except FutureTimeoutError:
+        future.add_done_callback(_late_result)
+        raise LatencyBudgetExceeded(f"No answer within {budget * 1000:.0f} ms") from None
+
+
+async def _agenerate_within_budget(client, cache, key, prompt, budget):
+    task = asyncio.ensure_future(_agenerate_and_cache(client, cache, key, prompt))
+    done, _ = await asyncio.wait({task}, timeout=budget)
+    if task in done:
+        return task.result()
+    # Keep a reference so the task is not garbage collected before it finishes
+    _background_tasks.add(task)
+    task.add_done_callback(_late_result)
+    raise LatencyBudgetExceeded(f"No answer within {budget * 1000:.0f} ms")
+
+
+def _report_fallback(e: Exception, on_warning: Optional[Callable[[str], None]] = None):
+    if isinstance(e, CircuitOpenError):
+        reason = "circuit_open"
+    elif isinstance(e, LatencyBudgetExceeded):
+        reason = "latency_budget"
+    else:
+        reason = "inference_error"
+    # An open circuit is the expected state during an outage, not news on every request
+    logger.log(logging.DEBUG if reason == "circuit_open" else logging.WARNING, "Inference request failed: %s", e)
+    count_fallback(reason)
+    if on_warning:
+        on_warning(LATENCY_BUDGET_NOTICE if reason == "latency_budget" else FALLBACK_WARNING)
+
+
+def get_skincare_recommendation(goal: str, history: str, brightness: float,
+                                on_warning: Optional[Callable[[str], None]] = None,
+                                client: Optional[InferenceBackend] = None,
+                                cache: Optional[RecommendationCache] = None,
+                                progress: Optional[StageReporter] = None,
+                                latency_budget: Optional[float] = LATENCY_BUDGET):
+    """Get skincare recommendation using Hugging Face API or local fallback
+
+    With a latency_budget (seconds), the local recommendation is returned as
+    soon as the budget runs out; the remote call finishes in the background
+    and caches its answer for the next identical request.
+    """
+    client = client or get_default_backend()
+    cache = cache or get_default_cache()
+    progress = progress or StageReporter()
+    prompt = build_prompt(goal, history, brightness)
+
+    # Try Hugging Face API first (if API key is available)
+    if client.enabled:
+        with progress.stage("cache"):
+            key = make_cache_key(goal, history, brightness)
+            cached = cache.get(key)
+        if cached is not None:
+            progress.skip("inference")
+            return cached
+
+        try:
+            with progress.stage("inference"):
+                if latency_budget is None:
+                    recommendation = in_flight.do(key, lambda: _generate_and_cache(client, cache, key, prompt))
+                else:
+                    recommendation = in_flight.do(key, lambda: _generate_within_budget(client, cache, key, prompt,
+                                                                                       latency_budget))
+            if recommendation:
+                return recommendation
+            count_fallback("empty_generation")
+
+        except Exception as e:
+            _report_fallback(e, on_warning)
+    else:
+        progress.skip("cache", "inference")
+
+    # Return local recommendation as primary or fallback (never cached, so a recovered API is used again)
+    return get_local_recommendation(goal, history)
+
+
+async def get_skincare_recommendation_async(goal: str, history: str, brightness: float,
+                                            client: Optional[InferenceBackend] = None,
+                                            cache: Optional[RecommendationCache] = None,
+                                            progress: Optional[StageReporter] = None,
+                                            latency_budget: Optional[float] = LATENCY_BUDGET):
+    """Async variant of get_skincare_recommendation"""
+    client = client or get_default_backend()
+    cache = cache or get_default_cache()
+    progress = progress or StageReporter()
+    prompt = build_prompt(goal, history, brightness)
+
+    if client.enabled:
+        with progress.stage("cache"):
+            key = make_cache_key(goal, history, brightness)
+            cached = cache.get(key)
+        if cached is not None:
+            progress.skip("inference")
+            return cached
+
+        try:
+            with progress.stage("inference"):
+                if latency_budget is None:
+                    recommendation = await in_flight.ado(key, lambda: _agenerate_and_cache(client, cache, key, prompt))
+                else:
+                    recommendation = await in_flight.ado(key, lambda: _agenerate_within_budget(
+                        client, cache, key, prompt, latency_budget))
+            if recommendation:
+                return recommendation
+            count_fallback("empty_generation")
+
+        except Exception as e:
+            _report_fallback(e)
+    else:
+        progress.skip("cache", "inference")
+
+    return get_local_recommendation(goal, history)
+
+
+def format_recommendation(recommendation) -> str:
+    """Markdown rendering of a structured recommendation"""
+    if not isinstance(recommendation, dict):
+        return str(recommendation)
+    if "recommendation" in recommendation:
+        return recommendation["recommendation"]
+    return "\n\n".join(f"**{label}:**\n{recommendation[field]}"
+                        for field, label in RECOMMENDATION_SECTIONS if field in recommendation)
+
+
+def stream_local_recommendation(goal: str, history: str = ""):
+    """Local generator backend: the rule-based recommendation, word by word"""
+    text = format_recommendation(get_local_recommendation(goal, history))
+    for line in text.splitlines(keepends=True):
+        for word in line.split(" "):
+            yield word + " " if not word.endswith("\n") else word
+
+
+class RecommendationStream:
+    """Iterable of recommendation text chunks, as produced by stream_skincare_recommendation
+
+    Iterate it (e.g. with st.write_stream) to render the text as it arrives;
+    afterwards result() returns the recommendation in the same shape
+    get_skincare_recommendation would have.
+    """
+
+    def __init__(self, goal, history, brightness, client, cache, on_warning, stall_timeout, deadline):
+        self.goal = goal
+        self.history = history
+        self.brightness = brightness
+        self.client = client
+        self.cache = cache
+        self.on_warning = on_warning
+        self.stall_timeout = stall_timeout
+        self.deadline = deadline
+        self._result = None
+
+    def result(self):
+        return self._result
+
+    def _fallback(self):
+        self._result = get_local_recommendation(self.goal, self.history)
+        return stream_local_recommendation(self.goal, self.history)
+
+    def __iter__(self):
+        if not self.client.enabled:
+            yield from self._fallback()
+            return
+
+        key = make_cache_key(self.goal, self.history, self.brightness)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._result = cached
+            yield format_recommendation(cached)
+            return
+
+        prompt = build_prompt(self.goal, self.history, self.brightness)
+        parts = []
+        try:
+            for chunk in self.client.stream(build_payload(prompt), deadline=self.deadline,
+                                            stall_timeout=self.stall_timeout):
+                # Non-streaming endpoints echo the prompt ahead of the generated text
+                if not parts and chunk.startswith(prompt):
+                    chunk = chunk[len(prompt):].lstrip()
+                parts.append(chunk)
+                yield chunk
+        except CircuitOpenError as e:
+            logger.debug("Inference stream skipped: %s", e)
+            count_fallback("circuit_open")
+            if self.on_warning:
+                self.on_warning(FALLBACK_WARNING)
+            yield from self._fallback()
+            return
+        except InferenceError as e:
+            logger.warning("Inference stream failed: %s", e)
+            count_fallback("stream_error")
+            if self.on_warning:
+                self.on_warning(FALLBACK_WARNING)
+            if parts:
+                yield "\n\n---\n\n"
+            yield from self._fallback()
+            return
+
+        text = "".join(parts).strip()
+        if not text:
+            count_fallback("empty_generation")
+            yield from self._fallback()
+            return
+        self._result = {"recommendation": text, "source": "AI Generated"}
+        self.cache.set(key, self._result)
+
+
+def stream_skincare_recommendation(goal: str, history: str, brightness: float,
+                                   on_warning: Optional[Callable[[str], None]] = None,
+                                   client: Optional[InferenceBackend] = None,
+                                   cache: Optional[RecommendationCache] = None,
+                                   stall_timeout: float = STREAM_STALL_TIMEOUT,
+                                   deadline: float = STREAM_DEADLINE) -> RecommendationStream:
+    """Streaming variant of get_skincare_recommendation
+
+    Nothing is requested until the returned stream is iterated. If the
+    endpoint fails, stalls for stall_timeout seconds or runs past deadline,
+    the stream continues with the local recommendation.
+    """
+    return RecommendationStream(goal, history, brightness, client or get_default_backend(),
+                                cache or get_default_cache(), on_warning, stall_timeout, deadline)
@@ -0,0 +1,254 @@
+"""Downloadable reports for processed skincare requests
+
+Templates are parsed once at import into literal/field parts, so rendering a
+report is a single join. Nothing is rendered until a report is asked for:
+the UI passes render_report as a deferred download, and bulk exports stream
+one report at a time into a zip.
+"""
+import html
+import io
+import json
+import time
+import zipfile
+from string import Formatter
+from typing import Iterable, Iterator, Optional, Tuple
+
+from .recommendation import RECOMMENDATION_SECTIONS
+
+
+class ReportTemplate:
+    """str.format-style template, parsed once and rendered by joining parts"""
+
+    def __init__(self, source: str):
+        self._parts = [(literal, field) for literal, field, _, _ in Formatter().parse(source)]
+
+    def render(self, fields: dict) -> str:
+        return "".join(literal + (str(fields[field]) if field is not None else "")
+                       for literal, field in self._parts)
+
+
+TEXT_TEMPLATE = ReportTemplate("""
+SKINCARE RECOMMENDATION REPORT
+Generated by AI Skincare Recommendation System
+Date: {date}
+
+═══════════════════════════════════════════════════════════════
+
+📊 IMAGE ANALYSIS RESULTS:
+• Brightness Score: {brightness_score}/255
+• Brightness Level: {brightness_level}
+• Redness Index: {redness_index}/100
+• Texture Score: {texture_score}
+• Shine: {shine_score}%
+• Processing Status: {status}
+
+═══════════════════════════════════════════════════════════════
+
+🎯 YOUR INPUT:
+• Skincare Goal: {goal}
+• Product History: {history}
+
+═══════════════════════════════════════════════════════════════
+
+💡 AI-POWERED RECOMMENDATIONS:
+{recommendation}
+═══════════════════════════════════════════════════════════════
+
+🛒 GET PREMIUM SKINCARE PRODUCTS:
+Visit Dermatics India: https://dermatics.in/
+Get premium skincare products delivered to your doorstep!
+
+═══════════════════════════════════════════════════════════════
+
+DISCLAIMER:
+This is an AI-powered tool for educational purposes.
+Always consult with a dermatologist for serious skin concerns.
+
+Generated by AI Skincare Recommendation System
+""")
+
+HTML_TEMPLATE = ReportTemplate("""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Skincare Recommendation Report</title>
+<style>
+body {{ font-family: 'Poppins', sans-serif; max-width: 720px; margin: 2rem auto; color: #212529; }}
+h1 {{ color: #d63384; }} h2 {{ color: #6f42c1; }}
+td {{ padding: 4px 12px 4px 0; }}
+</style>
+</head>
+<body>
+<h1>Skincare Recommendation Report</h1>
+<p>Generated by AI Skincare Recommendation System on {date}</p>
+<h2>📊 Image Analysis Results</h2>
+<table>
+<tr><td>Brightness Score</td><td>{brightness_score}/255</td></tr>
+<tr><td>Brightness Level</td><td>{brightness_level}</td></tr>
+<tr><td>Redness Index</td><td>{redness_index}/100</td></tr>
+<tr><td>Texture Score</td><td>{texture_score}</td></tr>
+<tr><td>Shine</td><td>{shine_score}%</td></tr>
+<tr><td>Processing Status</td><td>{status}</td></tr>
+</table>
+<h2>🎯 Your Input</h2>
+<p><strong>Skincare Goal:</strong> {goal}<br><strong>Product History:</strong> {history}</p>
+<h2>💡 AI-Powered Recommendations</h2>
+{recommendation}
+<h2>🛒 Get Premium Skincare Products</h2>
+<p>Visit <a href="https://dermatics.in/">Dermatics India</a>. Get premium skincare products delivered to your doorstep!</p>
+<p><small>This is an AI-powered tool for educational purposes.
+Always consult with a dermatologist for serious skin concerns.</small></p>
+</body>
+</html>
+""")
+
+# Section headings as they appear in the text report
+TEXT_SECTIONS = [(field, label.upper()) for field, label in RECOMMENDATION_SECTIONS]
+
+# format name -> (file extension, MIME type)
+REPORT_FORMATS = {
+    "text": ("txt", "text/plain"),
+    "json": ("json", "application/json"),
+    "html": ("html", "text/html"),
+}
+
+
+def _report_fields(result: dict, generated_at: Optional[time.struct_time], escape=str) -> dict:
+    analysis = result['analysis']
+    return {
+        "date": time.strftime('%Y-%m-%d %H:%M:%S', generated_at or time.localtime()),
+        "brightness_score": analysis['brightness_score'],
+        "brightness_level": escape(str(analysis['brightness_level'])),
+        "redness_index": analysis.get('redness_index', 'n/a'),
+        "texture_score": analysis.get('texture_score', 'n/a'),
+        "shine_score": analysis.get('shine_score', 'n/a'),
+        "status": 'Success' if analysis['image_processed'] else 'Failed',
+        "goal": escape(str(result['user_input']['goal'])),
+        "history": escape(str(result['user_input']['history'])),
+    }
+
+
+def _text_recommendation(recommendation) -> str:
+    if not isinstance(recommendation, dict):
+        return f"\n{recommendation}\n"
+    parts = [f"\n{label}:\n{recommendation[field]}\n"
+             for field, label in TEXT_SECTIONS if field in recommendation]
+    if 'recommendation' in recommendation:
+        parts.append(f"\n📝 AI GENERATED ADVICE:\n{recommendation['recommendation']}\n")
+        if 'source' in recommendation:
+            parts.append(f"Source: {recommendation['source']}\n")
+    return "".join(parts)
+
+
+def _html_recommendation(recommendation) -> str:
+    def paragraph(text):
+        return "<p>" + html.escape(str(text)).replace("\n", "<br>") + "</p>"
+
+    if not isinstance(recommendation, dict):
+        return paragraph(recommendation)
+    parts = [f"<h3>{html.escape(label)}</h3>{paragraph(recommendation[field])}"
+             for field, label in RECOMMENDATION_SECTIONS if field in recommendation]
+    if 'recommendation' in recommendation:
+        parts.append(f"<h3>📝 AI Generated Advice</h3>{paragraph(recommendation['recommendation'])}")
+        if 'source' in recommendation:
+            parts.append(f"<p><em>Source: {html.escape(str(recommendation['source']))}</em></p>")
+    return "\n".join(parts)
+
+
+def build_text_report(result: dict, generated_at: Optional[time.struct_time] = None) -> str:
+    """Plain-text report of a process_skincare_request response"""
+    fields = _report_fields(result, generated_at)
+    fields["recommendation"] = _text_recommendation(result['recommendation'])
+    return TEXT_TEMPLATE.render(fields)
+
+
+def build_html_report(result: dict, generated_at: Optional[time.struct_time] = None) -> str:
+    """Standalone HTML page (print it to PDF from the browser)"""
+    fields = _report_fields(result, generated_at, escape=html.escape)
+    fields["recommendation"] = _html_recommendation(result['recommendation'])
+    return HTML_TEMPLATE.render(fields)
+
+
+def build_json_report(result: dict, generated_at: Optional[time.struct_time] = None) -> str:
+    recommendation = result['recommendation']
+    return json.dumps({
+        "generated_at": time.strftime('%Y-%m-%dT%H:%M:%S%z', generated_at or time.localtime()),
+        "analysis": result['analysis'],
+        "user_input": result['user_input'],
+        "recommendation": recommendation if isinstance(recommendation, dict) else str(recommendation),
+        "mock_collection_link": result.get('mock_collection_link'),
+    }, ensure_ascii=False, indent=2)
+
+
+_BUILDERS = {
+    "text": build_text_report,
+    "json": build_json_report,
+    "html": build_html_report,
+}
+
+
+def render_report(result: dict, report_format: str = "text", generated_at: Optional[time.struct_time] = None) -> str:
+    """Report in one of REPORT_FORMATS"""
+    try:
+        builder = _BUILDERS[report_format]
+    except KeyError:
+        raise ValueError(f"Unknown report format {report_format!r}; expected one of {', '.join(REPORT_FORMATS)}") from None
+    return builder(result, generated_at)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file that hands written bytes back in chunks"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ReportArchive:
+    """Zip of reports built one at a time; add() and close() return the bytes ready to send
+
+    zipfile writes data descriptors when the output is not seekable, so
+    nothing already returned ever has to be rewound.
+    """
+
+    def __init__(self, report_format: str = "text"):
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format {report_format!r}; expected one of {', '.join(REPORT_FORMATS)}")
+        self.report_format = report_format
+        self.extension = REPORT_FORMATS[report_format][0]
+        self._sink = _ChunkSink()
+        self._archive = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def add(self, name: str, result: dict) -> bytes:
+        self._archive.writestr(f"{name}.{self.extension}", render_report(result, self.report_format))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        """The rest of the archive (the central directory)"""
+        self._archive.close()
+        return self._sink.drain()
+
+
+def stream_report_archive(results: Iterable[Tuple[str, dict]], report_format: str = "text") -> Iterator[bytes]:
+    """Zip of many reports, yielded in chunks as each one is rendered
+
+    results yields (name, response) pairs and is consumed lazily, so only one
+    report is held in memory at a time.
+    """
+    archive = ReportArchive(report_format)
+    for name, result in results:
+        chunk = archive.add(name, result)
+        if chunk:
+            yield chunk
+    yield archive.close()
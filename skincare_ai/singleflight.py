@@ -0,0 +1,79 @@
+"""Single-flight coalescing of identical in-flight work
+
+While a call for a key is running, later callers with the same key wait for
+it and share its result (or exception) instead of starting their own. Nothing
+is remembered once the call finishes; that is the cache's job. Async calls
+only coalesce with others on the same event loop, since a task cannot be
+awaited from another one.
+"""
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Future
+
+from .metrics import get_metrics
+
+
+class SingleFlight:
+    def __init__(self, name: str = "recommendation"):
+        self.name = name
+        self._calls = {}
+        self._tasks = weakref.WeakKeyDictionary()  # event loop -> {key: task}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    def _count(self, coalesced: bool):
+        # Called with self._lock held
+        self._stats["calls"] += 1
+        if coalesced:
+            self._stats["coalesced"] += 1
+            get_metrics().increment("coalesced_calls", flight=self.name)
+
+    def do(self, key, fn):
+        """fn(), unless a call for key is already running; then that call's outcome"""
+        with self._lock:
+            call = self._calls.get(key)
+            self._count(call is not None)
+            if call is None:
+                call = self._calls[key] = Future()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key, coro_fn):
+        """Async counterpart of do(); coro_fn() is awaited once per key at a time on each event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            self._count(task is not None)
+            if task is None:
+                task = tasks[key] = asyncio.ensure_future(coro_fn())
+                task.add_done_callback(lambda _: self._forget_task(tasks, key, task))
+        # Shielded, so one caller going away does not cancel the others' result
+        return await asyncio.shield(task)
+
+    def _forget_task(self, tasks, key, task):
+        with self._lock:
+            if tasks.get(key) is task:
+                del tasks[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            tasks = sum(len(loop_tasks) for loop_tasks in self._tasks.values())
+            return dict(self._stats, in_flight=len(self._calls) + tasks)
@@ -0,0 +1,179 @@
+"""Process start-up: warming shared state before traffic, and import-time reporting
+
+warm_up() does the work the first request would otherwise pay for: importing
+numpy/Pillow/httpx, running a tiny image through the analysis, building the
+goal matcher and the product catalog index, opening the cache tiers and a
+pooled connection to the inference endpoint. The API runs it in its lifespan;
+the Streamlit app starts it in a background thread on its first run.
+
+    python -m skincare_ai.startup                    # import-time report
+    python -m skincare_ai.startup --budget-ms 250    # fail (exit 1) when over budget, for CI
+
+The report fails as well when a module in HEAVY_MODULES is imported eagerly,
+which catches a new top-level "import numpy" creeping back in.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Optional
+
+from .lazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_ENABLED = os.environ.get("SKINCARE_WARM_UP", "1") != "0"
+# Dependencies that must only be imported on first use (see lazy.py)
+HEAVY_MODULES = ("numpy", "PIL.Image", "httpx")
+# Modules the report imports by default: the package and the pipeline the UI and API share
+REPORT_MODULES = ("skincare_ai", "skincare_ai.pipeline")
+
+
+def _warm_imports():
+    for name in HEAVY_MODULES:
+        lazy_import(name).load()
+    # Registers every Pillow decoder plugin up front instead of on the first unknown format
+    lazy_import("PIL.Image").init()
+
+
+def _warm_analysis():
+    from .analysis import analyze_skin
+
+    np = lazy_import("numpy")
+    analyze_skin(np.full((8, 8, 3), 128, dtype=np.uint8))
+
+
+def _warm_goal_index():
+    from .recommendation import goal_matcher
+
+    goal_matcher()
+
+
+def _warm_catalog():
+    from .catalog import get_catalog
+
+    get_catalog()
+
+
+def warm_up(backend=None, cache=None, connect: bool = True) -> dict:
+    """Pre-build shared state; {step: milliseconds}, with failed steps logged and set to None
+
+    backend and cache are optional: without them only the process-local work
+    (imports, analysis, goal matcher, catalog) is done, which is what pool workers need.
+    Never raises; a replica that cannot reach its endpoint should still start.
+    """
+    steps = [("imports", _warm_imports), ("analysis", _warm_analysis), ("goal_index", _warm_goal_index),
+             ("catalog", _warm_catalog)]
+    if cache is not None:
+        steps.append(("cache", cache.warm))
+    if backend is not None:
+        steps.append(("backend", lambda: backend.warm_up(connect)))
+
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            timings[name] = None
+            continue
+        timings[name] = round((time.perf_counter() - start) * 1000, 3)
+    logger.info("Warm-up finished: %s", ", ".join(
+        f"{name} {'failed' if ms is None else f'{ms:.1f} ms'}" for name, ms in timings.items()))
+    return timings
+
+
+def warm_up_in_background(backend_factory=None, cache_factory=None, connect: bool = True,
+                          start: bool = True) -> threading.Thread:
+    """Run warm_up() on a daemon thread; the factories are called there too, so creating
+    the backend (and importing httpx) stays off the caller's thread
+
+    Pass start=False to prepare the thread (e.g. attach a context) before starting it.
+    """
+    def run():
+        warm_up(backend_factory() if backend_factory else None,
+                cache_factory() if cache_factory else None, connect)
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    if start:
+        thread.start()
+    return thread
+
+
+def import_times(module: str, python: str = sys.executable) -> list:
+    """[(depth, name, self_us, cumulative_us)] for a fresh `import module`, from -X importtime
+
+    Only the import's own tree is kept (not the interpreter's start-up, e.g.
+    site), in the interpreter's order: each module after the ones it imported.
+    """
+    completed = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, check=True)
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # the header row
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+
+    end = max(i for i, (depth, name, _, _) in enumerate(entries) if depth == 0 and name == module)
+    start = end
+    while start > 0 and entries[start - 1][0] > 0:
+        start -= 1
+    return entries[start:end + 1]
+
+
+def import_report(module: str, top: int = 15, python: str = sys.executable) -> dict:
+    entries = import_times(module, python)
+    total = entries[-1][3]
+    imported = {name for _, name, _, _ in entries}
+    slowest = sorted(entries, key=lambda entry: entry[3], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": round(total / 1000, 1),
+        "eager_heavy_modules": [name for name in HEAVY_MODULES if name in imported],
+        "slowest": [{"module": name, "depth": depth, "self_ms": round(self_us / 1000, 1),
+                     "cumulative_ms": round(cumulative_us / 1000, 1)}
+                    for depth, name, self_us, cumulative_us in slowest],
+    }
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time report for the skincare_ai start-up path")
+    parser.add_argument("modules", nargs="*", default=list(REPORT_MODULES))
+    parser.add_argument("--budget-ms", type=float, help="fail when a module takes longer than this to import")
+    parser.add_argument("--allow-heavy", action="store_true", help="do not fail on eagerly imported HEAVY_MODULES")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list per module")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    reports = [import_report(module, args.top) for module in args.modules]
+    failures = []
+    for report in reports:
+        if args.budget_ms is not None and report["total_ms"] > args.budget_ms:
+            failures.append(f"{report['module']} took {report['total_ms']} ms to import (budget {args.budget_ms:g} ms)")
+        if report["eager_heavy_modules"] and not args.allow_heavy:
+            failures.append(f"{report['module']} imports {', '.join(report['eager_heavy_modules'])} eagerly")
+
+    if args.json:
+        print(json.dumps({"reports": reports, "failures": failures}, indent=2))
+    else:
+        for report in reports:
+            print(f"{report['module']}: {report['total_ms']} ms")
+            for entry in report["slowest"]:
+                print(f"  {entry['cumulative_ms']:8.1f} ms  {entry['self_ms']:7.1f} ms self  "
+                      f"{'  ' * entry['depth']}{entry['module']}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Bounded store for raw uploads shared by every session in a process
+
+Sessions keep only a handle. Upload bytes stay in memory while the total fits
+in memory_budget; beyond that the least recently used uploads are written to
+temp files and served back through read-only memory maps, so they cost page
+cache rather than heap. Uploads idle for longer than idle_timeout are removed.
+"""
+import mmap
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+DEFAULT_MEMORY_BUDGET = int(os.environ.get("SKINCARE_UPLOAD_MEMORY_MB", 256)) * 1024 * 1024
+DEFAULT_DISK_BUDGET = int(os.environ.get("SKINCARE_UPLOAD_DISK_MB", 4096)) * 1024 * 1024
+DEFAULT_IDLE_TIMEOUT = int(os.environ.get("SKINCARE_UPLOAD_IDLE_SECONDS", 30 * 60))
+
+
+class _Upload:
+    __slots__ = ("name", "size", "data", "path", "view", "last_access")
+
+    def __init__(self, name, data):
+        self.name = name
+        self.size = len(data)
+        self.data = data
+        self.path = None
+        self.view = None
+        self.last_access = time.monotonic()
+
+
+class UploadStore:
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, disk_budget: int = DEFAULT_DISK_BUDGET,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT, spill_dir: Optional[str] = None):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.idle_timeout = idle_timeout
+        self.spill_dir = spill_dir
+        self._uploads = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._stats = {"spills": 0, "evictions": 0, "expirations": 0}
+
+    def put(self, data: bytes, name: Optional[str] = None) -> str:
+        """Store an upload and return its handle"""
+        handle = uuid.uuid4().hex
+        with self._lock:
+            self._expire_idle(time.monotonic())
+            self._uploads[handle] = _Upload(name, bytes(data))
+            self._memory_bytes += len(data)
+            self._enforce_budgets()
+        return handle
+
+    def get(self, handle: Optional[str]):
+        """Upload bytes (bytes or a read-only mmap), or None if the handle was evicted"""
+        with self._lock:
+            upload = self._uploads.get(handle) if handle else None
+            if upload is None:
+                return None
+            upload.last_access = time.monotonic()
+            self._uploads.move_to_end(handle)
+            if upload.data is not None:
+                return upload.data
+            if upload.view is None:
+                with open(upload.path, "rb") as f:
+                    upload.view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return upload.view
+
+    def name(self, handle: Optional[str]) -> Optional[str]:
+        with self._lock:
+            upload = self._uploads.get(handle) if handle else None
+            return upload.name if upload else None
+
+    def discard(self, handle: Optional[str]):
+        with self._lock:
+            upload = self._uploads.pop(handle, None) if handle else None
+            if upload is not None:
+                self._release(upload)
+
+    def evict_idle(self):
+        with self._lock:
+            self._expire_idle(time.monotonic())
+
+    def stats(self) -> dict:
+        with self._lock:
+            spilled = sum(1 for upload in self._uploads.values() if upload.data is None)
+            return dict(self._stats, uploads=len(self._uploads), spilled=spilled,
+                        memory_bytes=self._memory_bytes, disk_bytes=self._disk_bytes)
+
+    def close(self):
+        with self._lock:
+            for upload in self._uploads.values():
+                self._release(upload)
+            self._uploads.clear()
+
+    def _expire_idle(self, now):
+        for handle, upload in list(self._uploads.items()):
+            if now - upload.last_access <= self.idle_timeout:
+                break  # ordered by last access, so the rest are fresher
+            del self._uploads[handle]
+            self._release(upload)
+            self._stats["expirations"] += 1
+
+    def _enforce_budgets(self):
+        # Spill least recently used in-memory uploads until the heap budget holds
+        for upload in self._uploads.values():
+            if self._memory_bytes <= self.memory_budget:
+                break
+            if upload.data:
+                self._spill(upload)
+
+        # Then drop the least recently used spilled uploads if the disk budget is exceeded
+        if self._disk_bytes > self.disk_budget:
+            for handle in [h for h, upload in self._uploads.items() if upload.path is not None]:
+                if self._disk_bytes <= self.disk_budget:
+                    break
+                self._release(self._uploads.pop(handle))
+                self._stats["evictions"] += 1
+
+    def _spill(self, upload):
+        fd, path = tempfile.mkstemp(prefix="skincare-upload-", dir=self.spill_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(upload.data)
+        upload.path = path
+        upload.data = None
+        self._memory_bytes -= upload.size
+        self._disk_bytes += upload.size
+        self._stats["spills"] += 1
+
+    def _release(self, upload):
+        if upload.data is not None:
+            self._memory_bytes -= upload.size
+            upload.data = None
+        if upload.view is not None:
+            try:
+                upload.view.close()
+            except BufferError:
+                pass  # still exported by a caller; the map goes away with its last reference
+            upload.view = None
+        if upload.path is not None:
+            self._disk_bytes -= upload.size
+            try:
+                os.unlink(upload.path)
+            except OSError:
+                pass
+            upload.path = None
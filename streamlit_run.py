@@ -1,12 +1,18 @@
 import streamlit as st
-import requests
-import json
-from PIL import Image
-import io
-import os
-import tempfile
+from streamlit.runtime.scriptrunner import add_script_run_ctx
 import time
-from typing import Optional
+
+from skincare_ai.cache import RecommendationCache
+from skincare_ai.history import DEFAULT_HISTORY_PATH, HistoryStore, Trend
+from skincare_ai.backends import create_backend
+from skincare_ai.imaging import content_digest, load_image
+from skincare_ai.metrics import start_request
+from skincare_ai.options import AGE_RANGES, POPULAR_GOALS, PREVIOUS_PRODUCTS, SKIN_TYPES, SKINCARE_GOALS
+from skincare_ai.pipeline import process_skincare_request as run_skincare_pipeline
+from skincare_ai.recommendation import RecommendationStream
+from skincare_ai.report import REPORT_FORMATS, render_report
+from skincare_ai.startup import WARM_UP_ENABLED, warm_up_in_background
+from skincare_ai.uploads import UploadStore
 
 # Configure Streamlit page
 st.set_page_config(
@@ -156,185 +162,98 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if 'uploaded_file_data' not in st.session_state:
-    st.session_state.uploaded_file_data = None
+if 'upload_handle' not in st.session_state:
+    st.session_state.upload_handle = None
 if 'uploaded_file_name' not in st.session_state:
     st.session_state.uploaded_file_name = None
+if 'uploaded_file_id' not in st.session_state:
+    st.session_state.uploaded_file_id = None
+if 'uploaded_file_digest' not in st.session_state:
+    st.session_state.uploaded_file_digest = None
 if 'selected_goal' not in st.session_state:
     st.session_state.selected_goal = ''
 
-# Backend Logic - Moved from FastAPI to Streamlit
-@st.cache_data
-def calculate_brightness(image_bytes):
-    """Calculate average brightness of the uploaded image"""
-    try:
-        # Open image from bytes
-        img = Image.open(io.BytesIO(image_bytes)).convert('L')  # Convert to grayscale
-        
-        # Calculate average brightness
-        brightness = sum(img.getdata()) / (img.width * img.height)
-        return round(brightness, 2)
-    except Exception as e:
-        st.error(f"Error processing image: {str(e)}")
+# Backend logic lives in the skincare_ai package; the UI only adds shared resources and messages
+@st.cache_resource
+def get_inference_client():
+    """One inference backend (SKINCARE_BACKEND) shared by every session; a local model loads on first use"""
+    return create_backend()
+
+@st.cache_resource
+def get_recommendation_cache():
+    """Recommendation cache shared by every session (disk tier via SKINCARE_CACHE_PATH)"""
+    return RecommendationCache()
+
+@st.cache_resource
+def get_upload_store():
+    """Upload bytes for every session, within a global memory budget; sessions hold a handle"""
+    return UploadStore()
+
+@st.cache_resource
+def get_analysis_history():
+    """Per-profile analysis history shared by every session (None unless SKINCARE_HISTORY_PATH is set)"""
+    return HistoryStore() if DEFAULT_HISTORY_PATH else None
+
+@st.cache_resource
+def start_warm_up():
+    """Warm imports, the shared backend and the cache once per process, in the background
+    so the first page renders without waiting for it"""
+    thread = warm_up_in_background(get_inference_client, get_recommendation_cache, start=False)
+    # The shared resources it creates are st.cache_resource entries, which expect a script context
+    add_script_run_ctx(thread)
+    thread.start()
+    return thread
+
+# Progress bar captions for each pipeline stage
+STAGE_LABELS = {
+    "decode": "📂 Reading your portrait...",
+    "analysis": "🔬 Analyzing your skin...",
+    "cache": "🗂️ Checking saved recommendations...",
+    "inference": "🤖 Generating AI recommendations...",
+    "report": "📝 Preparing your results...",
+}
+
+# Metrics charted in the progress panel, with their labels
+PROGRESS_METRICS = {
+    "brightness_score": "Brightness",
+    "skin_brightness": "Skin brightness",
+    "redness_index": "Redness",
+    "shine_score": "Shine",
+}
+
+# Row labels for the face-zone table (keys of skincare_ai.analysis.FACE_ZONES)
+ZONE_LABELS = {
+    "forehead": "Forehead",
+    "t_zone": "T-zone",
+    "cheeks": "Cheeks",
+    "chin": "Chin",
+}
+
+def process_skincare_request(image_bytes, goal, history, on_progress=None, stream=False, digest=None, trace=None):
+    """Process the complete skincare recommendation request"""
+    return run_skincare_pipeline(image_bytes, goal, history, on_warning=st.warning,
+                                 client=get_inference_client(), cache=get_recommendation_cache(),
+                                 on_progress=on_progress, stream=stream, digest=digest, trace=trace)
+
+def show_portrait(caption):
+    """Preview the session's upload, decoding it at most once per content hash"""
+    image_bytes = get_upload_store().get(st.session_state.upload_handle)
+    if image_bytes is None:
+        st.session_state.upload_handle = None
+        st.warning("⌛ Your portrait expired after a period of inactivity. Please upload it again.")
         return None
-
-def get_skincare_recommendation(goal: str, history: str, brightness: float):
-    """Get skincare recommendation using Hugging Face API or local fallback"""
-    
-    # Construct prompt for skincare recommendation
-    prompt = f"""
-    As a skincare expert, provide a recommendation based on:
-    - Skincare Goal: {goal}
-    - Past Product History: {history}
-    - Skin Brightness Score: {brightness}/255 (higher means brighter skin)
-    
-    Please provide:
-    1. A specific skincare routine recommendation
-    2. Key ingredients to look for
-    3. Products to avoid
-    4. Expected timeline for results
-    
-    Keep the response concise and professional.
-    """
-    
-    # Fallback local recommendation function
-    def get_local_recommendation():
-        recommendations = {
-            "brightening": {
-                "routine": "Use Vitamin C serum in morning, Niacinamide serum at night, and always apply SPF 30+",
-                "key_ingredients": "Vitamin C, Niacinamide, Alpha Arbutin, Kojic Acid",
-                "avoid": "Harsh scrubs, over-exfoliation, products with alcohol",
-                "timeline": "4-8 weeks for visible results"
-            },
-            "anti-aging": {
-                "routine": "Retinol at night, Hyaluronic acid serum, and broad-spectrum sunscreen daily",
-                "key_ingredients": "Retinol, Peptides, Hyaluronic Acid, Vitamin E",
-                "avoid": "Mixing retinol with AHA/BHA, sun exposure without SPF",
-                "timeline": "6-12 weeks for visible results"
-            },
-            "acne": {
-                "routine": "Salicylic acid cleanser, Benzoyl peroxide spot treatment, oil-free moisturizer",
-                "key_ingredients": "Salicylic Acid, Benzoyl Peroxide, Niacinamide, Tea Tree Oil",
-                "avoid": "Over-cleansing, heavy oils, comedogenic ingredients",
-                "timeline": "2-6 weeks for improvement"
-            },
-            "hydration": {
-                "routine": "Gentle cleanser, Hyaluronic acid serum, rich moisturizer, and gentle SPF",
-                "key_ingredients": "Hyaluronic Acid, Ceramides, Glycerin, Squalane",
-                "avoid": "Alcohol-based products, harsh exfoliants, over-cleansing",
-                "timeline": "2-4 weeks for improved hydration"
-            },
-            "oil control": {
-                "routine": "Foaming cleanser, BHA toner, oil-free moisturizer, mattifying SPF",
-                "key_ingredients": "Salicylic Acid, Niacinamide, Clay, Zinc Oxide",
-                "avoid": "Over-cleansing, heavy oils, alcohol-based astringents",
-                "timeline": "3-6 weeks for oil balance"
-            },
-            "sensitive": {
-                "routine": "Gentle cream cleanser, fragrance-free moisturizer, mineral SPF",
-                "key_ingredients": "Ceramides, Colloidal Oatmeal, Allantoin, Zinc Oxide",
-                "avoid": "Fragrances, essential oils, harsh actives, over-exfoliation",
-                "timeline": "2-4 weeks for reduced sensitivity"
-            }
-        }
-        
-        # Match goal to recommendation
-        goal_lower = goal.lower()
-        for key in recommendations.keys():
-            if key in goal_lower:
-                return recommendations[key]
-        
-        # Check for specific keywords
-        if any(word in goal_lower for word in ["bright", "glow", "even", "dark"]):
-            return recommendations["brightening"]
-        elif any(word in goal_lower for word in ["aging", "wrinkle", "fine", "line"]):
-            return recommendations["anti-aging"]
-        elif any(word in goal_lower for word in ["acne", "pimple", "breakout", "blemish"]):
-            return recommendations["acne"]
-        elif any(word in goal_lower for word in ["dry", "hydrat", "moisture"]):
-            return recommendations["hydration"]
-        elif any(word in goal_lower for word in ["oily", "oil", "shine", "mattify"]):
-            return recommendations["oil control"]
-        elif any(word in goal_lower for word in ["sensitive", "irritat", "red"]):
-            return recommendations["sensitive"]
-        
-        # Default recommendation
-        return {
-            "routine": "Gentle cleanser, moisturizer suited for your skin type, and daily SPF protection",
-            "key_ingredients": "Hyaluronic Acid, Ceramides, Niacinamide",
-            "avoid": "Harsh ingredients, over-exfoliation",
-            "timeline": "4-6 weeks for visible results"
-        }
-    
-    # Try Hugging Face API first (if API key is available)
-    hf_api_key = "hf_bYQPJEhXsXRODCujrBNQYOxOzLsNSJvWV"
-    
-    if hf_api_key:
-        try:
-            headers = {"Authorization": f"Bearer {hf_api_key}"}
-            api_url = "https://api-inference.huggingface.co/models/gpt2"
-            
-            payload = {
-                "inputs": prompt,
-                "parameters": {
-                    "max_length": 200,
-                    "temperature": 0.7,
-                    "do_sample": True
-                }
-            }
-            
-            response = requests.post(api_url, headers=headers, json=payload, timeout=10)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    generated_text = result[0].get('generated_text', '')
-                    recommendation_text = generated_text.replace(prompt, '').strip()
-                    
-                    if recommendation_text:
-                        return {
-                            "recommendation": recommendation_text,
-                            "source": "AI Generated"
-                        }
-        
-        except Exception as e:
-            st.warning(f"AI API temporarily unavailable, using expert recommendations instead.")
     
-    # Return local recommendation as primary or fallback
-    return get_local_recommendation()
-
-def process_skincare_request(image_bytes, goal, history):
-    """Process the complete skincare recommendation request"""
     try:
-        # Calculate brightness
-        brightness_score = calculate_brightness(image_bytes)
-        
-        if brightness_score is None:
-            return None, "Failed to process image"
-        
-        # Get skincare recommendation
-        recommendation = get_skincare_recommendation(goal, history, brightness_score)
-        
-        # Create response
-        response = {
-            "analysis": {
-                "brightness_score": brightness_score,
-                "brightness_level": "High" if brightness_score > 200 else "Medium" if brightness_score > 100 else "Low",
-                "image_processed": True
-            },
-            "recommendation": recommendation,
-            "user_input": {
-                "goal": goal,
-                "history": history
-            },
-            "mock_collection_link": f"https://skincare-collection.com/recommended/{goal.lower().replace(' ', '-')}",
-            "status": "success"
-        }
-        
-        return response, None
-        
+        image = load_image(image_bytes, st.session_state.uploaded_file_digest)
     except Exception as e:
-        return None, f"Processing error: {str(e)}"
+        st.error(f"❌ Could not read this image: {str(e)}")
+        return None
+    
+    st.image(image.thumbnail, caption=caption, use_container_width=True)
+    
+    # Image info with premium styling
+    st.info(f"✨ Image Resolution: {image.size[0]}x{image.size[1]} pixels")
+    return image
 
 def display_results(result):
     """Display the API results in a nice format"""
@@ -366,6 +285,35 @@ def display_results(result):
             delta=None
         )
     
+    # Skin metrics from the fused analysis pass
+    if 'redness_index' in result['analysis']:
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric(label="Redness Index", value=f"{result['analysis']['redness_index']}/100")
+        
+        with col2:
+            st.metric(label="Texture Score", value=result['analysis']['texture_score'],
+                      help="Average local contrast; lower means smoother skin")
+        
+        with col3:
+            st.metric(label="Shine", value=f"{result['analysis']['shine_score']}%",
+                      help="Share of the photo showing specular highlights")
+        
+        zones = result['analysis'].get('zones')
+        if zones:
+            st.markdown("**🧭 Face zones** (skin pixels only)")
+            st.table([{"Zone": ZONE_LABELS.get(zone, zone), "Skin coverage %": stats['skin_coverage'],
+                       "Brightness": stats['brightness'], "Evenness (std)": stats['brightness_std'],
+                       "Redness": stats['redness']}
+                      for zone, stats in zones.items() if stats])
+        
+        with st.expander("🔬 Analysis details"):
+            st.json({"channels": result['analysis']['channels'],
+                     "skin_coverage": result['analysis'].get('skin_coverage'),
+                     "skin_brightness": result['analysis'].get('skin_brightness'),
+                     "timings_ms": result['analysis']['timings_ms']})
+    
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Recommendations
@@ -374,7 +322,13 @@ def display_results(result):
     
     recommendation = result['recommendation']
     
-    if isinstance(recommendation, dict):
+    if isinstance(recommendation, RecommendationStream):
+        # Render text as it arrives, then keep the final recommendation for the report
+        st.write_stream(recommendation)
+        recommendation = result['recommendation'] = recommendation.result()
+        if isinstance(recommendation, dict) and 'source' in recommendation:
+            st.caption(f"Source: {recommendation['source']}")
+    elif isinstance(recommendation, dict):
         # Structured recommendation
         if 'routine' in recommendation:
             st.markdown(f"**🔄 Recommended Routine:**")
@@ -384,6 +338,10 @@ def display_results(result):
             st.markdown(f"**🧪 Key Ingredients to Look For:**")
             st.write(recommendation['key_ingredients'])
         
+        if 'products' in recommendation:
+            st.markdown(f"**🛍️ Suggested Products:**")
+            st.markdown(recommendation['products'])
+        
         if 'avoid' in recommendation:
             st.markdown(f"**⚠️ Products/Ingredients to Avoid:**")
             st.write(recommendation['avoid'])
@@ -422,173 +380,139 @@ def display_results(result):
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-def main():
-    # Header with elegant styling
-    st.markdown('<h1 class="main-header">🌹 Premium Skincare Studio</h1>', unsafe_allow_html=True)
-    st.markdown('<p class="sub-header">✨ AI-Powered Beauty Recommendations with Rose Petal Elegance ✨</p>', unsafe_allow_html=True)
+def display_progress(store, profile, result):
+    """Save this analysis under the profile and chart it with the profile's earlier ones"""
+    analysis = result['analysis']
+    # The stored trend is one indexed read; this visit is added locally, as its write is still queued
+    trend = store.trend(profile) or Trend()
+    trend.add(time.time(), analysis)
+    store.record(profile, analysis, result['user_input']['goal'])
+    summary = trend.summary()
+    
+    st.markdown("### 📈 Your Progress")
+    if summary['count'] < 2:
+        st.info(f"💾 Saved as the first analysis for **{profile}**. Come back with the same profile name to track your progress!")
+        return
+    
+    columns = st.columns(len(PROGRESS_METRICS))
+    for column, (metric, label) in zip(columns, PROGRESS_METRICS.items()):
+        stats = summary['metrics'].get(metric)
+        if stats:
+            with column:
+                st.metric(label=label, value=stats['last'], delta=round(stats['last'] - stats['moving_average'], 2),
+                          delta_color="off", help=f"Change from your recent average ({stats['moving_average']})")
+    
+    chart = {label: [point.get(metric) for point in summary['recent']] for metric, label in PROGRESS_METRICS.items()}
+    st.line_chart(chart)
+    st.caption(f"{summary['count']} analyses since {time.strftime('%Y-%m-%d', time.localtime(summary['first_at']))}")
+
+@st.fragment
+def popular_goals():
+    """Sidebar shortcuts; a click reruns only this fragment"""
+    st.markdown("### 🌟 Popular Beauty Goals")
+    for goal in POPULAR_GOALS:
+        if st.button(goal, key=f"goal_{goal}"):
+            st.session_state.selected_goal = goal.split(' ', 1)[1]  # Remove emoji
+
+@st.fragment
+def portrait_panel():
+    """Uploader and preview; reruns on its own so other widgets never redraw the photo"""
+    st.markdown("### 📸 Your Beauty Portrait")
+    uploaded_file = st.file_uploader(
+        "Upload your beautiful face for analysis",
+        type=['png', 'jpg', 'jpeg'],
+        help="Share a clear photo of your gorgeous face for personalized skin analysis",
+        key="file_uploader"
+    )
+    
+    # Store uploaded file data in session state (only when a new file arrives)
+    if uploaded_file is not None:
+        if uploaded_file.file_id != st.session_state.uploaded_file_id:
+            upload_store = get_upload_store()
+            image_bytes = uploaded_file.getvalue()
+            upload_store.discard(st.session_state.upload_handle)
+            st.session_state.upload_handle = upload_store.put(image_bytes, uploaded_file.name)
+            st.session_state.uploaded_file_name = uploaded_file.name
+            st.session_state.uploaded_file_id = uploaded_file.file_id
+            st.session_state.uploaded_file_digest = content_digest(image_bytes)
+        
+        # Display uploaded image from the shared decoded copy
+        show_portrait("Your Beautiful Portrait")
     
+    # Show previously uploaded image if exists
+    elif st.session_state.upload_handle is not None:
+        image = show_portrait(f"Current Portrait: {st.session_state.uploaded_file_name}")
+        if image is not None:
+            st.success("🌹 Portrait ready for premium analysis!")
 
+@st.fragment
+def preferences_panel():
+    """Goal, history and options; their values are read from session state on submit"""
+    st.markdown("### 🎯 Your Beauty Aspirations")
+    
+    # Premium goal dropdown
+    st.selectbox(
+        "What's your primary beauty goal?",
+        options=SKINCARE_GOALS,
+        help="Select your most important skincare aspiration",
+        key="goal_selector"
+    )
     
-    # Sidebar for instructions with premium styling
-    with st.sidebar:
-        st.markdown("### 🌸 How to Use Our Premium Service")
-        st.markdown("""
-        1. **📸 Upload Your Photo** - Clear, natural lighting preferred
-        2. **🎯 Set Your Beauty Goal** - What transformation do you seek?
-        3. **📋 Share Your Journey** - Products you've tried before
-        4. **✨ Get Expert AI Recommendations** - Personalized just for you
-        """)
-        
-        st.markdown("### 💎 Premium Tips")
-        st.markdown("""
-        - **Natural lighting** reveals your true skin tone
-        - **Be specific** about your skincare aspirations
-        - **Mention brands** you've used for better insights
-        - **Consider sensitivities** for safer recommendations
-        """)
-        
-        st.markdown("### 🌟 Popular Beauty Goals")
-        goals = [
-            "🌟 Radiant Brightening", "⏰ Anti-aging Excellence", "✨ Acne-Free Confidence", 
-            "💧 Deep Hydration", "🎭 Oil Balance Control", "🤍 Sensitive Skin Care",
-            "🔍 Pore Perfection", "👁️ Dark Circle Treatment", "🌹 Rosacea Comfort"
-        ]
-        for goal in goals:
-            if st.button(goal, key=f"goal_{goal}"):
-                st.session_state.selected_goal = goal.split(' ', 1)[1]  # Remove emoji
+    # Premium products dropdown
+    st.multiselect(
+        "Previous skincare products used:",
+        options=PREVIOUS_PRODUCTS,
+        help="Select all products you've used before (you can select multiple)",
+        key="history_selector"
+    )
     
-    # Main content area with premium layout
-    col1, col2 = st.columns([1, 1])
+    # Additional options
+    st.markdown("### ⚙️ Additional Options")
     
-    with col1:
-        st.markdown("### 📸 Your Beauty Portrait")
-        uploaded_file = st.file_uploader(
-            "Upload your beautiful face for analysis",
-            type=['png', 'jpg', 'jpeg'],
-            help="Share a clear photo of your gorgeous face for personalized skin analysis",
-            key="file_uploader"
-        )
-        
-        # Store uploaded file data in session state
-        if uploaded_file is not None:
-            st.session_state.uploaded_file_data = uploaded_file.getvalue()
-            st.session_state.uploaded_file_name = uploaded_file.name
-            
-            # Display uploaded image
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Your Beautiful Portrait", use_container_width=True)
-            
-            # Image info with premium styling
-            st.info(f"✨ Image Resolution: {image.size[0]}x{image.size[1]} pixels")
-        
-        # Show previously uploaded image if exists
-        elif st.session_state.uploaded_file_data is not None:
-            image = Image.open(io.BytesIO(st.session_state.uploaded_file_data))
-            st.image(image, caption=f"Current Portrait: {st.session_state.uploaded_file_name}", use_container_width=True)
-            st.info(f"✨ Image Resolution: {image.size[0]}x{image.size[1]} pixels")
-            st.success("🌹 Portrait ready for premium analysis!")
+    st.selectbox(
+        "Skin Type (optional)",
+        SKIN_TYPES,
+        key="skin_type_selector"
+    )
     
-    with col2:
-        st.markdown("### 🎯 Your Beauty Aspirations")
-        
-        # Premium goal dropdown
-        skincare_goals = [
-            "🌟 Choose your beauty transformation",
-            "✨ Brightening and luminous skin tone",
-            "⏰ Anti-aging and wrinkle prevention", 
-            "🎭 Acne treatment and clear skin",
-            "💧 Deep hydration for glowing skin",
-            "🤍 Gentle care for sensitive skin",
-            "🔍 Pore minimization and refinement",
-            "👁️ Dark circles and under-eye renewal",
-            "🌹 Rosacea and redness comfort",
-            "🎨 Hyperpigmentation transformation",
-            "💎 Blackhead and whitehead elimination",
-            "🌟 Firming and skin tightening",
-            "☀️ Sun damage repair and protection",
-            "🎭 Melasma treatment and care",
-            "🤍 Eczema and dermatitis comfort",
-            "⚖️ Oil control and mattifying balance",
-            "🔄 Exfoliation and skin renewal",
-            "🛡️ Barrier repair and protection",
-            "🌿 Anti-inflammatory treatment",
-            "✨ Skin texture perfection",
-            "🌟 Natural radiance enhancement"
-        ]
-        
-        goal_input = st.selectbox(
-            "What's your primary beauty goal?",
-            options=skincare_goals,
-            help="Select your most important skincare aspiration",
-            key="goal_selector"
-        )
-        
-        # Premium products dropdown
-        previous_products = [
-            "💎 Select your skincare journey",
-            "🍊 Vitamin C brightening serum",
-            "✨ Niacinamide pore refining serum",
-            "🌙 Retinol/Retinoid anti-aging products",
-            "💧 Hyaluronic acid hydrating serum",
-            "🌿 Salicylic acid clarifying products",
-            "⚡ Benzoyl peroxide acne treatments",
-            "🔄 AHA/BHA exfoliating treatments",
-            "💪 Peptide strengthening serums",
-            "🛡️ Ceramide barrier moisturizers",
-            "☀️ Sunscreen/SPF protection products",
-            "🌿 Tea tree oil purifying treatments",
-            "🎨 Kojic acid brightening products",
-            "✨ Alpha arbutin spot-correcting serum",
-            "🌸 Azelaic acid gentle treatments",
-            "🍇 Glycolic acid renewal products",
-            "🥛 Lactic acid gentle exfoliants",
-            "🤍 Zinc oxide calming products",
-            "💎 Collagen boosting serums",
-            "🌿 Bakuchiol natural retinol alternative",
-            "✨ Squalane hydrating oil",
-            "🌹 Rosehip regenerating oil",
-            "Microneedling treatments",
-            "LED light therapy",
-            "None of the above"
-        ]
-        
-        history_input = st.multiselect(
-            "Previous skincare products used:",
-            options=previous_products,
-            help="Select all products you've used before (you can select multiple)",
-            key="history_selector"
-        )
-        
-        # Additional options
-        st.markdown("### ⚙️ Additional Options")
-        
-        skin_type = st.selectbox(
-            "Skin Type (optional)",
-            ["Not specified", "Oily", "Dry", "Combination", "Sensitive", "Normal"],
-            key="skin_type_selector"
-        )
-        
-        age_range = st.selectbox(
-            "Age Range (optional)",
-            ["Not specified", "Under 20", "20-30", "30-40", "40-50", "50+"],
-            key="age_range_selector"
-        )
+    st.selectbox(
+        "Age Range (optional)",
+        AGE_RANGES,
+        key="age_range_selector"
+    )
     
-    # Submit button
-    st.markdown("---")
+    if get_analysis_history() is not None:
+        st.text_input(
+            "Profile name (optional)",
+            help="Use the same name on every visit to save your analyses and see your progress",
+            key="profile_id"
+        )
     
+    st.toggle(
+        "Show AI advice as it is written",
+        value=True,
+        help="Stream the recommendation into the results panel instead of waiting for the full text",
+        key="stream_toggle"
+    )
+
+@st.fragment
+def results_panel():
+    """Submit button and results; a submit reruns only this fragment"""
     if st.button("🚀 Get AI Skincare Recommendations", type="primary", use_container_width=True, key="submit_button"):
         
         # Validation using session state data
-        if st.session_state.uploaded_file_data is None:
+        image_bytes = get_upload_store().get(st.session_state.upload_handle)
+        if image_bytes is None:
             st.error("❌ Please upload an image first!")
             return
         
-        if goal_input == "Select your skincare goal":
+        goal_input = st.session_state.goal_selector
+        if goal_input == SKINCARE_GOALS[0]:
             st.error("❌ Please select your skincare goal!")
             return
         
-        if not history_input or history_input == ["Select products you've used"]:
+        history_input = st.session_state.history_selector
+        if not history_input or history_input == [PREVIOUS_PRODUCTS[0]]:
             st.warning("⚠️ Adding product history will improve recommendations!")
             history_input = "No previous products mentioned"
         
@@ -598,6 +522,8 @@ def main():
             history_text = ", ".join(history_input)
         
         # Add additional info to history
+        skin_type = st.session_state.skin_type_selector
+        age_range = st.session_state.age_range_selector
         additional_info = []
         if skin_type != "Not specified":
             additional_info.append(f"Skin Type: {skin_type}")
@@ -610,16 +536,21 @@ def main():
             else:
                 history_text += " | " + " | ".join(additional_info)
         
+        # Stage timings for this submit (a no-op unless SKINCARE_METRICS is set)
+        trace = start_request()
+        
         # Show loading
         with st.spinner("🔄 Analyzing your image and generating recommendations..."):
-            # Progress bar for user experience
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.01)
-                progress_bar.progress(i + 1)
-            
+            # Progress bar driven by the pipeline's stage events
+            progress_bar = st.progress(0, text=STAGE_LABELS["decode"])
+
+            def show_progress(event):
+                progress_bar.progress(event.progress, text=STAGE_LABELS[event.stage])
+
             # Process the request using session state data
-            result, error = process_skincare_request(st.session_state.uploaded_file_data, goal_input, history_text)
+            result, error = process_skincare_request(image_bytes, goal_input, history_text,
+                                                     on_progress=show_progress, stream=st.session_state.stream_toggle,
+                                                     digest=st.session_state.uploaded_file_digest, trace=trace)
         
         # Clear progress bar
         progress_bar.empty()
@@ -628,78 +559,87 @@ def main():
             st.error(f"❌ {error}")
         elif result:
             st.success("✅ Analysis complete!")
-            display_results(result)
+            with trace.stage("render"):
+                display_results(result)
+            
+            profile = st.session_state.get("profile_id", "").strip()
+            history_store = get_analysis_history()
+            if history_store is not None and profile:
+                display_progress(history_store, profile, result)
+            
+            trace.finish()
             
             # Download results option
             st.markdown("---")
             
-            # Create downloadable content
-            download_content = f"""
-SKINCARE RECOMMENDATION REPORT
-Generated by AI Skincare Recommendation System
-Date: {time.strftime('%Y-%m-%d %H:%M:%S')}
-
-═══════════════════════════════════════════════════════════════
-
-📊 IMAGE ANALYSIS RESULTS:
-• Brightness Score: {result['analysis']['brightness_score']}/255
-• Brightness Level: {result['analysis']['brightness_level']}
-• Processing Status: {'Success' if result['analysis']['image_processed'] else 'Failed'}
-
-═══════════════════════════════════════════════════════════════
-
-🎯 YOUR INPUT:
-• Skincare Goal: {result['user_input']['goal']}
-• Product History: {result['user_input']['history']}
-
-═══════════════════════════════════════════════════════════════
-
-💡 AI-POWERED RECOMMENDATIONS:
-"""
-            
-            recommendation = result['recommendation']
-            if isinstance(recommendation, dict):
-                if 'routine' in recommendation:
-                    download_content += f"\n🔄 RECOMMENDED ROUTINE:\n{recommendation['routine']}\n"
-                if 'key_ingredients' in recommendation:
-                    download_content += f"\n🧪 KEY INGREDIENTS TO LOOK FOR:\n{recommendation['key_ingredients']}\n"
-                if 'avoid' in recommendation:
-                    download_content += f"\n⚠️ PRODUCTS/INGREDIENTS TO AVOID:\n{recommendation['avoid']}\n"
-                if 'timeline' in recommendation:
-                    download_content += f"\n⏰ EXPECTED TIMELINE:\n{recommendation['timeline']}\n"
-                if 'recommendation' in recommendation:
-                    download_content += f"\n📝 AI GENERATED ADVICE:\n{recommendation['recommendation']}\n"
-                    if 'source' in recommendation:
-                        download_content += f"Source: {recommendation['source']}\n"
-            else:
-                download_content += f"\n{recommendation}\n"
+            # Reports are rendered only when a download button is clicked
+            file_stem = f"skincare_recommendations_{int(time.time())}"
+            col1, col2, col3 = st.columns(3)
             
-            download_content += f"""
-═══════════════════════════════════════════════════════════════
-
-🛒 GET PREMIUM SKINCARE PRODUCTS:
-Visit Dermatics India: https://dermatics.in/
-Get premium skincare products delivered to your doorstep!
+            for column, report_format, label, key in (
+                (col1, "text", "📥 Download Complete Results", "download_button"),
+                (col2, "json", "🧾 Download as JSON", "download_json"),
+                (col3, "html", "🌐 Download as HTML (print to PDF)", "download_html"),
+            ):
+                extension, mime = REPORT_FORMATS[report_format]
+                with column:
+                    st.download_button(
+                        label=label,
+                        data=lambda report_format=report_format: render_report(result, report_format),
+                        file_name=f"{file_stem}.{extension}",
+                        mime=mime,
+                        help="Download your complete skincare recommendation report",
+                        on_click="ignore",
+                        key=key
+                    )
+            if trace.request_id:
+                st.caption(f"Request ID: {trace.request_id}")
+        else:
+            st.error("❌ Unexpected error occurred. Please try again.")
 
-═══════════════════════════════════════════════════════════════
+def main():
+    if WARM_UP_ENABLED:
+        start_warm_up()
 
-DISCLAIMER:
-This is an AI-powered tool for educational purposes.
-Always consult with a dermatologist for serious skin concerns.
+    # Header with elegant styling
+    st.markdown('<h1 class="main-header">🌹 Premium Skincare Studio</h1>', unsafe_allow_html=True)
+    st.markdown('<p class="sub-header">✨ AI-Powered Beauty Recommendations with Rose Petal Elegance ✨</p>', unsafe_allow_html=True)
+    
 
-Generated by AI Skincare Recommendation System
-"""
-            
-            st.download_button(
-                label="📥 Download Complete Results",
-                data=download_content,
-                file_name=f"skincare_recommendations_{int(time.time())}.txt",
-                mime="text/plain",
-                help="Download your complete skincare recommendation report",
-                key="download_button"
-            )
-        else:
-            st.error("❌ Unexpected error occurred. Please try again.")
+    
+    # Sidebar for instructions with premium styling
+    with st.sidebar:
+        st.markdown("### 🌸 How to Use Our Premium Service")
+        st.markdown("""
+        1. **📸 Upload Your Photo** - Clear, natural lighting preferred
+        2. **🎯 Set Your Beauty Goal** - What transformation do you seek?
+        3. **📋 Share Your Journey** - Products you've tried before
+        4. **✨ Get Expert AI Recommendations** - Personalized just for you
+        """)
+        
+        st.markdown("### 💎 Premium Tips")
+        st.markdown("""
+        - **Natural lighting** reveals your true skin tone
+        - **Be specific** about your skincare aspirations
+        - **Mention brands** you've used for better insights
+        - **Consider sensitivities** for safer recommendations
+        """)
+        
+        popular_goals()
+    
+    # Main content area with premium layout
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        portrait_panel()
+    
+    with col2:
+        preferences_panel()
+    
+    # Submit button
+    st.markdown("---")
+    
+    results_panel()
     
     # Footer
     st.markdown("---")
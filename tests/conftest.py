@@ -0,0 +1,19 @@
+import pytest
+
+from tests.stub_server import StubConfig, start_stub_server
+
+
+@pytest.fixture
+def stub():
+    """Start a stub inference endpoint for a StubConfig; every server is shut down after the test"""
+    servers = []
+
+    def start(**options):
+        config = StubConfig(**options)
+        url, server = start_stub_server(config)
+        servers.append(server)
+        return url, config
+
+    yield start
+    for server in servers:
+        server.shutdown()
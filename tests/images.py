@@ -0,0 +1,69 @@
+"""Synthetic photos shared by the tests and the benchmarks"""
+import io
+import zlib
+
+import numpy as np
+from PIL import Image
+
+
+def make_face(width=1000, height=750):
+    """Skin-toned ellipse with a brighter forehead and redder cheeks on a blue background"""
+    rng = np.random.default_rng(7)
+    rows, columns = np.mgrid[:height, :width]
+    face = ((columns - width / 2) / (width * 0.22)) ** 2 + ((rows - height / 2) / (height * 0.4)) ** 2 < 1
+    rgb = np.empty((height, width, 3), dtype=np.float32)
+    rgb[:] = (40, 70, 160)
+    rgb[face] = (224, 172, 140)
+    rgb[face & (rows < height * 0.33)] += 10
+    rgb[face & (rows > height * 0.55) & (rows < height * 0.75) & (abs(columns - width / 2) > width * 0.08)] += (
+        6, -20, -10)
+    return np.clip(rgb + rng.normal(0, 6, rgb.shape), 0, 255).astype(np.uint8)
+
+
+def photo(seed, width=1600, height=1200):
+    """Smooth blobs of colour with sensor noise, standing in for a portrait"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width] / max(width, height)
+    pixels = np.zeros((height, width, 3)) + rng.uniform(120, 220, 3)
+    for _ in range(12):
+        cx, cy, radius = rng.uniform(0, 1.3), rng.uniform(0, 1), rng.uniform(0.05, 0.35)
+        pixels += rng.uniform(-80, 80, 3) * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * radius ** 2))[..., None]
+    pixels += rng.normal(0, 6, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def encode(img, quality=90, **options):
+    """JPEG bytes of a PIL image (options go to Image.save, e.g. exif)"""
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality, **options)
+    return buffer.getvalue()
+
+
+def write_png(path, width, height):
+    """Skin-toned gradient with mild noise, written without holding the image in memory"""
+    from skincare_ai.pngbands import PNG_SIGNATURE, _chunk
+
+    rng = np.random.default_rng(11)
+    compressor = zlib.compressobj(6)
+    columns = np.arange(width, dtype=np.float32)
+    with open(path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(_chunk(b"IHDR", width.to_bytes(4, "big") + height.to_bytes(4, "big") + bytes([8, 2, 0, 0, 0])))
+        for start in range(0, height, 256):
+            rows = min(256, height - start)
+            shade = (columns / width * 40)[None, :] + (np.arange(start, start + rows)[:, None] / height * 30)
+            band = np.empty((rows, width, 3), dtype=np.uint8)
+            for channel, base in enumerate((200, 160, 135)):
+                band[:, :, channel] = np.clip(base + shade + rng.integers(-6, 7, (rows, width)), 0, 255)
+            filtered = np.zeros((rows, width * 3 + 1), dtype=np.uint8)  # filter type 0 per row
+            filtered[:, 1:] = band.reshape(rows, width * 3)
+            data = compressor.compress(filtered.tobytes())
+            if data:
+                f.write(_chunk(b"IDAT", data))
+        f.write(_chunk(b"IDAT", compressor.flush()))
+        f.write(_chunk(b"IEND", b""))
+
+
+def write_jpeg(png_path, jpeg_path):
+    Image.MAX_IMAGE_PIXELS = None
+    Image.open(png_path).convert("RGB").save(jpeg_path, quality=90)
@@ -0,0 +1,73 @@
+"""Peak RSS of one large-upload decode path, measured in this (fresh) process
+
+    python -m tests.peak_memory CASE PATH
+
+prints "rise_mb seconds result". The peak is the kernel's VmHWM, reset at the
+baseline through /proc/self/clear_refs (ru_maxrss would carry over the
+parent's peak across fork/exec), so this only works on Linux.
+"""
+import io
+import sys
+import time
+
+# case -> (file, bounded?)
+CASES = {
+    "png_banded": ("png", True),
+    "png_histogram": ("png", True),
+    "png_full_reduce": ("png", False),
+    "jpeg_draft": ("jpg", True),
+    "jpeg_full": ("jpg", False),
+}
+
+
+def _status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def reset_peak():
+    """Current RSS, after making it the new peak"""
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    return _status_mb("VmRSS")
+
+
+def peak_mb():
+    return _status_mb("VmHWM")
+
+
+def run_case(case, path):
+    """Decode path with one case, print 'rise_mb seconds result'"""
+    from PIL import Image
+
+    from skincare_ai import analysis
+
+    Image.MAX_IMAGE_PIXELS = None
+    with open(path, "rb") as f:
+        image_bytes = f.read()
+    # Warm the decoders and numpy on a small image so only the big decode is measured
+    small = io.BytesIO()
+    Image.new("RGB", (64, 64)).save(small, format="PNG")
+    analysis.decode_analysis_array(small.getvalue())
+    baseline = reset_peak()
+
+    start = time.perf_counter()
+    if case in ("png_banded", "jpeg_draft"):
+        result = analysis.decode_analysis_array(image_bytes).shape
+    elif case == "png_histogram":
+        result = analysis.measure_brightness(image_bytes, max_pixels=None)
+    elif case == "png_full_reduce":
+        img = Image.open(io.BytesIO(image_bytes))
+        img.load()
+        result = img.reduce(7).size
+    else:
+        result = Image.open(io.BytesIO(image_bytes)).convert("RGB").size
+    elapsed = time.perf_counter() - start
+    print(f"{peak_mb() - baseline:.1f} {elapsed:.3f} {result}")
+
+
+if __name__ == "__main__":
+    run_case(*sys.argv[1:3])
@@ -0,0 +1,75 @@
+"""Straightforward reimplementations the optimised code is checked against"""
+import io
+import math
+
+import numpy as np
+from PIL import Image
+
+from skincare_ai.analysis import FACE_ZONES, SKIN_LEVEL_MAX_SIDE, ZONE_MIN_PIXELS, _half, skin_mask
+
+
+def analysis_planes(rgb):
+    """red, green, blue, luma, redness at the level skin_statistics works on"""
+    red, green, blue = (rgb[:, :, channel].astype(np.float32) for channel in range(3))
+    luma = 0.299 * red + 0.587 * green + 0.114 * blue
+    redness = np.clip(red - (green + blue) / 2, 0, None)
+    planes = (red, green, blue, luma, redness)
+    while max(planes[0].shape) > SKIN_LEVEL_MAX_SIDE:
+        planes = tuple(_half(plane) for plane in planes)
+    return planes
+
+
+def zone_rectangles(shape, grid):
+    """The face zones over the whole frame, and a grid x grid tiling of it"""
+    height, width = shape
+    face = {zone: [(int(x0 * width), int(y0 * height), int(x1 * width), int(y1 * height))
+                   for x0, y0, x1, y1 in rectangles] for zone, rectangles in FACE_ZONES.items()}
+    cells = {f"{row},{column}": [(column * width // grid, row * height // grid,
+                                  (column + 1) * width // grid, (row + 1) * height // grid)]
+             for row in range(grid) for column in range(grid)}
+    return {"face zones": face, f"{grid}x{grid} grid": cells}
+
+
+def stats_recompute(planes, zones):
+    """Mask, then mask and reduce each zone's slices again"""
+    red, green, blue, luma, redness = planes
+    mask = skin_mask(red, green, blue)
+    result = {}
+    for zone, rectangles in zones.items():
+        pixels = total = total_sq = red_total = 0.0
+        for left, top, right, bottom in rectangles:
+            inside = mask[top:bottom, left:right]
+            values = luma[top:bottom, left:right][inside].astype(np.float64)
+            pixels += inside.sum()
+            total += values.sum()
+            total_sq += (values * values).sum()
+            red_total += redness[top:bottom, left:right][inside].sum(dtype=np.float64)
+        result[zone] = _moments(pixels, total, total_sq, red_total)
+    return result
+
+
+def _moments(pixels, total, total_sq, red_total):
+    """(brightness, brightness_std, redness) in the units zone_statistics reports"""
+    if pixels < ZONE_MIN_PIXELS:
+        return None
+    mean = total / pixels
+    return mean, math.sqrt(max(total_sq / pixels - mean * mean, 0.0)), red_total / pixels / 255 * 100
+
+
+def linear_match(goal, keys, keyword_groups):
+    """The original goal lookup order, generalised to arbitrary keys and keyword groups"""
+    goal_lower = goal.lower()
+    for key in keys:
+        if key in goal_lower:
+            return key
+    for category, words in keyword_groups:
+        if any(word in goal_lower for word in words):
+            return category
+    return None
+
+
+def legacy_brightness(image_bytes):
+    """The original brightness score: a per-pixel Python sum over the full-resolution image"""
+    img = Image.open(io.BytesIO(image_bytes)).convert('L')
+    brightness = sum(img.tobytes()) / (img.width * img.height)
+    return round(brightness, 2)
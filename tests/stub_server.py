@@ -0,0 +1,160 @@
+"""Offline stand-in for the Hugging Face text-generation endpoint.
+
+Answers POSTs the way the hosted API does: a JSON list with generated_text, or
+token-by-token server-sent events when the payload asks for "stream": true
+(or, to mimic other endpoints, plain chunked text or the JSON list).
+Latency, error rate and hang (timeout) rate are configurable, so the tests,
+benchmarks and load tests can exercise the retry and fallback paths
+deterministically; tests can also script the outcome of each request in turn.
+
+    python tests/stub_server.py --port 8081 --latency 0.2 --error-rate 0.1
+    HF_API_URL=http://127.0.0.1:8081/models/gpt2 streamlit run streamlit_run.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GENERATED_TEXT = (
+    "Cleanse gently twice a day, apply a niacinamide serum in the morning and a "
+    "ceramide moisturiser at night. Use SPF 30+ daily and expect results in 4-6 weeks."
+)
+
+
+class StubConfig:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, timeout_rate=0.0, hang_seconds=30.0,
+                 token_delay=0.01, seed=None, outcomes=(), stream_format="sse", stall_after=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.token_delay = token_delay
+        self.random = random.Random(seed)
+        # "ok", "error", "hang" or "bad_json" (a 200 with a truncated body) for the next requests,
+        # served before any random draw
+        self.outcomes = deque(outcomes)
+        # Answer to streaming requests: "sse" events, chunked "text", or the "json" list in one body
+        self.stream_format = stream_format
+        # Streams go silent for hang_seconds after this many tokens (None: never)
+        self.stall_after = stall_after
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def draw(self):
+        """Outcome and delay for the next request"""
+        with self.lock:
+            self.requests += 1
+            roll = self.random.random()
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            scripted = self.outcomes.popleft() if self.outcomes else None
+        if scripted is not None:
+            return scripted, self.hang_seconds if scripted == "hang" else delay
+        if roll < self.timeout_rate:
+            return "hang", self.hang_seconds
+        if roll < self.timeout_rate + self.error_rate:
+            return "error", delay
+        return "ok", delay
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.config.lock:
+            self.config.connections += 1
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            pass  # pooled keep-alive connection closed by the client
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        outcome, delay = self.config.draw()
+        time.sleep(delay)
+
+        try:
+            if outcome == "error":
+                self._send(503, "application/json", json.dumps({"error": "Model is currently loading"}).encode())
+            elif outcome == "bad_json":
+                self._send(200, "application/json", b'[{"generated_text": "cut sh')
+            elif payload.get("stream") and self.config.stream_format != "json":
+                self._stream_tokens()
+            else:
+                text = payload.get("inputs", "") + " " + GENERATED_TEXT
+                self._send(200, "application/json", json.dumps([{"generated_text": text}]).encode())
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client gave up (timed out) first
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_tokens(self):
+        sse = self.config.stream_format == "sse"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if sse else "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, word in enumerate(GENERATED_TEXT.split(" ")):
+            if index == self.config.stall_after:
+                time.sleep(self.config.hang_seconds)
+            if sse:
+                self._chunk(f"data: {json.dumps({'token': {'text': word + ' ', 'special': False}})}\n\n".encode())
+            else:
+                self._chunk((word + " ").encode())
+            time.sleep(self.config.token_delay)
+        if sse:
+            self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+def start_stub_server(config=None, host="127.0.0.1", port=0):
+    """Serve in a background thread; returns (endpoint URL, server) - call server.shutdown() when done"""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{server.server_port}/models/gpt2", server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered with 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction that hang past the client timeout")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed tokens")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.error_rate, args.timeout_rate, token_delay=args.token_delay)
+    url, server = start_stub_server(config, args.host, args.port)
+    print(f"Stub inference endpoint at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from skincare_ai import backends
+from skincare_ai.backends import DeterministicBackend, LocalModelBackend, MicroBatcher, create_backend
+from skincare_ai.inference import InferenceError
+
+
+class FakeModel:
+    """Stands in for the model: records each batch and echoes every item"""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+
+    def __call__(self, items):
+        with self.lock:
+            self.batches.append(list(items))
+        return [ValueError(f"bad item {item}") if item == self.fail_on else f"echo {item}" for item in items]
+
+
+def test_concurrent_items_are_coalesced_into_batches():
+    model = FakeModel()
+    batcher = MicroBatcher(model, max_batch=4, max_wait=0.5)
+    futures = [batcher.submit(number) for number in range(10)]
+    assert [future.result(timeout=5) for future in futures] == [f"echo {number}" for number in range(10)]
+    # Queued together, so full batches then the remainder
+    assert [len(batch) for batch in model.batches] == [4, 4, 2]
+    assert batcher.batches == 3 and batcher.items == 10
+
+
+def test_a_lone_item_is_flushed_after_max_wait():
+    model = FakeModel()
+    batcher = MicroBatcher(model, max_batch=8, max_wait=0.2)
+    start = time.monotonic()
+    assert batcher.submit("alone").result(timeout=5) == "echo alone"
+    elapsed = time.monotonic() - start
+    assert 0.15 <= elapsed < 1.5
+    assert model.batches == [["alone"]]
+
+
+def test_a_failed_item_does_not_fail_its_batch():
+    batcher = MicroBatcher(FakeModel(fail_on="b"), max_batch=3, max_wait=0.5)
+    futures = {item: batcher.submit(item) for item in "abc"}
+    with pytest.raises(ValueError, match="bad item b"):
+        futures["b"].result(timeout=5)
+    assert futures["a"].result(timeout=5) == "echo a" and futures["c"].result(timeout=5) == "echo c"
+
+
+def test_a_raising_batch_fails_every_item_and_the_next_batch_still_runs():
+    calls = []
+
+    def run_batch(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise MemoryError("out of memory")
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(run_batch, max_batch=2, max_wait=0.5)
+    first = [batcher.submit(number) for number in (1, 2)]
+    for future in first:
+        with pytest.raises(MemoryError):
+            future.result(timeout=5)
+    assert batcher.submit(3).result(timeout=5) == 6
+
+
+def test_a_short_result_list_fails_the_batch_instead_of_hanging():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch=2, max_wait=0.5)
+    futures = [batcher.submit(number) for number in (1, 2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="1 results for 2 items"):
+            future.result(timeout=5)
+
+
+def test_local_backend_batches_prompts_and_isolates_bad_parameters(monkeypatch):
+    calls = []
+
+    def generator(prompts, batch_size, **parameters):
+        calls.append((prompts, parameters))
+        if parameters.get("max_new_tokens", 0) < 0:
+            raise ValueError("max_new_tokens must be positive")
+        return [[{"generated_text": f"{prompt} ok"}] for prompt in prompts]
+
+    monkeypatch.setitem(backends._models, "fake", generator)
+    backend = LocalModelBackend("fake", max_batch=4, max_wait=0.3)
+    payloads = [{"inputs": "a", "parameters": {"max_new_tokens": 5}},
+                {"inputs": "b", "parameters": {"max_new_tokens": -1}},
+                {"inputs": "c", "parameters": {"max_new_tokens": 5}}]
+    futures = [backend._batcher.submit(payload) for payload in payloads]
+    assert futures[0].result(timeout=5) == [{"generated_text": "a ok"}]
+    assert futures[2].result(timeout=5) == [{"generated_text": "c ok"}]
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    # One call per set of generation parameters
+    assert sorted(prompts for prompts, _ in calls) == [["a", "c"], ["b"]]
+
+    with pytest.raises(InferenceError, match="Local generation failed"):
+        backend.generate(payloads[1], deadline=5)
+    assert asyncio.run(backend.agenerate(payloads[0], deadline=5)) == [{"generated_text": "a ok"}]
+
+
+def test_deterministic_backend_answers_the_same_prompt_the_same_way():
+    payload = {"inputs": "Skincare routine for hydration:"}
+    first, second = DeterministicBackend(), create_backend("deterministic")
+    result = first.generate(payload)
+    assert result == second.generate(payload) == asyncio.run(second.agenerate(payload))
+    assert result[0]["generated_text"].startswith(payload["inputs"] + " ")
+    assert "".join(first.stream(payload)).strip() == first.text_for(payload["inputs"])
+    # Different prompts get different canned text
+    texts = {first.text_for(f"prompt {number}") for number in range(20)}
+    assert len(texts) > 1
+    assert len(DeterministicBackend(sentences=2).text_for("x").split(". ")) == 2
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown inference backend"):
+        create_backend("nope")
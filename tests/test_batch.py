@@ -0,0 +1,102 @@
+import io
+import json
+import os
+
+from skincare_ai import analysis, batch
+from skincare_ai.backends import DeterministicBackend
+from skincare_ai.batch import BatchItem, completed_ids, main, process_item, run_batch
+from skincare_ai.dedup import get_analysis_index
+from tests.images import encode, photo
+
+
+def fake_process_item(item):
+    """Stands in for process_item in the (forked) workers"""
+    if item.path == "crash":
+        os._exit(1)
+    if item.path == "raise":
+        raise MemoryError("cannot allocate")
+    return {"id": item.id, "path": item.path, "status": "success"}
+
+
+def run(monkeypatch, paths, workers=1):
+    monkeypatch.setattr(batch, "process_item", fake_process_item)
+    monkeypatch.setattr(batch, "_init_worker", lambda backend: None)
+    out = io.StringIO()
+    items = [BatchItem(f"{number}-{path}", path, "goal", "history") for number, path in enumerate(paths)]
+    summary = run_batch(items, out, workers=workers, log=None)
+    records = {}
+    for line in out.getvalue().splitlines():
+        record = json.loads(line)
+        assert record["id"] not in records
+        records[record["id"]] = record
+    return summary, records
+
+
+def test_raising_worker_writes_an_error_record(monkeypatch):
+    summary, records = run(monkeypatch, ["a", "raise", "b"])
+    assert summary["processed"] == 3 and summary["errors"] == 1
+    assert records["1-raise"]["status"] == "error"
+    assert "MemoryError" in records["1-raise"]["error"]
+    assert records["0-a"]["status"] == records["2-b"]["status"] == "success"
+
+
+def test_dead_worker_does_not_abort_the_batch(monkeypatch):
+    paths = ["a", "crash"] + [f"after{number}" for number in range(10)]
+    summary, records = run(monkeypatch, paths)
+    # Every input gets exactly one record, the crashed one an error
+    assert set(records) == {f"{number}-{path}" for number, path in enumerate(paths)}
+    assert summary["processed"] == len(paths)
+    assert records["1-crash"]["status"] == "error"
+    assert "BrokenProcessPool" in records["1-crash"]["error"]
+    # Jobs submitted after the pool broke run on a fresh one
+    assert records[f"{len(paths) - 1}-after9"]["status"] == "success"
+
+
+def test_items_are_analysed_without_near_duplicate_reuse(tmp_path, monkeypatch):
+    analysed = []
+    analyze_skin = analysis.analyze_skin
+    monkeypatch.setattr(analysis, "analyze_skin", lambda rgb: analysed.append(rgb) or analyze_skin(rgb))
+    monkeypatch.setattr(batch, "_backend", DeterministicBackend())
+    img = photo(1, 800, 600)
+    paths = []
+    for quality in (90, 60):
+        path = tmp_path / f"face-{quality}.jpg"
+        path.write_bytes(encode(img, quality))
+        paths.append(str(path))
+    hits = get_analysis_index().stats()["hits"]
+
+    records = [process_item(BatchItem(path, path, "Acne treatment", "None")) for path in paths]
+    assert [record["status"] for record in records] == ["success", "success"]
+    # The re-encoded copy is a near-duplicate, but was analysed in its own right
+    assert len(analysed) == 2
+    assert get_analysis_index().stats()["hits"] == hits
+
+
+def test_resume_replaces_error_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "process_item", fake_process_item)
+    monkeypatch.setattr(batch, "_init_worker", lambda backend: None)
+    output = tmp_path / "results.jsonl"
+    earlier = [
+        {"id": "a", "path": "a", "status": "success"},
+        {"id": "b", "path": "b", "status": "error", "error": "Cannot read image"},
+        {"id": "c", "path": "c", "status": "success"},
+    ]
+    # Interrupted mid-write: the torn last line goes too
+    output.write_text("".join(json.dumps(record) + "\n" for record in earlier) + '{"id": "d", "pa')
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text("".join(json.dumps({"id": name, "path": name}) + "\n" for name in "abcd"))
+
+    assert main([str(manifest), "-o", str(output), "--workers", "1"]) == 0
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(record["id"] for record in records) == ["a", "b", "c", "d"]
+    assert all(record["status"] == "success" for record in records)
+    assert not (tmp_path / "results.jsonl.resume").exists()
+
+
+def test_completed_ids_leaves_a_clean_output_alone(tmp_path):
+    output = tmp_path / "results.jsonl"
+    content = "".join(json.dumps({"id": name, "status": "success"}) + "\n" for name in "ab")
+    output.write_text(content)
+    inode = os.stat(output).st_ino
+    assert completed_ids(str(output)) == {"a", "b"}
+    assert output.read_text() == content and os.stat(output).st_ino == inode
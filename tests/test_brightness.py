@@ -0,0 +1,39 @@
+import pytest
+from PIL import Image
+
+from skincare_ai.analysis import BRIGHTNESS_TOLERANCE, measure_brightness
+from tests.images import encode, make_face, photo
+from tests.reference import legacy_brightness
+
+
+def gradient(width, height):
+    """The benchmark's image: hard-to-average diagonal gradients in every channel"""
+    ramp = Image.linear_gradient('L').resize((width, height))
+    return Image.merge('RGB', (ramp, ramp.transpose(Image.Transpose.ROTATE_90).resize((width, height)), ramp))
+
+
+IMAGES = {
+    "photo": lambda: photo(4, 3000, 2000),
+    "face": lambda: Image.fromarray(make_face(2400, 1800)),
+    "gradient": lambda: gradient(3000, 2000),
+}
+
+
+@pytest.fixture(scope="module", params=sorted(IMAGES))
+def jpeg(request):
+    return encode(IMAGES[request.param]())
+
+
+def test_exact_score_matches_the_original_sum(jpeg):
+    assert measure_brightness(jpeg) == legacy_brightness(jpeg)
+
+
+@pytest.mark.parametrize("max_pixels", [2_000_000, 1_000_000, 250_000])
+def test_reduced_score_is_within_the_tolerance(jpeg, max_pixels):
+    exact = measure_brightness(jpeg)
+    assert abs(measure_brightness(jpeg, max_pixels) - exact) <= BRIGHTNESS_TOLERANCE
+
+
+def test_small_images_are_measured_at_full_resolution():
+    data = encode(photo(5, 640, 480))
+    assert measure_brightness(data, 1_000_000) == measure_brightness(data)
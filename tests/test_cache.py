@@ -0,0 +1,122 @@
+import pytest
+
+from skincare_ai import cache
+from skincare_ai.cache import RecommendationCache, make_cache_key
+
+HISTORY = "Vitamin C brightening serum, Retinol/Retinoid anti-aging products | Skin Type: Oily | Age: 20-30"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_equivalent_histories_share_a_key():
+    key = make_cache_key("Acne treatment", HISTORY, 100)
+    for goal, history, brightness in [
+        ("  acne   TREATMENT ", HISTORY, 100),
+        ("Acne treatment", "Retinol/Retinoid anti-aging products,vitamin c brightening serum | Skin Type: Oily | "
+                           "Age: 20-30", 100),
+        ("Acne treatment", "Retinol/Retinoid anti-aging products, " + HISTORY, 100),
+        # Same brightness bucket
+        ("Acne treatment", HISTORY, 96),
+        ("Acne treatment", HISTORY, 127.9),
+    ]:
+        assert make_cache_key(goal, history, brightness) == key
+    for goal, history, brightness in [
+        ("Acne", HISTORY, 100),
+        ("Acne treatment", HISTORY.replace("Oily", "Dry"), 100),
+        ("Acne treatment", HISTORY.replace("20-30", "30-40"), 100),
+        ("Acne treatment", "Vitamin C brightening serum | Skin Type: Oily | Age: 20-30", 100),
+        ("Acne treatment", HISTORY, 128),
+    ]:
+        assert make_cache_key(goal, history, brightness) != key
+
+
+def test_entries_expire_after_the_ttl(clock):
+    store = RecommendationCache(ttl=60, path=None)
+    store.set("a", {"routine": "x"})
+    clock.now += 59
+    assert store.get("a") == {"routine": "x"}
+    clock.now += 2
+    assert store.get("a") is None
+    stats = store.stats()
+    assert stats["memory_hits"] == 1 and stats["misses"] == 1 and stats["expirations"] == 1 and stats["size"] == 0
+
+
+def test_least_recently_used_entries_are_evicted_first(clock):
+    store = RecommendationCache(max_entries=3, ttl=60, path=None)
+    for key in "abc":
+        store.set(key, key)
+    assert store.get("a") == "a"  # now the most recently used
+    store.set("d", "d")
+    assert store.get("b") is None
+    store.set("e", "e")
+    assert store.get("c") is None
+    assert [store.get(key) for key in "ade"] == ["a", "d", "e"]
+    assert store.stats()["evictions"] == 2 and store.stats()["size"] == 3
+
+
+def test_disk_tier_persists_across_instances(clock, db):
+    first = RecommendationCache(ttl=60, path=db)
+    first.set("a", {"routine": "x", "products": ["y"]})
+    first.set("b", "short lived")
+    first.close()
+
+    second = RecommendationCache(ttl=60, path=db)
+    assert second.get("a") == {"routine": "x", "products": ["y"]}
+    # Promoted to the memory tier by the disk hit
+    assert second.get("a") == {"routine": "x", "products": ["y"]}
+    assert second.stats()["disk_hits"] == 1 and second.stats()["memory_hits"] == 1
+    second.close()
+
+    clock.now += 61
+    third = RecommendationCache(ttl=60, path=db)
+    assert third.get("b") is None
+    third.prune()
+    assert third._db.execute("SELECT COUNT(*) FROM recommendations").fetchone()[0] == 0
+    third.close()
+
+
+def test_warm_loads_the_newest_rows(clock, db):
+    writer = RecommendationCache(ttl=60, path=db)
+    for key in "abcd":
+        writer.set(key, key)
+        clock.now += 1
+    writer.close()
+
+    reader = RecommendationCache(max_entries=2, ttl=60, path=db)
+    assert reader.warm() == 2
+    assert reader.stats()["size"] == 2
+    assert reader.get("c") == "c" and reader.get("d") == "d"
+    assert reader.stats()["memory_hits"] == 2 and reader.stats()["disk_hits"] == 0
+    reader.close()
+
+
+def test_hit_and_miss_counters(clock):
+    store = RecommendationCache(ttl=60, path=None)
+    assert store.stats()["hit_rate"] == 0.0
+    assert store.get("a") is None
+    store.set("a", 1)
+    assert store.get("a") == 1 and store.get("a") == 1
+    assert store.get("b") is None
+    stats = store.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (2, 0, 2)
+    assert stats["hit_rate"] == 0.5
+    store.clear()
+    assert store.get("a") is None and store.stats()["misses"] == 3
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from skincare_ai import catalog
+from skincare_ai.catalog import CatalogError, load_catalog
+from skincare_ai.recommendation import get_local_recommendation
+
+INGREDIENTS = {"retinoids": {"name": "Retinoids"}, "niacinamide": {"name": "Niacinamide"}}
+GOALS = {"anti-aging": {"key": ["retinoids"]}}
+
+
+@pytest.mark.parametrize("data", [
+    # product without a name
+    {"ingredients": INGREDIENTS, "goals": GOALS, "products": [{"ingredients": ["retinoids"], "goals": []}]},
+    # a list where a mapping belongs
+    {"ingredients": ["retinoids"]},
+    {"ingredients": INGREDIENTS, "goals": {"anti-aging": ["retinoids"]}},
+    # conflict that is not (first, second, reason)
+    {"ingredients": INGREDIENTS, "conflicts": [["retinoids", "niacinamide"]]},
+    {"ingredients": INGREDIENTS, "conflicts": [5]},
+    # unknown ingredient
+    {"ingredients": INGREDIENTS, "goals": {"anti-aging": {"key": ["vitamin_c"]}}},
+    [],
+])
+def test_malformed_catalog_raises_catalog_error(tmp_path, data):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(data))
+    with pytest.raises(CatalogError):
+        load_catalog(str(path))
+
+
+def test_valid_catalog_loads(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"ingredients": INGREDIENTS, "goals": GOALS, "products": [
+        {"name": "Night Serum", "type": "serum", "ingredients": ["retinoids"], "goals": ["anti-aging"]}]}))
+    assert [product.name for product in load_catalog(str(path)).rank("anti-aging")] == ["Night Serum"]
+
+
+def test_malformed_catalog_falls_back_to_an_empty_one_once(tmp_path, monkeypatch):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"ingredients": INGREDIENTS, "goals": GOALS, "products": [{"goals": []}]}))
+    loads = []
+
+    def load():
+        loads.append(path)
+        return load_catalog(str(path))
+
+    monkeypatch.setattr(catalog, "load_catalog", load)
+    monkeypatch.setattr(catalog, "_catalog", None)
+    # The rule-based recommendation still works, just without catalog products
+    recommendation = get_local_recommendation("Anti-aging and wrinkle prevention", "Retinol")
+    assert recommendation["routine"] and "products" not in recommendation
+    assert catalog.get_catalog().products == []
+    assert len(loads) == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from skincare_ai import analysis
+from skincare_ai.analysis import analyze_or_reuse
+from skincare_ai.dedup import NearDuplicateIndex
+from skincare_ai.imaging import decode_image_once
+from tests.images import encode, photo
+
+# What analyze_skin times, stage by stage
+ANALYSIS_TIMINGS = {"prepare", "color", "redness", "texture", "shine", "zones", "total"}
+
+
+def upload(img, quality=90):
+    return decode_image_once(encode(img, quality)).array
+
+
+@pytest.fixture
+def analyses(monkeypatch):
+    """Arrays analyze_or_reuse actually analysed"""
+    calls = []
+    analyze_skin = analysis.analyze_skin
+
+    def spy(rgb):
+        calls.append(rgb)
+        return analyze_skin(rgb)
+
+    monkeypatch.setattr(analysis, "analyze_skin", spy)
+    return calls
+
+
+def test_near_duplicate_reuses_a_marked_deep_copy(analyses):
+    index = NearDuplicateIndex(max_entries=4)
+    img = photo(1, 800, 600)
+    first = analyze_or_reuse(upload(img), index=index)
+    assert "reused" not in first and set(first["timings_ms"]) == ANALYSIS_TIMINGS
+    assert len(analyses) == 1 and index.stats()["misses"] == 1
+
+    second = analyze_or_reuse(upload(img, 60), index=index)
+    # Served from the index, not analysed again
+    assert len(analyses) == 1 and index.stats()["hits"] == 1
+    assert second["reused"] is True
+    assert set(second["timings_ms"]) == {"reuse", "total"}
+    timing = ("reused", "timings_ms", "within_budget")
+    assert {key: value for key, value in second.items() if key not in timing} == \
+        {key: value for key, value in first.items() if key not in timing}
+
+    # Neither the first caller's result nor a reused one shares nested state with the index
+    first["channels"]["red"] = -1
+    second["channels"]["green"] = -1
+    third = analyze_or_reuse(upload(img, 70), index=index)
+    assert len(analyses) == 1 and index.stats()["hits"] == 2
+    assert third["reused"] is True
+    assert third["channels"]["red"] != -1 and third["channels"]["green"] != -1
+    assert third["channels"] is not second["channels"]
+
+
+def test_unrelated_upload_is_analysed(analyses):
+    index = NearDuplicateIndex(max_entries=4)
+    analyze_or_reuse(upload(photo(1, 800, 600)), index=index)
+    assert "reused" not in analyze_or_reuse(upload(photo(2, 800, 600)), index=index)
+    assert len(analyses) == 2
+    assert index.stats()["misses"] == 2 and index.stats()["hits"] == 0
@@ -0,0 +1,51 @@
+import pytest
+
+from skincare_ai.history import HistoryStore
+
+METRICS = {"brightness_score": 120.0, "skin_brightness": 150.0, "redness_index": 12.0}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), batch_linger=0.2)
+    yield store
+    store.close()
+
+
+def test_records_are_written_and_folded_into_trends(store):
+    for index in range(5):
+        store.record("alice", dict(METRICS, brightness_score=100.0 + index), created=1_700_000_000 + index * 86400)
+    assert store.flush(timeout=10)
+    assert store.stats()["written"] == 5
+    assert [analysis["brightness_score"] for analysis in store.analyses("alice")] == [104, 103, 102, 101, 100]
+    assert store.progress("alice") == store.recompute("alice").summary()
+
+
+def test_bad_metric_is_rejected_before_it_is_queued(store):
+    # object() is not a number: record() refuses it instead of failing the writer's batch
+    assert store.record("alice", METRICS, created=1.0)
+    assert not store.record("bob", dict(METRICS, brightness_score=object()), created=2.0)
+    assert store.record("alice", METRICS, created=3.0)
+    assert store.flush(timeout=10)
+    stats = store.stats()
+    assert stats["failed"] == 1 and stats["written"] == 2
+    assert len(store.analyses("alice")) == 2 and store.trend("alice").count == 2
+    assert store.analyses("bob") == []
+
+
+def test_failed_batch_is_retried_one_by_one(store):
+    # sqlite cannot bind a list as user_id: the batch fails, then only that record does
+    store.record("alice", METRICS, created=1.0)
+    store.record(["bob"], METRICS, created=2.0)
+    store.record("alice", dict(METRICS, brightness_score=130.0), created=3.0)
+    assert store.flush(timeout=10)
+    stats = store.stats()
+    assert stats["failed"] == 1 and stats["written"] == 2
+    assert [analysis["brightness_score"] for analysis in store.analyses("alice")] == [130.0, 120.0]
+    assert store.trend("alice").count == 2
+    assert store.progress("alice") == store.recompute("alice").summary()
+
+    # The writer is still running
+    store.record("alice", METRICS, created=4.0)
+    assert store.flush(timeout=10)
+    assert store.stats()["written"] == 3
@@ -0,0 +1,136 @@
+"""InferenceClient against the offline stub endpoint in tests/stub_server.py"""
+import asyncio
+import time
+
+import pytest
+
+from skincare_ai.inference import CircuitBreaker, CircuitOpenError, InferenceClient, InferenceError
+
+PAYLOAD = {"inputs": "Skincare routine for hydration:", "parameters": {"max_new_tokens": 20}}
+
+
+def make_client(url, **options):
+    options.setdefault("backoff", 0.01)
+    return InferenceClient(url=url, api_key="stub", **options)
+
+
+def test_keeps_the_connection_alive(stub):
+    url, config = stub()
+    client = make_client(url)
+    try:
+        for _ in range(5):
+            assert client.generate(PAYLOAD)[0]["generated_text"].startswith(PAYLOAD["inputs"])
+    finally:
+        client.close()
+    assert config.requests == 5
+    assert config.connections == 1
+
+
+def test_retries_a_503_then_succeeds(stub):
+    url, config = stub(outcomes=["error", "error"])
+    client = make_client(url, retries=2)
+    try:
+        result = client.generate(PAYLOAD)
+    finally:
+        client.close()
+    assert result[0]["generated_text"]
+    assert config.requests == 3
+    assert client.breaker.state == "closed"
+
+
+def test_gives_up_after_the_retries(stub):
+    url, config = stub(outcomes=["error"] * 3)
+    client = make_client(url, retries=1)
+    try:
+        with pytest.raises(InferenceError):
+            client.generate(PAYLOAD)
+    finally:
+        client.close()
+    assert config.requests == 2
+
+
+def test_enforces_the_deadline(stub):
+    url, _ = stub(outcomes=["hang"], hang_seconds=3)
+    client = make_client(url, timeout=5)
+    start = time.monotonic()
+    try:
+        with pytest.raises(InferenceError):
+            client.generate(PAYLOAD, deadline=0.3)
+    finally:
+        client.close()
+    assert time.monotonic() - start < 1.5
+
+
+def test_breaker_opens_and_probes_once_half_open(stub):
+    url, config = stub(outcomes=["error"] * 2)
+    breaker = CircuitBreaker(window=4, min_calls=2, failure_rate=0.5, reset_timeout=0.2)
+    client = make_client(url, retries=0, breaker=breaker)
+    try:
+        for _ in range(2):
+            with pytest.raises(InferenceError):
+                client.generate(PAYLOAD)
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            client.generate(PAYLOAD)
+        assert config.requests == 2  # rejected without a request
+
+        time.sleep(0.25)
+        assert breaker.state == "half_open"
+        assert breaker.allow()  # the probe is claimed...
+        assert not breaker.allow()  # ...so nobody else gets through meanwhile
+        breaker.release()
+
+        client.generate(PAYLOAD)  # the probe succeeds and closes the circuit
+        assert breaker.state == "closed"
+        assert config.requests == 3
+    finally:
+        client.close()
+
+
+def test_failed_probe_reopens_the_breaker(stub):
+    url, _ = stub(outcomes=["error"] * 3)
+    breaker = CircuitBreaker(window=4, min_calls=2, failure_rate=0.5, reset_timeout=0.2)
+    client = make_client(url, retries=0, breaker=breaker)
+    try:
+        for _ in range(2):
+            with pytest.raises(InferenceError):
+                client.generate(PAYLOAD)
+        time.sleep(0.25)
+        with pytest.raises(InferenceError):
+            client.generate(PAYLOAD)
+        assert breaker.state == "open"
+    finally:
+        client.close()
+
+
+def test_async_calls_work_from_separate_event_loops(stub):
+    url, config = stub(outcomes=["error"])
+    client = make_client(url, retries=1)
+
+    async def call():
+        return await client.agenerate(PAYLOAD)
+
+    try:
+        for _ in range(2):
+            assert asyncio.run(call())[0]["generated_text"]
+    finally:
+        asyncio.run(client.aclose())
+    assert config.requests == 3
+
+
+def test_invalid_json_counts_as_a_failure(stub):
+    url, config = stub(outcomes=["bad_json"] * 3, stream_format="json")
+    breaker = CircuitBreaker(window=4, min_calls=3, failure_rate=0.5, reset_timeout=30)
+    client = make_client(url, retries=2, breaker=breaker)
+    try:
+        with pytest.raises(InferenceError, match="invalid JSON"):
+            client.generate(PAYLOAD)
+        with pytest.raises(InferenceError, match="invalid JSON"):
+            asyncio.run(client.agenerate(PAYLOAD))
+        with pytest.raises(InferenceError, match="invalid JSON"):
+            list(client.stream(PAYLOAD))
+        # Not retried, but each one recorded, so the breaker opens
+        assert config.requests == 3
+        assert breaker.state == "open"
+    finally:
+        client.close()
@@ -0,0 +1,57 @@
+"""Peak memory of the bounded large-upload decode paths, measured in fresh subprocesses
+
+Runs tests/peak_memory.py, as benchmarks/bench_large_decode.py does, on a
+24 MP image: the full-resolution decode needs over 70 MB, the bounded paths
+must stay under LIMIT_MB above the baseline.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from skincare_ai.analysis import ANALYSIS_MAX_PIXELS
+from tests.images import write_jpeg, write_png
+from tests.peak_memory import CASES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WIDTH, HEIGHT = 6000, 4000
+LIMIT_MB = 32.0
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/clear_refs"),
+                                reason="peak RSS is measured through Linux /proc")
+
+
+@pytest.fixture(scope="module")
+def files(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("large")
+    paths = {"png": str(tmp / "huge.png"), "jpg": str(tmp / "huge.jpg")}
+    write_png(paths["png"], WIDTH, HEIGHT)
+    write_jpeg(paths["png"], paths["jpg"])
+    return paths
+
+
+def peak_rise_mb(case, path):
+    env = dict(os.environ, SKINCARE_MAX_IMAGE_PIXELS=str(WIDTH * HEIGHT))
+    output = subprocess.run([sys.executable, "-m", "tests.peak_memory", case, path],
+                            capture_output=True, text=True, env=env, cwd=ROOT, check=True)
+    rise, _, result = output.stdout.strip().split(" ", 2)
+    return float(rise), result
+
+
+@pytest.mark.parametrize("case", ["png_banded", "png_histogram", "jpeg_draft"])
+def test_bounded_decode_stays_within_budget(files, case):
+    rise, result = peak_rise_mb(case, files[CASES[case][0]])
+    assert rise <= LIMIT_MB, f"{case} peaked {rise:.1f} MB above baseline ({result})"
+
+
+def test_full_resolution_decode_exceeds_the_budget(files):
+    # Shows the measurement can tell the paths apart
+    rise, _ = peak_rise_mb("png_full_reduce", files["png"])
+    assert rise > 2 * LIMIT_MB
+
+
+def test_analysis_array_is_reduced(files):
+    _, result = peak_rise_mb("png_banded", files["png"])
+    height, width, channels = (int(value) for value in result.strip("()").split(","))
+    assert channels == 3 and width * height <= ANALYSIS_MAX_PIXELS
@@ -0,0 +1,119 @@
+import json
+import re
+
+import pytest
+
+from skincare_ai.metrics import LATENCY_BUCKETS, MetricsRegistry, RequestTrace
+from skincare_ai.progress import StageReporter
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"\s*(?:,|$)')
+UNESCAPE = {"\\\\": "\\", '\\"': '"', "\\n": "\n"}
+
+
+def parse_exposition(text):
+    """{(name, frozenset of label pairs): value} and {name: type} from Prometheus text, strictly"""
+    samples, types = {}, {}
+    assert text.endswith("\n")
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name not in types
+            types[name] = kind
+            continue
+        if line.startswith("#"):
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, label_text, value = match.groups()
+        labels = {}
+        position = 0
+        while label_text and position < len(label_text):
+            label = LABEL.match(label_text, position)
+            assert label, line
+            labels[label.group(1)] = re.sub(r'\\[\\"n]', lambda m: UNESCAPE[m.group()], label.group(2))
+            position = label.end()
+        key = (name, frozenset(labels.items()))
+        assert key not in samples, line
+        samples[key] = float(value)
+    return samples, types
+
+
+def sample(samples, name, **labels):
+    return samples[(name, frozenset(labels.items()))]
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return MetricsRegistry(enabled=True, log_path=str(tmp_path / "metrics.jsonl"))
+
+
+def test_histograms_render_cumulative_buckets(registry):
+    for seconds in (0.003, 0.02, 0.02, 0.7, 45.0):
+        registry.observe("inference", seconds)
+    registry.observe("decode", 0.001)
+    samples, types = parse_exposition(registry.render_prometheus())
+    assert types["skincare_stage_seconds"] == "histogram"
+
+    buckets = [(float(dict(labels)["le"]), value) for (name, labels), value in samples.items()
+               if name == "skincare_stage_seconds_bucket" and dict(labels)["stage"] == "inference"]
+    assert [bound for bound, _ in buckets] == list(LATENCY_BUCKETS) + [float("inf")]
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts)
+    assert sample(samples, "skincare_stage_seconds_bucket", stage="inference", le="0.005") == 1
+    assert sample(samples, "skincare_stage_seconds_bucket", stage="inference", le="0.025") == 3
+    assert sample(samples, "skincare_stage_seconds_bucket", stage="inference", le="30.0") == 4
+    assert sample(samples, "skincare_stage_seconds_bucket", stage="inference", le="+Inf") == 5
+    assert sample(samples, "skincare_stage_seconds_count", stage="inference") == 5
+    assert sample(samples, "skincare_stage_seconds_sum", stage="inference") == pytest.approx(45.743)
+    assert sample(samples, "skincare_stage_seconds_count", stage="decode") == 1
+
+
+def test_counters_render_with_escaped_labels(registry):
+    registry.increment("fallbacks", reason="latency_budget")
+    registry.increment("fallbacks", reason="latency_budget")
+    registry.increment("errors", stage='say "hi"\\now\nnext')
+    registry.increment("restarts")
+    registry.observe('odd "stage"', 0.1)
+    samples, types = parse_exposition(registry.render_prometheus())
+    assert types["skincare_fallbacks_total"] == types["skincare_errors_total"] == "counter"
+    assert sample(samples, "skincare_fallbacks_total", reason="latency_budget") == 2
+    assert sample(samples, "skincare_errors_total", stage='say "hi"\\now\nnext') == 1
+    assert sample(samples, "skincare_restarts_total") == 1
+    assert sample(samples, "skincare_stage_seconds_count", stage='odd "stage"') == 1
+
+
+def test_disabled_registry_counts_nothing():
+    registry = MetricsRegistry(enabled=False, log_path=None)
+    registry.increment("fallbacks", reason="circuit_open")
+    samples, _ = parse_exposition(registry.render_prometheus())
+    assert samples == {}
+
+
+def test_finished_requests_are_logged_as_json_lines(registry):
+    traces = []
+    for outcome in ("ok", "error"):
+        trace = RequestTrace(registry)
+        reporter = StageReporter(trace.listen())
+        with reporter.stage("decode"):
+            pass
+        with trace.stage("report"):
+            pass
+        trace.finish(outcome)
+        trace.finish(outcome)  # only the first finish counts
+        traces.append(trace)
+
+    with open(registry.log_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["request_id"] for record in records] == [trace.request_id for trace in traces]
+    assert [record["outcome"] for record in records] == ["ok", "error"]
+    for record in records:
+        assert set(record) == {"ts", "request_id", "outcome", "stages_ms", "total_ms"}
+        assert set(record["stages_ms"]) == {"decode", "report"}
+        assert record["total_ms"] >= max(record["stages_ms"].values()) >= 0
+
+    samples, _ = parse_exposition(registry.render_prometheus())
+    assert sample(samples, "skincare_requests_total", outcome="ok") == 1
+    assert sample(samples, "skincare_requests_total", outcome="error") == 1
+    assert sample(samples, "skincare_stage_seconds_count", stage="total") == 2
+    assert registry.snapshot()["stages"]["decode"]["count"] == 2
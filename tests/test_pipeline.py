@@ -0,0 +1,39 @@
+"""Stage events from process_skincare_request"""
+import io
+
+import numpy as np
+from PIL import Image
+
+from skincare_ai.inference import InferenceClient
+from skincare_ai.pipeline import process_skincare_request
+
+
+def png_bytes(width=64, height=48):
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def run(image_bytes, client):
+    events = []
+    result = process_skincare_request(image_bytes, "Hydration", "", client=client,
+                                      on_progress=lambda event: events.append((event.stage, event.status)))
+    return result, events
+
+
+def test_undecodable_upload_fails_the_decode_stage():
+    (response, error), events = run(b"not an image", InferenceClient(url=None))
+    assert response is None and error == "Failed to process image"
+    assert events == [("decode", "started"), ("decode", "failed")]
+
+
+def test_inference_failure_fails_its_stage_and_falls_back():
+    client = InferenceClient(url="http://127.0.0.1:9/models/gpt2", api_key="stub", retries=0)
+    try:
+        (response, error), events = run(png_bytes(), client)
+    finally:
+        client.close()
+    assert error is None and response["recommendation"]
+    assert ("inference", "failed") in events
+    assert ("inference", "finished") not in events
+    assert events[-1] == ("report", "finished")
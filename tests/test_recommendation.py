@@ -0,0 +1,127 @@
+import asyncio
+import random
+import string
+import time
+
+import pytest
+
+from skincare_ai.cache import RecommendationCache, make_cache_key
+from skincare_ai.inference import InferenceClient
+from skincare_ai.options import POPULAR_GOALS, SKINCARE_GOALS
+from skincare_ai.recommendation import (
+    GOAL_KEYWORDS,
+    LATENCY_BUDGET_NOTICE,
+    LOCAL_RECOMMENDATIONS,
+    compile_goal_matcher,
+    get_local_recommendation,
+    get_skincare_recommendation,
+    get_skincare_recommendation_async,
+    match_goal,
+)
+from tests.reference import linear_match
+
+HISTORY = "Niacinamide pore refining serum | Skin Type: Oily"
+BUDGET = 0.2
+# Allowance on top of the budget for a slow test machine
+SLACK = 0.6
+
+
+def expected(goal, keyword_groups=GOAL_KEYWORDS):
+    return linear_match(goal, LOCAL_RECOMMENDATIONS, keyword_groups)
+
+
+@pytest.mark.parametrize("goal", SKINCARE_GOALS + POPULAR_GOALS)
+def test_dropdown_goals_match_the_linear_scan(goal):
+    assert match_goal(goal) == expected(goal)
+
+
+@pytest.mark.parametrize("goal, category", [
+    ("Pore minimization and refinement", "anti-aging"),  # "fine" inside "refinement"
+    ("refined glow", "brightening"),  # "fine" ranks below "glow"
+    ("dark circles, oil control", "oil control"),  # a catalog key beats an earlier keyword
+    ("redness", "sensitive"),
+    ("hydrated but oily", "hydration"),  # "hydrat" ranks above "oil", a prefix of "oily"
+    ("SENSITIVE ACNE", "acne"),
+    ("", None),
+    ("nothing relevant here", None),
+])
+def test_overlapping_terms_resolve_like_the_linear_scan(goal, category):
+    assert expected(goal) == category
+    assert match_goal(goal) == category
+
+
+def test_random_goals_and_keywords_match_the_linear_scan():
+    rng = random.Random(11)
+    fragments = [key for key in LOCAL_RECOMMENDATIONS] + [word for _, words in GOAL_KEYWORDS for word in words]
+    for _ in range(20):
+        # Extra keywords that overlap each other and the built-in terms
+        keyword_groups = [(category, list(words)) for category, words in GOAL_KEYWORDS]
+        for category in rng.sample(sorted(LOCAL_RECOMMENDATIONS), 3):
+            words = ["".join(rng.choice("abcdefilnorst") for _ in range(rng.randint(1, 5)))
+                     for _ in range(rng.randint(1, 8))]
+            words += [rng.choice(fragments)[:rng.randint(1, 6)] for _ in range(2)]
+            keyword_groups.insert(rng.randint(0, len(keyword_groups)), (category, words))
+        matcher = compile_goal_matcher(LOCAL_RECOMMENDATIONS, keyword_groups)
+        for _ in range(50):
+            goal = " ".join(rng.choice(fragments + list(string.ascii_lowercase)) for _ in range(rng.randint(0, 6)))
+            assert match_goal(goal, matcher) == expected(goal, keyword_groups), (goal, keyword_groups)
+
+
+def wait_for(condition, timeout=5.0):
+    expires = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < expires, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def hanging_model(stub):
+    """A client whose first call answers only after a second, and an empty cache"""
+    url, config = stub(outcomes=("hang",), hang_seconds=1.0)
+    client = InferenceClient(url=url, api_key="stub", timeout=5)
+    yield client, RecommendationCache(path=None), config
+    client.close()
+
+
+def test_a_call_over_the_latency_budget_falls_back_in_time(hanging_model):
+    client, cache, config = hanging_model
+    goal = "Deep hydration (sync budget)"
+    warnings = []
+    start = time.monotonic()
+    recommendation = get_skincare_recommendation(goal, HISTORY, 120, on_warning=warnings.append, client=client,
+                                                 cache=cache, latency_budget=BUDGET)
+    assert time.monotonic() - start < BUDGET + SLACK
+    assert recommendation == get_local_recommendation(goal, HISTORY)
+    assert warnings == [LATENCY_BUDGET_NOTICE]
+
+    # The call carried on in the background and cached the model's answer for next time
+    key = make_cache_key(goal, HISTORY, 120)
+    wait_for(lambda: cache.get(key) is not None)
+    assert config.requests == 1
+    assert get_skincare_recommendation(goal, HISTORY, 120, client=client, cache=cache,
+                                       latency_budget=BUDGET) == cache.get(key)
+    assert config.requests == 1
+
+
+def test_an_async_call_over_the_latency_budget_falls_back_in_time(hanging_model):
+    client, cache, config = hanging_model
+    goal = "Deep hydration (async budget)"
+
+    async def main():
+        start = time.monotonic()
+        recommendation = await get_skincare_recommendation_async(goal, HISTORY, 120, client=client, cache=cache,
+                                                                 latency_budget=BUDGET)
+        elapsed = time.monotonic() - start
+        # Let the background call finish on this loop
+        key = make_cache_key(goal, HISTORY, 120)
+        expires = time.monotonic() + 5
+        while cache.get(key) is None and time.monotonic() < expires:
+            await asyncio.sleep(0.02)
+        await client.aclose()
+        return recommendation, elapsed, cache.get(key)
+
+    recommendation, elapsed, cached = asyncio.run(main())
+    assert elapsed < BUDGET + SLACK
+    assert recommendation == get_local_recommendation(goal, HISTORY)
+    assert cached is not None and cached != recommendation
+    assert config.requests == 1
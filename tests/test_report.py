@@ -0,0 +1,99 @@
+import io
+import json
+import time
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from skincare_ai.api import app
+from skincare_ai.pipeline import build_response
+from skincare_ai.report import REPORT_FORMATS, render_report, stream_report_archive
+
+RECOMMENDATION = {"routine": "Cleanse, moisturise, SPF", "key_ingredients": "Niacinamide", "avoid": "Fragrance",
+                  "timeline": "4-6 weeks"}
+
+
+def response(number=0, goal="Acne treatment"):
+    return build_response(goal, f"Retinol #{number}", 120.5 + number, RECOMMENDATION)
+
+
+GENERATED_AT = time.strptime("2024-05-01 09:30:00", "%Y-%m-%d %H:%M:%S")
+
+
+@pytest.mark.parametrize("report_format", REPORT_FORMATS)
+def test_every_format_renders_a_minimal_response(report_format):
+    report = render_report(response(), report_format, GENERATED_AT)
+    assert report.strip()
+    if report_format == "json":
+        data = json.loads(report)
+        assert data["recommendation"] == RECOMMENDATION and data["analysis"]["brightness_score"] == 120.5
+        assert data["generated_at"].startswith("2024-05-01T09:30:00")
+    else:
+        for text in ("2024-05-01 09:30:00", "120.5/255", "Acne treatment", "Retinol #0", "Niacinamide", "n/a"):
+            assert text in report
+
+
+def test_text_recommendation_renders_too():
+    result = build_response("Glow", "None", 90, "Drink water and sleep")
+    assert "Drink water and sleep" in render_report(result, "text")
+    assert "<p>Drink water and sleep</p>" in render_report(result, "html")
+
+
+def test_html_report_escapes_user_input():
+    report = render_report(build_response("<script>x</script>", "a & b", 90, RECOMMENDATION), "html")
+    assert "<script>x" not in report and "&lt;script&gt;x&lt;/script&gt;" in report and "a &amp; b" in report
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        render_report(response(), "pdf")
+    with pytest.raises(ValueError):
+        list(stream_report_archive([], "pdf"))
+
+
+@pytest.mark.parametrize("report_format", REPORT_FORMATS)
+def test_streamed_archive_opens_with_zipfile(report_format):
+    extension = REPORT_FORMATS[report_format][0]
+    results = ((f"report_{number}", response(number)) for number in range(40))
+    chunks = list(stream_report_archive(results, report_format))
+    # Yielded as it goes, not as one blob at the end
+    assert len(chunks) > 1 and all(chunks)
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        names = archive.namelist()
+        assert len(names) == len(set(names)) == 40
+        assert names[0] == f"report_0.{extension}"
+        for name in names:
+            assert archive.read(name).decode().strip()
+        assert "Retinol #7" in archive.read(f"report_7.{extension}").decode()
+
+
+def json_lines(results, chunk_size=100):
+    """The body in small pieces, so lines arrive split across chunks"""
+    body = "".join(json.dumps(result) + "\n" for result in results).encode()
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+def test_archive_streams_a_report_per_json_line():
+    client = TestClient(app)
+    reply = client.post("/reports/archive?format=json", content=json_lines(response(n) for n in range(25)))
+    assert reply.status_code == 200 and reply.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(reply.content)) as archive:
+        names = archive.namelist()
+        assert names == [f"skincare_report_{n:05d}.json" for n in range(1, 26)]
+        assert json.loads(archive.read(names[3]))["user_input"]["history"] == "Retinol #3"
+
+
+def test_archive_rejects_a_body_that_is_not_json_lines():
+    client = TestClient(app)
+    assert client.post("/reports/archive", content=b"not json\n").status_code == 422
+    assert client.post("/reports/archive", content=b'{"status": "success"}\n').status_code == 422
+    assert client.post("/reports/archive?format=pdf", content=b"").status_code == 400
+
+
+def test_empty_archive():
+    reply = TestClient(app).post("/reports/archive", content=b"")
+    assert reply.status_code == 200
+    assert zipfile.ZipFile(io.BytesIO(reply.content)).namelist() == []
@@ -0,0 +1,139 @@
+"""Single-flight coalescing, directly and on the recommendation path against the stub endpoint"""
+import asyncio
+import threading
+
+from skincare_ai.cache import RecommendationCache
+from skincare_ai.inference import InferenceClient
+from skincare_ai.recommendation import get_skincare_recommendation, get_skincare_recommendation_async, in_flight
+from skincare_ai.singleflight import SingleFlight
+
+GOAL = "🎭 Acne treatment and clear skin"
+HISTORY = "🍊 Vitamin C brightening serum | Skin Type: Oily"
+CALLERS = 20
+
+
+def run_together(count, fn):
+    """fn(index) on count threads released at once; returns the results in order"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def call(index):
+        barrier.wait()
+        results[index] = fn(index)
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "done"
+
+    def call(index):
+        if index == 0:
+            threading.Timer(0.2, release.set).start()
+        return flight.do("key", work)
+
+    assert run_together(8, call) == ["done"] * 8
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 8, "coalesced": 7, "in_flight": 0}
+
+
+def test_exception_reaches_every_waiter_and_is_not_remembered():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError("model down")
+
+    def call(index):
+        if index == 0:
+            threading.Timer(0.2, release.set).start()
+        try:
+            flight.do("key", fail)
+        except RuntimeError as e:
+            return str(e)
+
+    assert run_together(4, call) == ["model down"] * 4
+    assert flight.do("key", lambda: "recovered") == "recovered"
+
+
+def test_async_calls_coalesce_per_event_loop():
+    flight = SingleFlight("test")
+    started = threading.Barrier(2)
+
+    async def work(index):
+        await asyncio.sleep(0.3)
+        return index
+
+    async def callers(index):
+        first = asyncio.ensure_future(flight.ado("key", lambda: work(index)))
+        await asyncio.sleep(0)
+        # Both loops now have a call for "key" in flight
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        second = flight.ado("key", lambda: work(-1))
+        return await asyncio.gather(first, second)
+
+    results = run_together(2, lambda index: asyncio.run(callers(index)))
+    # Each loop shared its own call, never the other loop's task
+    assert results == [[0, 0], [1, 1]]
+    assert flight.stats() == {"calls": 4, "coalesced": 2, "in_flight": 0}
+
+
+def test_identical_recommendation_requests_make_one_model_call(stub):
+    url, config = stub(latency=0.3)
+    client = InferenceClient(url=url, api_key="stub", max_concurrency=CALLERS, max_connections=CALLERS)
+    cache = RecommendationCache(path=None)
+    coalesced = in_flight.stats()["coalesced"]
+    try:
+        results = run_together(CALLERS, lambda _: get_skincare_recommendation(GOAL, HISTORY, 130.0, client=client,
+                                                                              cache=cache))
+    finally:
+        client.close()
+    assert config.requests == 1
+    assert in_flight.stats()["coalesced"] - coalesced == CALLERS - 1
+    assert results[0]["source"] == "AI Generated"
+    assert all(result == results[0] for result in results)
+
+
+def test_identical_async_requests_make_one_model_call(stub):
+    url, config = stub(latency=0.3)
+    client = InferenceClient(url=url, api_key="stub", max_concurrency=CALLERS, max_connections=CALLERS)
+    cache = RecommendationCache(path=None)
+
+    async def wave():
+        try:
+            return await asyncio.gather(*(get_skincare_recommendation_async(GOAL, HISTORY, 130.0, client=client,
+                                                                            cache=cache)
+                                          for _ in range(CALLERS)))
+        finally:
+            await client.aclose()
+
+    results = asyncio.run(wave())
+    client.close()
+    assert config.requests == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_different_requests_are_not_coalesced(stub):
+    histories = ("Skin Type: Oily", "Skin Type: Dry")
+    url, config = stub(latency=0.2)
+    client = InferenceClient(url=url, api_key="stub")
+    cache = RecommendationCache(path=None)
+    try:
+        run_together(len(histories), lambda index: get_skincare_recommendation(GOAL, histories[index], 130.0,
+                                                                               client=client, cache=cache))
+    finally:
+        client.close()
+    assert config.requests == len(histories)
@@ -0,0 +1,86 @@
+"""Streamed generation against the stub endpoint: InferenceClient.stream and RecommendationStream"""
+import time
+
+import pytest
+
+from tests.stub_server import GENERATED_TEXT
+from skincare_ai.cache import RecommendationCache
+from skincare_ai.inference import InferenceClient, InferenceError
+from skincare_ai.recommendation import get_local_recommendation, stream_skincare_recommendation
+
+PAYLOAD = {"inputs": "Skincare routine for hydration:", "parameters": {"max_new_tokens": 20}}
+
+
+def make_client(url, **options):
+    return InferenceClient(url=url, api_key="stub", **options)
+
+
+@pytest.mark.parametrize("stream_format", ["sse", "text"])
+def test_streams_token_by_token(stub, stream_format):
+    url, _ = stub(stream_format=stream_format, token_delay=0)
+    client = make_client(url)
+    try:
+        chunks = list(client.stream(PAYLOAD))
+    finally:
+        client.close()
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == GENERATED_TEXT
+    assert client.breaker.state == "closed"
+
+
+def test_json_response_is_a_single_chunk(stub):
+    url, _ = stub(stream_format="json")
+    client = make_client(url)
+    try:
+        chunks = list(client.stream(PAYLOAD))
+    finally:
+        client.close()
+    assert chunks == [PAYLOAD["inputs"] + " " + GENERATED_TEXT]
+
+
+def test_stalled_stream_raises_within_the_stall_timeout(stub):
+    url, _ = stub(stall_after=3, hang_seconds=3, token_delay=0)
+    client = make_client(url)
+    chunks = []
+    start = time.monotonic()
+    try:
+        with pytest.raises(InferenceError):
+            for chunk in client.stream(PAYLOAD, stall_timeout=0.3):
+                chunks.append(chunk)
+    finally:
+        client.close()
+    assert len(chunks) == 3
+    assert time.monotonic() - start < 1.5
+
+
+def test_recommendation_falls_back_mid_stream(stub):
+    url, _ = stub(stall_after=3, hang_seconds=3, token_delay=0)
+    client = make_client(url)
+    warnings = []
+    stream = stream_skincare_recommendation("Hydration", "", 150.0, on_warning=warnings.append, client=client,
+                                            cache=RecommendationCache(path=None), stall_timeout=0.3)
+    try:
+        text = "".join(stream)
+    finally:
+        client.close()
+    generated, _, local = text.partition("\n\n---\n\n")
+    assert GENERATED_TEXT.startswith(generated.strip())
+    assert local
+    assert warnings
+    assert stream.result() == get_local_recommendation("Hydration", "")
+
+
+def test_completed_stream_is_the_result_and_cached(stub):
+    url, config = stub(token_delay=0)
+    client = make_client(url)
+    cache = RecommendationCache(path=None)
+    try:
+        first = stream_skincare_recommendation("Hydration", "", 150.0, client=client, cache=cache)
+        text = "".join(first)
+        second = stream_skincare_recommendation("Hydration", "", 150.0, client=client, cache=cache)
+        list(second)
+    finally:
+        client.close()
+    assert first.result() == {"recommendation": text.strip(), "source": "AI Generated"}
+    assert second.result() == first.result()
+    assert config.requests == 1
@@ -0,0 +1,73 @@
+"""UploadStore: bounded heap, spilling to disk, expiry and eviction"""
+import os
+import random
+import time
+import tracemalloc
+
+from skincare_ai.uploads import UploadStore
+
+KB = 1024
+
+
+def test_heap_stays_within_budget_over_500_sessions(tmp_path):
+    rng = random.Random(11)
+    largest = 150 * KB
+    source = os.urandom(largest)
+    budget = 4 * 1024 * KB
+    store = UploadStore(memory_budget=budget, disk_budget=1024 * 1024 * KB, spill_dir=str(tmp_path))
+    handles = {}
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        for session in range(500):
+            size = rng.randint(50 * KB, largest)
+            handles[session] = store.put(source[:size], f"session-{session}.jpg")
+            for other in rng.sample(sorted(handles), min(3, len(handles))):
+                assert store.get(handles[other]) is not None
+                if rng.random() < 0.1:
+                    store.discard(handles[other])
+                    handles[other] = store.put(source[:size], f"session-{other}-retake.jpg")
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    stats = store.stats()
+    assert stats["uploads"] == 500
+    assert stats["spilled"] > 0
+    assert stats["memory_bytes"] <= budget
+    # Upload bytes never exceed the budget plus the one being stored; the rest is per-session bookkeeping
+    assert peak <= budget + 2 * largest + 500 * KB
+    store.close()
+    assert not os.listdir(tmp_path)
+
+
+def test_spilled_upload_reads_back_unchanged(tmp_path):
+    store = UploadStore(memory_budget=100 * KB, spill_dir=str(tmp_path))
+    first, second = os.urandom(80 * KB), os.urandom(80 * KB)
+    handle = store.put(first, "first.jpg")
+    store.put(second, "second.jpg")
+    assert store.stats()["spilled"] == 1
+    assert bytes(store.get(handle)) == first
+    assert store.name(handle) == "first.jpg"
+    store.close()
+
+
+def test_disk_budget_evicts_the_least_recently_used(tmp_path):
+    store = UploadStore(memory_budget=0, disk_budget=100 * KB, spill_dir=str(tmp_path))
+    oldest = store.put(os.urandom(60 * KB))
+    newest = store.put(os.urandom(60 * KB))
+    assert store.get(oldest) is None
+    assert store.get(newest) is not None
+    assert store.stats()["evictions"] == 1
+    assert len(os.listdir(tmp_path)) == 1
+    store.close()
+
+
+def test_idle_uploads_expire(tmp_path):
+    store = UploadStore(idle_timeout=0.05, spill_dir=str(tmp_path))
+    handle = store.put(b"photo")
+    time.sleep(0.1)
+    store.evict_idle()
+    assert store.get(handle) is None
+    assert store.stats()["expirations"] == 1
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from skincare_ai.analysis import SummedAreaTable, analyze_image_bytes, analyze_skin, skin_tables, zone_statistics
+from skincare_ai.imaging import decode_image_once
+from tests.images import encode, make_face
+from tests.reference import analysis_planes, stats_recompute, zone_rectangles
+
+ORIENTATION = 0x0112  # EXIF tag
+
+
+def test_summed_area_table_matches_slice_sums():
+    rng = np.random.default_rng(3)
+    planes = [rng.random((37, 53), dtype=np.float32) for _ in range(2)]
+    table = SummedAreaTable(*planes)
+    rectangles = [(0, 0, 53, 37), (5, 7, 6, 8), (10, 0, 53, 20), (0, 30, 1, 37), (4, 4, 4, 9)]
+    sums = table.sums(rectangles)
+    for column, (left, top, right, bottom) in enumerate(rectangles):
+        for layer, plane in enumerate(planes):
+            assert sums[layer, column] == pytest.approx(plane[top:bottom, left:right].sum(dtype=np.float64))
+
+
+@pytest.mark.parametrize("grid", [4, 8])
+def test_zone_statistics_match_a_direct_recompute(grid):
+    planes = analysis_planes(make_face())
+    table, centre = skin_tables(*planes)
+    for zones in zone_rectangles(planes[0].shape, grid).values():
+        expected = stats_recompute(planes, zones)
+        tabled = zone_statistics(table, centre, zones)
+        assert tabled.keys() == expected.keys()
+        for zone, moments in expected.items():
+            if moments is None:
+                assert tabled[zone] is None
+                continue
+            # zone_statistics rounds to two decimals
+            for value, key in zip(moments, ("brightness", "brightness_std", "redness")):
+                assert abs(tabled[zone][key] - value) <= 0.0051, (zone, key)
+
+
+def test_zones_without_skin_or_rectangles_are_none():
+    planes = analysis_planes(make_face())
+    table, centre = skin_tables(*planes)
+    height, width = planes[0].shape
+    middle = (width * 2 // 5, height * 2 // 5, width * 3 // 5, height * 3 // 5)
+    zones = {"corner": [(0, 0, width // 10, height // 10)], "empty": [], "middle": [middle], "last": []}
+    result = zone_statistics(table, centre, zones)
+    # The top-left corner is background
+    assert result["corner"] is None and result["empty"] is None and result["last"] is None
+    assert result["middle"] is not None
+    assert result["middle"] == zone_statistics(table, centre, {"middle": [middle]})["middle"]
+    assert zone_statistics(table, centre, {"empty": []}) == {"empty": None}
+
+
+def test_analyze_skin_reports_the_face_zones():
+    zones = analyze_skin(make_face())["zones"]
+    assert zones and all(stats is not None for stats in zones.values())
+    # make_face brightens the forehead and reddens the cheeks
+    assert zones["forehead"]["brightness"] > zones["chin"]["brightness"]
+
+
+def test_rotated_photo_gets_the_same_zones_from_the_app_and_the_api():
+    upright = Image.fromarray(make_face(600, 800))
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6  # stored turned left: viewers rotate it 90 degrees clockwise
+    data = encode(upright.transpose(Image.Transpose.ROTATE_90), exif=exif.tobytes())
+
+    app = analyze_skin(decode_image_once(data).array)
+    api = analyze_image_bytes(data, reuse=False)
+    assert api["zones"] == app["zones"]
+    # Both measured the face upright, as if the photo had been saved that way
+    reference = analyze_skin(decode_image_once(encode(upright)).array)["zones"]
+    for zone, stats in reference.items():
+        assert api["zones"][zone]["brightness"] == pytest.approx(stats["brightness"], abs=1.0)
+    assert api["zones"]["forehead"]["brightness"] > api["zones"]["chin"]["brightness"]